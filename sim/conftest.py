@@ -27,6 +27,18 @@ def pytest_addoption(parser):
   parser.addoption( "--vrtl", action="store_true",
                     help="use VRTL implementations" )
 
+  parser.addoption( "--cosim", action="store_true",
+                    help="co-simulate processors against the ISA semantics" )
+
+  parser.addoption( "--asm-cache", action="store", default='',
+                    help="directory for caching assembled test programs" )
+
+  parser.addoption( "--harness-pool", action="store_true",
+                    help="reuse elaborated RTL test harnesses across tests" )
+
+  parser.addoption( "--model-cache", action="store", default='',
+                    help="directory for caching verilated models" )
+
 @pytest.fixture(autouse=True)
 def fix_randseed():
   """Set the random seed prior to each test case."""
@@ -77,8 +89,26 @@ def pytest_report_header(config):
 # https://pytest.org/latest/example/simple.html#detect-if-running-from-within-a-pytest-run
 
 def pytest_configure(config):
+  import os
   import sys
   sys._called_from_test = True
+  if config.option.asm_cache:
+    os.environ["TINYRV2_ASM_CACHE"] = os.path.abspath( config.option.asm_cache )
+  if config.option.model_cache:
+    os.environ["PYMTL_MODEL_CACHE"] = os.path.abspath( config.option.model_cache )
+  if os.environ.get( "PYMTL_MODEL_CACHE" ):
+    from lab2_proc import verilog_cache
+    verilog_cache.install( os.environ["PYMTL_MODEL_CACHE"] )
+
+def pytest_terminal_summary(terminalreporter):
+  if terminalreporter.config.option.harness_pool:
+    from lab2_proc.test.harness_pool import harness_pool
+    terminalreporter.write_line( "harness pool: {} elaborated, {} reused"
+      .format( harness_pool.num_elaborated, harness_pool.num_reused ) )
+  if terminalreporter.config.option.model_cache:
+    from lab2_proc import verilog_cache
+    terminalreporter.write_line( "model cache: {} hits, {} builds"
+      .format( verilog_cache.num_hits, verilog_cache.num_builds ) )
 
 def pytest_unconfigure(config):
   import sys
@@ -85,6 +85,11 @@ module lab2_proc_ProcAltDpathVRTL
   output logic        br_cond_lt_X,
   output logic        br_cond_ltu_X,
 
+  // commit trace output (for co-simulation)
+
+  output logic [31:0] commit_pc,
+  output logic [31:0] commit_wdata,
+
   // stats output
 
   output logic        stats_en
@@ -383,6 +388,16 @@ module lab2_proc_ProcAltDpathVRTL
   //--------------------------------------------------------------------
 
   logic [31:0] ex_result_M;
+  logic [31:0] pc_M;
+
+  vc_EnResetReg #(32, 0) pc_reg_M
+  (
+    .clk    (clk),
+    .reset  (reset),
+    .en     (reg_en_M),
+    .d      (pc_X),
+    .q      (pc_M)
+  );
 
   vc_EnResetReg #(32, 0) ex_result_reg_M
   (
@@ -425,6 +440,22 @@ module lab2_proc_ProcAltDpathVRTL
 
   assign rf_wdata_W = wb_result_W;
 
+  // commit trace output
+
+  logic [31:0] pc_W;
+
+  vc_EnResetReg #(32, 0) pc_reg_W
+  (
+    .clk    (clk),
+    .reset  (reset),
+    .en     (reg_en_W),
+    .d      (pc_M),
+    .q      (pc_W)
+  );
+
+  assign commit_pc    = pc_W;
+  assign commit_wdata = wb_result_W;
+
   // stats output
   // note the stats en is full 32-bit here but the outside port is one
   // bit.
@@ -51,6 +51,13 @@ class ProcAltVRTL( VerilogModel ):
     s.dmemreq     = OutValRdyBundle ( MemReqMsg4B  )
     s.dmemresp    = InValRdyBundle  ( MemRespMsg4B )
 
+    # commit trace (for co-simulation, see tinyrv2_cosim)
+
+    s.commit_pc       = OutPort( 32 )
+    s.commit_rf_wen   = OutPort( 1  )
+    s.commit_rf_waddr = OutPort( 5  )
+    s.commit_rf_wdata = OutPort( 32 )
+
     # for counting num_inst
 
     s.commit_inst = OutPort( 1 )
@@ -101,6 +108,11 @@ class ProcAltVRTL( VerilogModel ):
       'proc2mngr_val' : s.proc2mngr.val,
       'proc2mngr_rdy' : s.proc2mngr.rdy,
 
+      'commit_pc'       : s.commit_pc,
+      'commit_rf_wen'   : s.commit_rf_wen,
+      'commit_rf_waddr' : s.commit_rf_waddr,
+      'commit_rf_wdata' : s.commit_rf_wdata,
+
       'commit_inst'   : s.commit_inst,
 
       'stats_en'      : s.stats_en
@@ -63,6 +63,13 @@ module lab2_proc_ProcAltVRTL
   input  logic         dmemresp_val,
   output logic         dmemresp_rdy,
 
+  // commit trace output (for co-simulation)
+
+  output logic [31:0]  commit_pc,
+  output logic         commit_rf_wen,
+  output logic [4:0]   commit_rf_waddr,
+  output logic [31:0]  commit_rf_wdata,
+
   // stats output
 
   output logic         commit_inst,
@@ -394,11 +401,19 @@ module lab2_proc_ProcAltVRTL
     .br_cond_lt_X            (br_cond_lt_X),
     .br_cond_ltu_X           (br_cond_ltu_X),
 
+    // commit trace output
+
+    .commit_pc               (commit_pc),
+    .commit_wdata            (commit_rf_wdata),
+
     // stats_en
 
     .stats_en                (stats_en)
   );
 
+  assign commit_rf_wen   = rf_wen_W;
+  assign commit_rf_waddr = rf_waddr_W;
+
   //----------------------------------------------------------------------
   // Line tracing
   //----------------------------------------------------------------------
@@ -10,14 +10,23 @@ from pclib.fl   import BytesMemPortAdapter
 
 from tinyrv2_encoding  import TinyRV2Inst
 from tinyrv2_semantics import TinyRV2Semantics
+from tinyrv2_semantics_fast import TinyRV2SemanticsFast
+import tinyrv2_translator
 
 class ProcFL( Model ):
 
+  # The decode/translation caches and the greenlet survive a reset, so
+  # a test harness with this model must not be reused (see
+  # test/harness_pool.py)
+
+  poolable = False
+
   #-----------------------------------------------------------------------
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( s, trace_regs=False, num_cores=1 ):
+  def __init__( s, trace_regs=False, num_cores=1, fast=False,
+                translate=False ):
 
     # Stats enable port
 
@@ -52,10 +61,19 @@ class ProcFL( Model ):
     s.mngr2proc_q = InValRdyQueueAdapter  ( s.mngr2proc )
     s.proc2mngr_q = OutValRdyQueueAdapter ( s.proc2mngr )
 
-    # Construct the ISA semantics object
+    # Construct the ISA semantics object. The fast semantics keeps the
+    # architectural state in native ints instead of Bits. Translating
+    # basic blocks requires the fast semantics, and since translated
+    # blocks access the register file directly we cannot trace registers
+    # in that mode.
+
+    fast      = fast or translate
+    translate = translate and not trace_regs
 
-    s.isa = TinyRV2Semantics( s.dmem, s.mngr2proc_q, s.proc2mngr_q,
-                              num_cores=num_cores )
+    IsaSemantics = TinyRV2SemanticsFast if fast else TinyRV2Semantics
+
+    s.isa = IsaSemantics( s.dmem, s.mngr2proc_q, s.proc2mngr_q,
+                          num_cores=num_cores )
 
     # Copies of pc and inst for line tracing
 
@@ -69,6 +87,21 @@ class ProcFL( Model ):
 
     s.trace = " "*29
     s.trace_regs = trace_regs
+    s.fast = fast
+    s.translate = translate
+
+    # Number of instructions committed in the last cycle. This is the
+    # same as commit_inst except in translation mode, where we commit a
+    # whole basic block at once.
+
+    s.commit_count = 0
+
+    # Instruction fetch used when translating a basic block
+
+    def fetch( addr ):
+      return s.imem[ addr : addr+4 ]
+
+    s.fetch = fetch
 
     s.isa.reset()
     s.isa.R.trace_regs = trace_regs
@@ -95,15 +128,50 @@ class ProcFL( Model ):
         if s.isa.stats_en:
           s.num_inst += 1
         s.commit_inst.next = 0
+        s.commit_count = 0
 
         # Set trace string in case the fetch yields
 
         s.trace = " "*33
 
-        # Fetch instruction
+        s.pc = int( s.isa.PC )
+
+        # In translation mode we execute the whole basic block starting at
+        # the current PC. Blocks never include CSR instructions, so
+        # stats_en cannot change within a block. If the instruction at
+        # this PC cannot be translated we fall back to executing it below.
+
+        if s.translate:
+
+          block = s.isa.block_cache.get( s.pc )
+          if block is None:
+            block = tinyrv2_translator.translate( s.isa, s.pc, s.fetch )
+
+          if block:
+
+            s.trace = "#".ljust(33)
+
+            num_block_inst = block( s.isa )
+
+            s.num_total_inst += num_block_inst - 1
+            if s.isa.stats_en:
+              s.num_inst += num_block_inst - 1
+            s.commit_inst.next = 1
+            s.commit_count = num_block_inst
+
+            s.trace = "{:0>8x} {: <24}".format( s.pc,
+                        "block ({} insts)".format( num_block_inst ) )
+            return
+
+        # Fetch instruction. With the fast semantics we first look in the
+        # decode cache and only fetch and decode on a miss.
 
-        s.pc   = s.isa.PC.uint()
-        s.inst = TinyRV2Inst( s.imem[ s.pc : s.pc+4 ] )
+        if s.fast:
+          s.inst = s.isa.decode_cache.get( s.pc )
+          if s.inst is None:
+            s.inst = s.isa.decode( s.pc, s.imem[ s.pc : s.pc+4 ] )
+        else:
+          s.inst = TinyRV2Inst( s.imem[ s.pc : s.pc+4 ] )
 
         # Set trace string in case the execution function yeilds
 
@@ -113,6 +181,7 @@ class ProcFL( Model ):
 
         s.isa.execute( s.inst )
         s.commit_inst.next = 1
+        s.commit_count = 1
 
         # Trace instruction
 
@@ -0,0 +1,188 @@
+#=========================================================================
+# SparseMemory
+#=========================================================================
+# A drop-in replacement for the flat bytearray behind TestMemory (and the
+# ISA simulator's backdoor memory). TinyRV2 programs only touch a few
+# small regions of the address space (text at 0x200, data at 0x2000, the
+# mngr sections, and the stacks right below 1MB), so instead of one big
+# bytearray we keep a dict of 4KB pages which are only allocated on the
+# first write. Reading a page which was never written returns zeros.
+#
+# The class supports the subset of the bytearray interface the harnesses
+# and TestMemory use: indexing with ints (or Bits) returns/sets a byte,
+# slicing returns/sets a bytearray, and len() is the size of the address
+# space. Slice assignment must not change the length. Writing a chunk of
+# zeros to a page which does not exist does not allocate it, so loading a
+# mostly-empty image (e.g., a checkpoint) stays cheap.
+
+import struct
+
+#-------------------------------------------------------------------------
+# Parameters
+#-------------------------------------------------------------------------
+
+page_nbits  = 12
+page_nbytes = 1 << page_nbits
+page_mask   = page_nbytes - 1
+
+class SparseMemory (object):
+
+  #-----------------------------------------------------------------------
+  # Constructor
+  #-----------------------------------------------------------------------
+
+  def __init__( s, nbytes=2**20 ):
+    s.nbytes = nbytes
+    s.pages  = {}
+
+  def __len__( s ):
+    return s.nbytes
+
+  #-----------------------------------------------------------------------
+  # clear
+  #-----------------------------------------------------------------------
+  # Drop all pages, i.e., zero the whole memory
+
+  def clear( s ):
+    s.pages.clear()
+
+  #-----------------------------------------------------------------------
+  # Helpers
+  #-----------------------------------------------------------------------
+
+  def _check( s, addr, nbytes ):
+    if addr < 0 or addr + nbytes > s.nbytes:
+      raise IndexError( "SparseMemory address {:#x} out of range".format( addr ) )
+
+  def _page( s, page_num ):
+    page = s.pages.get( page_num )
+    if page is None:
+      page = s.pages[ page_num ] = bytearray( page_nbytes )
+    return page
+
+  def _bounds( s, idx ):
+    start = 0        if idx.start is None else int( idx.start )
+    stop  = s.nbytes if idx.stop  is None else int( idx.stop  )
+    assert idx.step is None, "SparseMemory does not support strides"
+    return start, max( start, stop )
+
+  #-----------------------------------------------------------------------
+  # read_bytes/write_bytes
+  #-----------------------------------------------------------------------
+
+  def read_bytes( s, addr, nbytes ):
+
+    s._check( addr, nbytes )
+
+    data = bytearray( nbytes )
+    pos  = 0
+    while pos < nbytes:
+      offset = (addr + pos) & page_mask
+      chunk  = min( nbytes - pos, page_nbytes - offset )
+      page   = s.pages.get( (addr + pos) >> page_nbits )
+      if page is not None:
+        data[pos:pos+chunk] = page[offset:offset+chunk]
+      pos += chunk
+
+    return data
+
+  def write_bytes( s, addr, data ):
+
+    nbytes = len( data )
+    s._check( addr, nbytes )
+
+    pos = 0
+    while pos < nbytes:
+      offset   = (addr + pos) & page_mask
+      chunk    = min( nbytes - pos, page_nbytes - offset )
+      page_num = (addr + pos) >> page_nbits
+      value    = data[pos:pos+chunk]
+      if page_num in s.pages or value.strip( b'\x00' ):
+        s._page( page_num )[offset:offset+chunk] = value
+      pos += chunk
+
+  #-----------------------------------------------------------------------
+  # read/write
+  #-----------------------------------------------------------------------
+  # Little-endian integer accesses, with a fast path for aligned words
+
+  def read( s, addr, nbytes ):
+
+    offset = addr & page_mask
+    if nbytes == 4 and offset <= page_nbytes - 4 and 0 <= addr < s.nbytes:
+      page = s.pages.get( addr >> page_nbits )
+      if page is None:
+        return 0
+      return struct.unpack_from( "<I", page, offset )[0]
+
+    value = 0
+    for byte in reversed( s.read_bytes( addr, nbytes ) ):
+      value = (value << 8) | byte
+    return value
+
+  def write( s, addr, nbytes, value ):
+
+    offset = addr & page_mask
+    if nbytes == 4 and offset <= page_nbytes - 4 and 0 <= addr < s.nbytes:
+      struct.pack_into( "<I", s._page( addr >> page_nbits ), offset,
+                        value & 0xFFFFFFFF )
+      return
+
+    data = bytearray( nbytes )
+    for i in xrange( nbytes ):
+      data[i] = value & 0xFF
+      value >>= 8
+    s.write_bytes( addr, data )
+
+  #-----------------------------------------------------------------------
+  # bytearray interface
+  #-----------------------------------------------------------------------
+
+  def __getitem__( s, idx ):
+
+    if isinstance( idx, slice ):
+      start, stop = s._bounds( idx )
+      return s.read_bytes( start, stop - start )
+
+    addr = int( idx )
+    s._check( addr, 1 )
+    page = s.pages.get( addr >> page_nbits )
+    return 0 if page is None else page[ addr & page_mask ]
+
+  def __setitem__( s, idx, value ):
+
+    if isinstance( idx, slice ):
+      start, stop = s._bounds( idx )
+      data = bytearray( value )
+      if len( data ) != stop - start:
+        raise ValueError( "SparseMemory slice assignment cannot change its size" )
+      s.write_bytes( start, data )
+      return
+
+    addr = int( idx )
+    s._check( addr, 1 )
+    s._page( addr >> page_nbits )[ addr & page_mask ] = int( value )
+
+  #-----------------------------------------------------------------------
+  # equality
+  #-----------------------------------------------------------------------
+  # Pages which were never written compare equal to zero pages
+
+  def __eq__( s, other ):
+
+    if not isinstance( other, SparseMemory ):
+      return NotImplemented
+
+    if s.nbytes != other.nbytes:
+      return False
+
+    zeros = bytearray( page_nbytes )
+    for page_num in set( s.pages ) | set( other.pages ):
+      if s.pages.get( page_num, zeros ) != other.pages.get( page_num, zeros ):
+        return False
+
+    return True
+
+  def __ne__( s, other ):
+    result = s.__eq__( other )
+    return result if result is NotImplemented else not result
@@ -12,6 +12,7 @@
 from __future__ import print_function
 
 import binascii
+import bisect
 
 class SparseMemoryImage (object):
 
@@ -42,6 +43,7 @@ class SparseMemoryImage (object):
   def __init__( self ):
     self.sections = []
     self.symbols  = {}
+    self._symbol_index = {}
 
   #-----------------------------------------------------------------------
   # add/get sections
@@ -53,6 +55,7 @@ class SparseMemoryImage (object):
     else:
       sec = SparseMemoryImage.Section( section, addr, data )
       self.sections.append( sec )
+    self._symbol_index = {}
 
   def get_section( self, section_name ):
     for section in self.sections:
@@ -63,6 +66,21 @@ class SparseMemoryImage (object):
   def get_sections( self ):
     return self.sections
 
+  #-----------------------------------------------------------------------
+  # copy
+  #-----------------------------------------------------------------------
+  # Copies the sections (and their data) and the symbols, so the copy can
+  # be modified without affecting this image
+
+  def copy( self ):
+    mem_image = SparseMemoryImage()
+    for section in self.sections:
+      mem_image.add_section( section.name, section.addr,
+                             bytearray( section.data ) )
+    for name, addr in self.symbols.iteritems():
+      mem_image.add_symbol( name, addr )
+    return mem_image
+
   #-----------------------------------------------------------------------
   # print_section_table
   #-----------------------------------------------------------------------
@@ -81,10 +99,48 @@ class SparseMemoryImage (object):
 
   def add_symbol( self, symbol_name, symbol_addr ):
     self.symbols[ symbol_name ] = symbol_addr
+    self._symbol_index = {}
 
   def get_symbol( self, symbol_name ):
     return self.symbols[ symbol_name ]
 
+  #-----------------------------------------------------------------------
+  # lookup_symbol
+  #-----------------------------------------------------------------------
+  # Returns ( name, offset ) for the closest symbol at or below addr, or
+  # ( None, None ) if there is none. If section_names is given, only
+  # symbols inside those sections are considered. Names starting with a
+  # dot (section and local labels) are skipped. The sorted index for each
+  # set of sections is built on the first lookup after the image changes.
+  # If several symbols share an address we return the first by name.
+
+  def lookup_symbol( self, addr, section_names=None ):
+
+    key = None if section_names is None else frozenset( section_names )
+
+    if key not in self._symbol_index:
+
+      symbols = [ ( a, n ) for n, a in self.symbols.iteritems()
+                  if not n.startswith( '.' ) ]
+
+      if key is not None:
+        ranges  = [ ( sec.addr, sec.addr + len( sec.data ) )
+                    for sec in self.sections if sec.name in key ]
+        symbols = [ ( a, n ) for a, n in symbols
+                    if any( lo <= a < hi for lo, hi in ranges ) ]
+
+      index = sorted( symbols )
+      self._symbol_index[key] = ( [ a for a, n in index ],
+                                  [ n for a, n in index ] )
+
+    addrs, names = self._symbol_index[key]
+    idx = bisect.bisect_right( addrs, addr ) - 1
+    if idx < 0:
+      return None, None
+
+    idx = bisect.bisect_left( addrs, addrs[idx] )
+    return names[idx], addr - addrs[idx]
+
   #-----------------------------------------------------------------------
   # equality
   #-----------------------------------------------------------------------
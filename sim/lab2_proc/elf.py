@@ -21,6 +21,7 @@
 # Author : Christopher Batten
 # Date   : May 20, 2014
 
+import mmap
 import struct
 
 from SparseMemoryImage import SparseMemoryImage
@@ -94,16 +95,16 @@ class ElfHeader (object):
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( self, data=None ):
+  def __init__( self, data=None, offset=0 ):
     if data != None:
-      self.from_bytes( data )
+      self.from_bytes( data, offset )
 
   #-----------------------------------------------------------------------
   # from_bytes
   #-----------------------------------------------------------------------
 
-  def from_bytes( self, data ):
-    ehdr_list = struct.unpack( ElfHeader.FORMAT, data )
+  def from_bytes( self, data, offset=0 ):
+    ehdr_list = struct.unpack_from( ElfHeader.FORMAT, data, offset )
     self.ident     = ehdr_list[0]
     self.type      = ehdr_list[1]
     self.machine   = ehdr_list[2]
@@ -236,16 +237,16 @@ class ElfSectionHeader (object):
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( self, data=None ):
+  def __init__( self, data=None, offset=0 ):
     if data != None:
-      self.from_bytes( data )
+      self.from_bytes( data, offset )
 
   #-----------------------------------------------------------------------
   # from_bytes
   #-----------------------------------------------------------------------
 
-  def from_bytes( self, data ):
-    shdr_list = struct.unpack( ElfSectionHeader.FORMAT, data )
+  def from_bytes( self, data, offset=0 ):
+    shdr_list = struct.unpack_from( ElfSectionHeader.FORMAT, data, offset )
     self.name      = shdr_list[0]
     self.type      = shdr_list[1]
     self.flags     = shdr_list[2]
@@ -341,16 +342,16 @@ class ElfSymTabEntry (object):
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( self, data=None ):
+  def __init__( self, data=None, offset=0 ):
     if data != None:
-      self.from_bytes( data )
+      self.from_bytes( data, offset )
 
   #-----------------------------------------------------------------------
   # from_bytes
   #-----------------------------------------------------------------------
 
-  def from_bytes( self, data ):
-    sym_list = struct.unpack( ElfSymTabEntry.FORMAT, data )
+  def from_bytes( self, data, offset=0 ):
+    sym_list = struct.unpack_from( ElfSymTabEntry.FORMAT, data, offset )
     self.name  = sym_list[0]
     self.value = sym_list[1]
     self.size  = sym_list[2]
@@ -398,78 +399,70 @@ class ElfSymTabEntry (object):
 #-------------------------------------------------------------------------
 # elf_reader
 #-------------------------------------------------------------------------
-# Opens and parses an ELF file into a sparse memory image object.
+# Opens and parses an ELF file into a sparse memory image object. We map
+# the whole file into memory and make a single pass over the section
+# header table, unpacking each header in place. The data of each loaded
+# section is a read-only buffer into the mapping, so nothing is copied
+# until the image is actually written into a memory. NOBITS sections
+# (.bss and .sbss) have no data in the file and are zero filled. File
+# objects without a file descriptor (e.g., StringIO) are read instead.
 
 def elf_reader( file_obj ):
 
-  # Read the data for the ELF header
+  try:
+    elf_data = mmap.mmap( file_obj.fileno(), 0, access=mmap.ACCESS_READ )
+  except ( AttributeError, ValueError, EnvironmentError ):
+    file_obj.seek( 0 )
+    elf_data = file_obj.read()
 
-  ehdr_data = file_obj.read( ElfHeader.NBYTES )
+  if len( elf_data ) < ElfHeader.NBYTES:
+    raise ValueError( "Not a valid ELF file" )
 
   # Construct an ELF header object
 
-  ehdr = ElfHeader( ehdr_data )
+  ehdr = ElfHeader( elf_data )
 
   # Verify if its a known format and realy an ELF file
 
   if ehdr.ident[0:4] != '\x7fELF':
     raise ValueError( "Not a valid ELF file" )
 
-  # We need to find the section string table so we can figure out the
-  # name of each section. We know that the section header for the section
-  # string table is entry shstrndx, so we first get the data for this
-  # section header.
-
-  file_obj.seek( ehdr.shoff + ehdr.shstrndx * ehdr.shentsize )
-  shdr_data = file_obj.read(ehdr.shentsize)
+  if ehdr.shentsize < ElfSectionHeader.NBYTES \
+      or ehdr.shoff + ehdr.shnum * ehdr.shentsize > len( elf_data ):
+    raise ValueError( "Truncated ELF section header table" )
 
-  # Construct a section header object for the section string table
+  # Unpack all of the section headers. The section header for the
+  # section string table is entry shstrndx, which we need to name the
+  # other sections.
 
-  shdr = ElfSectionHeader( shdr_data )
+  shdrs = [ ElfSectionHeader( elf_data, ehdr.shoff + i * ehdr.shentsize )
+            for i in xrange( ehdr.shnum ) ]
 
-  # Read the data for the section header table
+  shstrtab_offset = shdrs[ ehdr.shstrndx ].offset
 
-  file_obj.seek( shdr.offset )
-  shstrtab_data = file_obj.read( shdr.size )
+  def get_str( offset ):
+    end = elf_data.find( '\0', offset )
+    return elf_data[ offset : end if end >= 0 else len( elf_data ) ]
 
   # Load sections
 
-  symtab_data = None
-  strtab_data = None
-
   mem_image = SparseMemoryImage()
+  symtab    = None
 
-  for section_idx in range(ehdr.shnum):
-
-    # Read the data for the section header
-
-    file_obj.seek( ehdr.shoff + section_idx * ehdr.shentsize )
-    shdr_data = file_obj.read(ehdr.shentsize)
+  for shdr in shdrs:
 
-    # Pad the returned string in case the section header is not long
-    # enough (otherwise the unpack function would not work)
+    # Remember the symbol table, its string table is given by sh_link
 
-    shdr_data = shdr_data.ljust( ElfSectionHeader.NBYTES, '\0' )
-
-    # Construct a section header object
-
-    shdr = ElfSectionHeader( shdr_data )
-
-    # Find the section name
-
-    start = shstrtab_data[shdr.name:]
-    section_name = start.partition('\0')[0]
+    if shdr.type == ElfSectionHeader.TYPE_SYMTAB:
+      symtab = shdr
+      continue
 
     # Only sections marked as alloc should be written to memory
 
     if not ( shdr.flags & ElfSectionHeader.FLAGS_ALLOC ):
       continue
 
-    # Read the section data if it exists
-
-    if section_name not in ['.sbss', '.bss']:
-      file_obj.seek( shdr.offset )
-      data = file_obj.read( shdr.size )
+    section_name = get_str( shstrtab_offset + shdr.name )
 
     # NOTE: the .bss and .sbss sections don't actually contain any
     # data in the ELF.  These sections should be initialized to zero.
@@ -477,67 +470,42 @@ def elf_reader( file_obj ):
     #
     # - http://stackoverflow.com/questions/610682/bss-section-in-elf-file
 
+    if shdr.type == ElfSectionHeader.TYPE_NOBITS:
+      data = bytearray( shdr.size )
     else:
-      data = '\0' * shdr.size
+      data = buffer( elf_data, shdr.offset, shdr.size )
 
-    # Save the data holding the symbol string table
+    section = SparseMemoryImage.Section( section_name, shdr.addr, data )
+    mem_image.add_section( section )
 
-    if shdr.type == ElfSectionHeader.TYPE_STRTAB:
-      strtab_data = data
+  # Load symbols. We skip the first symbol since it both "designates the
+  # first entry in the table and serves as the undefined symbol index".
+  # We only load symbols of the three types we care about.
 
-    # Save the data holding the symbol table
+  if symtab is None or symtab.link >= len( shdrs ):
+    return mem_image
 
-    elif shdr.type == ElfSectionHeader.TYPE_SYMTAB:
-      symtab_data = data
+  strtab_offset = shdrs[ symtab.link ].offset
 
-    # Otherwise create section and append it to our list of sections
+  valid_sym_types = \
+  [
+    ElfSymTabEntry.TYPE_NOTYPE,
+    ElfSymTabEntry.TYPE_OBJECT,
+    ElfSymTabEntry.TYPE_FUNC,
+  ]
 
-    else:
-      section = SparseMemoryImage.Section( section_name, shdr.addr, data )
-      mem_image.add_section( section )
+  sym = ElfSymTabEntry()
+  num_symbols = symtab.size / ElfSymTabEntry.NBYTES
+  for sym_idx in xrange( 1, num_symbols ):
 
-  # Load symbols. We skip the first symbol since it both "designates the
-  # first entry in the table and serves as the undefined symbol index".
-  # For now, I have commented this out, since we are not really using it.
-
-  # num_symbols = len(symtab_data) / ElfSymTabEntry.NBYTES
-  # for sym_idx in xrange(1,num_symbols):
-  #
-  #   # Read the data for a symbol table entry
-  #
-  #   start = sym_idx * ElfSymTabEntry.NBYTES
-  #   sym_data = symtab_data[start:start+ElfSymTabEntry.NBYTES]
-  #
-  #   # Construct a symbol table entry
-  #
-  #   sym = ElfSymTabEntry( sym_data )
-  #
-  #   # Get the symbol type
-  #
-  #   sym_type  = sym.info & 0xf
-  #
-  #   # Check to see if symbol is one of the three types we want to load
-  #
-  #   valid_sym_types = \
-  #   [
-  #     ElfSymTabEntry.TYPE_NOTYPE,
-  #     ElfSymTabEntry.TYPE_OBJECT,
-  #     ElfSymTabEntry.TYPE_FUNC,
-  #   ]
-  #
-  #   # Check to see if symbol is one of the three types we want to load
-  #
-  #   if sym_type not in valid_sym_types:
-  #     continue
-  #
-  #   # Get the symbol name from the string table
-  #
-  #   start = strtab_data[sym.name:]
-  #   name = start.partition('\0')[0]
-  #
-  #   # Add symbol to the sparse memory image
-  #
-  #   mem_image.add_symbol( name, sym.value )
+    sym.from_bytes( elf_data, symtab.offset + sym_idx * ElfSymTabEntry.NBYTES )
+
+    if ( sym.info & 0xf ) not in valid_sym_types:
+      continue
+
+    name = get_str( strtab_offset + sym.name )
+    if name:
+      mem_image.add_symbol( name, sym.value )
 
   return mem_image
 
@@ -1,26 +1,19 @@
 #=========================================================================
 # proc_sim_eval
 #=========================================================================
-# Run the evaluations on the baseline and alternative design.
+# Run the evaluations on the baseline and alternative design. The runs
+# are spread over all cpus and memoized in sweep-cache, see sim_sweep.py.
 
 import os
+import sys
 
-from subprocess import check_output, CalledProcessError
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+
+from lab2_proc.sim_sweep import sweep
 
 impls  = [ "fl", "base", "alt" ]
 inputs = [ "vvadd-unopt", "vvadd-opt", "cmult", "mfilt", "bsearch" ]
 
-eval_runs = []
-
-for impl in impls:
-  for input_ in inputs:
-    eval_runs.append([ impl, input_ ])
-
-# Get path to simulator script
-
-sim_dir = os.path.dirname( os.path.abspath( __file__ ) )
-sim     = sim_dir + os.path.sep + 'proc-sim'
-
 # Print header
 
 print ""
@@ -29,33 +22,20 @@ print ""
 
 # Run the simulator
 
-for eval_run in eval_runs:
-
-  # Command
+results = sweep( "proc-sim", [ ( "impl", impls ), ( "input", inputs ) ],
+                 [ "--verify", "--max-cycles", "15000" ] )
 
-  impl   = eval_run[0]
-  input_ = eval_run[1]
-
-  cmd = [ sim, "--impl", impl, "--input", input_, "--stats", "--verify", "--max-cycles",  "15000", ]
-
-  try:
-    result = check_output( cmd ).strip()
-  except CalledProcessError as e:
+for result in results:
+  if "error" in result:
     raise Exception( "Error running simulator!\n\n"
-                     "Simulator command line: {cmd}\n\n"
-                     "Simulator output:\n {output}"
-                     .format( cmd=' '.join(e.cmd), output=e.output ) )
-
-  # Find result
+                     "{error}\n\n"
+                     "Simulator output:\n {output}".format( **result ) )
 
-  cpi = None
-  for line in result.splitlines():
-    if line.startswith(' CPI '):
-      cpi = line.split('=')[1].strip()
+# Display results
 
-  # Display result
-
-  print "  - {:<5} {:<13} {:>5}".format( impl, input_, cpi )
+for result in results:
+  print "  - {:<5} {:<13} {:>5.2f}".format( result["options"]["impl"],
+                                           result["options"]["input"],
+                                           result["stats"]["cpi"] )
 
 print ""
-
@@ -0,0 +1,266 @@
+#=========================================================================
+# sim_sweep
+#=========================================================================
+# Runs a simulator script (imul-sim, proc-sim, mem-sim, net-sim,
+# score-sim, mcore-sim) over the cross product of a set of options in a
+# process pool and collects the statistics each run prints with --stats.
+# All of the simulators print their statistics as "name = value" lines,
+# which we parse into a dict with names like num_cycles, cpi, miss_rate,
+# or average_latency.
+#
+# Every point of a sweep is memoized in a cache directory as a small JSON
+# file whose name is a hash of the simulator, its options, the contents
+# of any input files given on the command line, and all the sources in
+# the labs the simulator depends on. Rerunning a sweep only simulates the
+# points which are new or whose sources changed. Failed runs are not
+# cached.
+#
+# A matrix is a list of ( option, values ) pairs, for example
+#
+#  [ ( "impl",        [ "base", "alt" ]       ),
+#    ( "input",       [ "vvadd-unopt", "cmult" ] ),
+#    ( "mem-latency", [ 0, 4 ]                ) ]
+#
+# A value of True turns a flag on, None or False leaves the option out,
+# and the special option "args" gives positional arguments (e.g., the
+# binary for score-sim).
+
+import csv
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import tempfile
+
+from subprocess import check_output, CalledProcessError, STDOUT
+
+#-------------------------------------------------------------------------
+# Parameters
+#-------------------------------------------------------------------------
+
+sim_dir = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+
+# Script and source directories of each simulator
+
+simulators = {
+  "imul-sim"  : ( "lab1_imul/imul-sim",    [ "lab1_imul" ] ),
+  "proc-sim"  : ( "lab2_proc/proc-sim",    [ "lab1_imul", "lab2_proc" ] ),
+  "mem-sim"   : ( "lab3_mem/mem-sim",      [ "lab2_proc", "lab3_mem" ] ),
+  "net-sim"   : ( "lab4_net/net-sim",      [ "lab4_net" ] ),
+  "score-sim" : ( "lab5_mcore/score-sim",  [ "lab1_imul", "lab2_proc", "lab3_mem",
+                                             "lab4_net", "lab5_mcore" ] ),
+  "mcore-sim" : ( "lab5_mcore/mcore-sim",  [ "lab1_imul", "lab2_proc", "lab3_mem",
+                                             "lab4_net", "lab5_mcore" ] ),
+}
+
+# Files which cannot change the result of a simulation
+
+ignored_exts = ( ".pyc", ".vcd", ".json", ".csv", ".S" )
+
+#-------------------------------------------------------------------------
+# sources_hash
+#-------------------------------------------------------------------------
+
+def sources_hash( simulator ):
+
+  h = hashlib.sha1()
+  for lab in sorted( simulators[ simulator ][1] + [ "vc" ] ):
+    for dirpath, dirnames, filenames in os.walk( os.path.join( sim_dir, lab ) ):
+      dirnames[:] = sorted( d for d in dirnames if not d.startswith( "." ) )
+      for filename in sorted( filenames ):
+        if filename.startswith( "." ) or filename.endswith( ignored_exts ):
+          continue
+        path = os.path.join( dirpath, filename )
+        with open( path, "rb" ) as fp:
+          h.update( os.path.relpath( path, sim_dir ) )
+          h.update( hashlib.sha1( fp.read() ).digest() )
+
+  return h.hexdigest()
+
+#-------------------------------------------------------------------------
+# expand
+#-------------------------------------------------------------------------
+# Returns the list of points (lists of ( option, value ) pairs) in the
+# cross product of the matrix, varying the last option fastest
+
+def expand( matrix ):
+  names = [ name for name, values in matrix ]
+  return [ zip( names, values )
+           for values in itertools.product( *[ v for n, v in matrix ] ) ]
+
+#-------------------------------------------------------------------------
+# command
+#-------------------------------------------------------------------------
+
+def command( simulator, point, extra_args=() ):
+
+  cmd  = [ os.path.join( sim_dir, simulators[ simulator ][0] ), "--stats" ]
+  args = []
+  for name, value in point:
+    if name == "args":
+      args.extend( value if isinstance( value, ( list, tuple ) ) else [ value ] )
+    elif value is True:
+      cmd.append( "--" + name )
+    elif value is not None and value is not False:
+      cmd.extend([ "--" + name, str( value ) ])
+
+  return cmd + list( extra_args ) + [ str( arg ) for arg in args ]
+
+#-------------------------------------------------------------------------
+# point_key
+#-------------------------------------------------------------------------
+# Hash of everything which determines the result of a point. Arguments
+# which name existing files (e.g., binaries) are hashed by content.
+
+def point_key( simulator, point, extra_args, src_hash ):
+
+  h = hashlib.sha1()
+  h.update( json.dumps([ simulator, point, list( extra_args ) ]) )
+  h.update( src_hash )
+  for arg in command( simulator, point, extra_args )[1:]:
+    if os.path.isfile( arg ):
+      with open( arg, "rb" ) as fp:
+        h.update( hashlib.sha1( fp.read() ).digest() )
+
+  return h.hexdigest()
+
+#-------------------------------------------------------------------------
+# parse_stats
+#-------------------------------------------------------------------------
+
+def parse_value( value ):
+  for conv in [ int, float ]:
+    try:
+      return conv( value )
+    except ValueError:
+      pass
+  return None
+
+def parse_stats( output ):
+
+  stats = {}
+  for line in output.splitlines():
+    name, sep, value = line.partition( "=" )
+    name  = name.strip().lower().replace( " ", "_" ).replace( "-", "_" )
+    value = parse_value( value.strip() )
+    if sep and name.replace( "_", "" ).isalnum() and value is not None:
+      stats[ name ] = value
+
+  return stats
+
+#-------------------------------------------------------------------------
+# run_point
+#-------------------------------------------------------------------------
+# Worker for the process pool. Returns a result dict with the statistics
+# or, if the simulator failed, the error and the tail of its output.
+
+def run_point( args ):
+
+  simulator, point, extra_args, key = args
+
+  result = { "simulator" : simulator, "options" : dict( point ),
+             "key" : key, "cached" : False }
+
+  cmd = command( simulator, point, extra_args )
+  try:
+    output = check_output( cmd, stderr=STDOUT )
+    result["stats"] = parse_stats( output )
+  except CalledProcessError as e:
+    result["error"]  = "{} exited with {}".format( " ".join( cmd ), e.returncode )
+    result["output"] = "\n".join( e.output.splitlines()[-20:] )
+
+  return result
+
+#-------------------------------------------------------------------------
+# Cache
+#-------------------------------------------------------------------------
+
+def cache_load( cache_dir, key ):
+  try:
+    with open( os.path.join( cache_dir, key + ".json" ) ) as fp:
+      result = json.load( fp )
+  except ( EnvironmentError, ValueError ):
+    return None
+  result["cached"] = True
+  return result
+
+def cache_save( cache_dir, result ):
+
+  # Write to a temporary file and rename it so that concurrent sweeps
+  # never see a partially written entry
+
+  try:
+    if not os.path.isdir( cache_dir ):
+      os.makedirs( cache_dir )
+    fd, tmp_filename = tempfile.mkstemp( dir=cache_dir )
+    with os.fdopen( fd, "w" ) as fp:
+      json.dump( result, fp, sort_keys=True )
+    os.rename( tmp_filename, os.path.join( cache_dir, result["key"] + ".json" ) )
+  except EnvironmentError:
+    pass
+
+#-------------------------------------------------------------------------
+# sweep
+#-------------------------------------------------------------------------
+# Runs every point of the matrix which is not in the cache on a pool of
+# jobs workers (default: one per cpu) and returns the results in matrix
+# order. progress( result ) is called as each point finishes.
+
+def sweep( simulator, matrix, extra_args=(), jobs=None,
+           cache_dir="sweep-cache", progress=None ):
+
+  src_hash = sources_hash( simulator )
+  points   = expand( matrix )
+  keys     = [ point_key( simulator, point, extra_args, src_hash )
+               for point in points ]
+
+  results = {}
+  if cache_dir:
+    for key in keys:
+      result = cache_load( cache_dir, key )
+      if result is not None:
+        results[ key ] = result
+        if progress:
+          progress( result )
+
+  todo = [ ( simulator, point, list( extra_args ), key )
+           for point, key in zip( points, keys ) if key not in results ]
+
+  # Identical points only need to run once
+
+  todo = dict( ( args[3], args ) for args in todo ).values()
+
+  if todo:
+    pool = multiprocessing.Pool( jobs )
+    for result in pool.imap_unordered( run_point, todo ):
+      if cache_dir and "error" not in result:
+        cache_save( cache_dir, result )
+      results[ result["key"] ] = result
+      if progress:
+        progress( result )
+    pool.close()
+    pool.join()
+
+  return [ results[ key ] for key in keys ]
+
+#-------------------------------------------------------------------------
+# write_json/write_csv
+#-------------------------------------------------------------------------
+
+def write_json( results, fp ):
+  json.dump( results, fp, indent=2, sort_keys=True )
+  fp.write( "\n" )
+
+def write_csv( results, fp ):
+
+  options = sorted( set( name for r in results for name in r["options"] ) )
+  stats   = sorted( set( name for r in results for name in r.get( "stats", {} ) ) )
+
+  writer = csv.writer( fp )
+  writer.writerow( [ "simulator" ] + options + stats + [ "error" ] )
+  for r in results:
+    writer.writerow( [ r["simulator"] ]
+                     + [ r["options"].get( name, "" ) for name in options ]
+                     + [ r.get( "stats", {} ).get( name, "" ) for name in stats ]
+                     + [ r.get( "error", "" ) ] )
@@ -0,0 +1,144 @@
+#=========================================================================
+# ProcFL_fast_test.py
+#=========================================================================
+# Runs the instruction tests on the FL processor in its fast modes: with
+# the native-int ISA semantics (i.e., ProcFL( fast=True )) and with
+# basic-block translation (i.e., ProcFL( translate=True )).
+
+import pytest
+import random
+
+from pymtl   import *
+from harness import *
+from lab2_proc.ProcFL import ProcFL
+
+import inst_add
+import inst_addi
+import inst_and
+import inst_andi
+import inst_auipc
+import inst_beq
+import inst_bge
+import inst_bgeu
+import inst_blt
+import inst_bltu
+import inst_bne
+import inst_csr
+import inst_jal
+import inst_jalr
+import inst_lui
+import inst_lw
+import inst_mul
+import inst_or
+import inst_ori
+import inst_sll
+import inst_slli
+import inst_slt
+import inst_slti
+import inst_sltiu
+import inst_sltu
+import inst_sra
+import inst_srai
+import inst_srl
+import inst_srli
+import inst_sub
+import inst_sw
+import inst_xor
+import inst_xori
+
+#-------------------------------------------------------------------------
+# ProcFLFast/ProcFLTranslate
+#-------------------------------------------------------------------------
+
+def ProcFLFast():
+  return ProcFL( fast=True )
+
+def ProcFLTranslate():
+  return ProcFL( translate=True )
+
+proc_models = pytest.mark.parametrize( "ProcModel", [ ProcFLFast, ProcFLTranslate ],
+                                       ids=[ "fast", "translate" ] )
+
+#-------------------------------------------------------------------------
+# Register-register arithmetic, logical, and comparison instructions
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_add.gen_basic_test      ),
+  asm_test( inst_add.gen_srcs_dest_test  ),
+  asm_test( inst_add.gen_value_test      ),
+  asm_test( inst_add.gen_random_test     ),
+  asm_test( inst_sub.gen_value_test      ),
+  asm_test( inst_sub.gen_random_test     ),
+  asm_test( inst_mul.gen_value_test      ),
+  asm_test( inst_mul.gen_random_test     ),
+  asm_test( inst_and.gen_random_test     ),
+  asm_test( inst_or.gen_random_test      ),
+  asm_test( inst_xor.gen_random_test     ),
+  asm_test( inst_slt.gen_value_test      ),
+  asm_test( inst_slt.gen_random_test     ),
+  asm_test( inst_sltu.gen_value_test     ),
+  asm_test( inst_sltu.gen_random_test    ),
+  asm_test( inst_sra.gen_value_test      ),
+  asm_test( inst_sra.gen_random_test     ),
+  asm_test( inst_srl.gen_value_test      ),
+  asm_test( inst_srl.gen_random_test     ),
+  asm_test( inst_sll.gen_value_test      ),
+  asm_test( inst_sll.gen_random_test     ),
+])
+@proc_models
+def test_rr( name, test, ProcModel, dump_vcd ):
+  run_test( ProcModel, test, dump_vcd )
+
+#-------------------------------------------------------------------------
+# Register-immediate arithmetic, logical, and comparison instructions
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_addi.gen_value_test     ),
+  asm_test( inst_addi.gen_random_test    ),
+  asm_test( inst_andi.gen_value_test     ),
+  asm_test( inst_andi.gen_random_test    ),
+  asm_test( inst_ori.gen_value_test      ),
+  asm_test( inst_ori.gen_random_test     ),
+  asm_test( inst_xori.gen_value_test     ),
+  asm_test( inst_xori.gen_random_test    ),
+  asm_test( inst_slti.gen_value_test     ),
+  asm_test( inst_slti.gen_random_test    ),
+  asm_test( inst_sltiu.gen_value_test    ),
+  asm_test( inst_sltiu.gen_random_test   ),
+  asm_test( inst_srai.gen_random_test    ),
+  asm_test( inst_srli.gen_random_test    ),
+  asm_test( inst_slli.gen_random_test    ),
+  asm_test( inst_lui.gen_random_test     ),
+  asm_test( inst_auipc.gen_random_test   ),
+])
+@proc_models
+def test_rimm( name, test, ProcModel, dump_vcd ):
+  run_test( ProcModel, test, dump_vcd )
+
+#-------------------------------------------------------------------------
+# Memory, control flow, and CSR instructions
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_lw.gen_value_test       ),
+  asm_test( inst_lw.gen_random_test      ),
+  asm_test( inst_sw.gen_basic_test       ),
+  asm_test( inst_sw.gen_random_test      ),
+  asm_test( inst_sw.gen_self_modifying_test ),
+  asm_test( inst_beq.gen_random_test     ),
+  asm_test( inst_bne.gen_random_test     ),
+  asm_test( inst_blt.gen_random_test     ),
+  asm_test( inst_bge.gen_random_test     ),
+  asm_test( inst_bltu.gen_random_test    ),
+  asm_test( inst_bgeu.gen_random_test    ),
+  asm_test( inst_jal.gen_basic_test      ),
+  asm_test( inst_jalr.gen_basic_test     ),
+  asm_test( inst_csr.gen_value_test      ),
+  asm_test( inst_csr.gen_random_test     ),
+  asm_test( inst_csr.gen_core_stats_test ),
+])
+@proc_models
+def test_misc( name, test, ProcModel, dump_vcd ):
+  run_test( ProcModel, test, dump_vcd )
@@ -35,6 +35,7 @@ import inst_sw
 @pytest.mark.parametrize( "name,test", [
   asm_test( inst_sw.gen_basic_test     ),
   asm_test( inst_sw.gen_random_test    ),
+  asm_test( inst_sw.gen_self_modifying_test ),
 ])
 def test_sw( name, test, dump_vcd ):
   run_test( ProcFL, test, dump_vcd )
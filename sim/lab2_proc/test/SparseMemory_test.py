@@ -0,0 +1,101 @@
+#=========================================================================
+# SparseMemory_test.py
+#=========================================================================
+
+import pytest
+import random
+
+from lab2_proc.SparseMemory import SparseMemory, page_nbytes
+
+#-------------------------------------------------------------------------
+# test_zero_fill
+#-------------------------------------------------------------------------
+
+def test_zero_fill():
+
+  mem = SparseMemory()
+
+  assert len( mem ) == 2**20
+  assert mem[0x2000] == 0
+  assert mem[0xffffc:0x100000] == bytearray( 4 )
+  assert mem.read( 0x200, 4 ) == 0
+
+  # Reads and zero writes do not allocate pages
+
+  mem[0:0x3000] = bytearray( 0x3000 )
+  assert mem.pages == {}
+
+#-------------------------------------------------------------------------
+# test_random
+#-------------------------------------------------------------------------
+# Compare random accesses, including ones which straddle pages, against
+# a flat bytearray
+
+def test_random():
+
+  nbytes = 16*page_nbytes
+  ref    = bytearray( nbytes )
+  mem    = SparseMemory( nbytes )
+
+  for i in xrange( 1000 ):
+
+    addr = random.randint( 0, nbytes - 64 )
+    kind = random.randint( 0, 3 )
+
+    if kind == 0:
+      ref[addr] = mem[addr] = random.randint( 0, 255 )
+
+    elif kind == 1:
+      data = bytearray( random.randint( 0, 255 ) for _ in xrange( 64 ) )
+      ref[addr:addr+64] = data
+      mem[addr:addr+64] = data
+
+    elif kind == 2:
+      nbytes_access = random.choice( [ 1, 2, 4 ] )
+      value = random.getrandbits( 8*nbytes_access )
+      mem.write( addr, nbytes_access, value )
+      for j in xrange( nbytes_access ):
+        ref[addr+j] = ( value >> (8*j) ) & 0xFF
+
+    else:
+      assert mem.read( addr, 4 ) == \
+        sum( ref[addr+j] << (8*j) for j in xrange( 4 ) )
+
+  assert mem[:] == ref
+
+#-------------------------------------------------------------------------
+# test_out_of_range
+#-------------------------------------------------------------------------
+
+def test_out_of_range():
+
+  mem = SparseMemory( page_nbytes )
+
+  with pytest.raises( IndexError ):
+    mem[page_nbytes] = 1
+
+  with pytest.raises( IndexError ):
+    mem.read( page_nbytes - 2, 4 )
+
+  with pytest.raises( ValueError ):
+    mem[0:4] = bytearray( 8 )
+
+#-------------------------------------------------------------------------
+# test_eq_clear
+#-------------------------------------------------------------------------
+
+def test_eq_clear():
+
+  mem_a = SparseMemory()
+  mem_b = SparseMemory()
+
+  mem_a[0x2000] = 1
+  assert mem_a != mem_b
+
+  mem_b[0x2000:0x2004] = bytearray( [ 1, 0, 0, 0 ] )
+  mem_b[0x8000] = 0
+  assert mem_a == mem_b
+
+  mem_a.clear()
+  assert mem_a.pages == {}
+  assert mem_a == SparseMemory()
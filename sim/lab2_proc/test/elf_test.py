@@ -51,3 +51,88 @@ def test_basic( tmpdir ):
 
   assert mem_image == mem_image_test
 
+
+#-------------------------------------------------------------------------
+# test_bss_symbols
+#-------------------------------------------------------------------------
+# Add a .bss section and a symbol table to an ELF file written by
+# elf_writer and check that .bss is zero filled and that the symbols are
+# loaded and indexed
+
+def test_bss_symbols( tmpdir ):
+
+  mem_image = SparseMemoryImage()
+  mem_image.add_section( ".text", 0x0200, bytearray( range( 16 ) ) )
+
+  with tmpdir.join("elf-test").open('wb') as file_obj:
+    elf.elf_writer( mem_image, file_obj )
+
+  data = bytearray( tmpdir.join("elf-test").read('rb') )
+
+  ehdr = elf.ElfHeader( data )
+
+  # Symbol string table and symbol table (the first entry is null)
+
+  strtab = "\0_start\0loop\0data\0main\0"
+  syms   = [ ( 0, 0, 0 ), ( 1, 0x200, elf.ElfSymTabEntry.TYPE_FUNC ),
+             ( 8, 0x208, elf.ElfSymTabEntry.TYPE_NOTYPE ),
+             ( 13, 0x2000, elf.ElfSymTabEntry.TYPE_OBJECT ),
+             ( 18, 0x200, elf.ElfSymTabEntry.TYPE_FUNC ) ]
+
+  symtab = bytearray()
+  for name, value, info in syms:
+    symtab.extend( struct.pack( elf.ElfSymTabEntry.FORMAT,
+                                name, value, 0, info, 0, 0 ) )
+
+  # New section headers for .bss, .strtab, and .symtab at the end
+
+  def mk_shdr( type_, flags, addr, offset, size, link ):
+    shdr = elf.ElfSectionHeader()
+    shdr.name, shdr.type, shdr.flags, shdr.addr = 0, type_, flags, addr
+    shdr.offset, shdr.size, shdr.link = offset, size, link
+    shdr.info, shdr.addralign, shdr.entsize = 0, 0, 0
+    return shdr.to_bytes()
+
+  strtab_offset = len( data )
+  symtab_offset = strtab_offset + len( strtab )
+  shdrs_offset  = symtab_offset + len( symtab )
+
+  old_shdrs = data[ ehdr.shoff : ehdr.shoff + ehdr.shnum * ehdr.shentsize ]
+
+  data += strtab + symtab + old_shdrs
+  data += mk_shdr( elf.ElfSectionHeader.TYPE_NOBITS,
+                   elf.ElfSectionHeader.FLAGS_ALLOC, 0x3000, 0, 64, 0 )
+  data += mk_shdr( elf.ElfSectionHeader.TYPE_STRTAB, 0, 0,
+                   strtab_offset, len( strtab ), 0 )
+  data += mk_shdr( elf.ElfSectionHeader.TYPE_SYMTAB, 0, 0,
+                   symtab_offset, len( symtab ), ehdr.shnum + 1 )
+
+  ehdr.shoff  = shdrs_offset
+  ehdr.shnum += 3
+  data[ 0 : elf.ElfHeader.NBYTES ] = ehdr.to_bytes()
+
+  tmpdir.join("elf-test").write( str( data ), 'wb' )
+
+  with tmpdir.join("elf-test").open('rb') as file_obj:
+    mem_image_test = elf.elf_reader( file_obj )
+
+  # The new sections are unnamed, which is fine for the reader
+
+  sections = mem_image_test.get_sections()
+  assert [ s.addr for s in sections ] == [ 0x0200, 0x3000 ]
+  assert sections[0].data == bytearray( range( 16 ) )
+  assert sections[1].data == bytearray( 64 )
+
+  assert mem_image_test.symbols == \
+    { "_start" : 0x200, "loop" : 0x208, "data" : 0x2000, "main" : 0x200 }
+
+  assert mem_image_test.get_symbol( "loop" ) == 0x208
+  assert mem_image_test.lookup_symbol( 0x1fc  ) == ( None, None )
+  assert mem_image_test.lookup_symbol( 0x204  ) == ( "_start", 4 )
+  assert mem_image_test.lookup_symbol( 0x210  ) == ( "loop", 8 )
+  assert mem_image_test.lookup_symbol( 0x2004 ) == ( "data", 4 )
+
+  # Only the symbols inside the given sections, "data" is not in .text
+
+  assert mem_image_test.lookup_symbol( 0x2004, [ ".text" ] ) == ( "loop", 0x1dfc )
+  assert mem_image_test.lookup_symbol( 0x2004, []          ) == ( None, None )
@@ -5,6 +5,7 @@
 # memory, and a run_test function.
 
 import struct
+import sys
 
 from pymtl import *
 
@@ -13,6 +14,11 @@ from pclib.test import TestSource, TestSink
 from pclib.test import TestMemory
 
 from lab2_proc.tinyrv2_encoding import assemble
+from lab2_proc.SparseMemory     import SparseMemory
+from lab2_proc.tinyrv2_cosim    import TinyRV2CoSim
+from lab2_proc.tinyrv2_predecode import predecode
+from lab2_proc.test.harness_pool import checkout_harness, reset_msgs
+from lab2_proc.test.harness_pool import reset_test_memory
 
 #=========================================================================
 # TestHarness
@@ -58,6 +64,11 @@ class TestHarness (Model):
     s.proc   = ProcModel     ()
     s.mem    = TestMemory    ( MemMsg4B(), 2, mem_stall_prob, mem_latency )
 
+    # Back the test memory with a SparseMemory so that its footprint
+    # scales with the data we touch instead of the address span
+
+    s.mem.mem = SparseMemory( len( s.mem.mem ) )
+
     # Dump VCD
 
     if dump_vcd:
@@ -111,12 +122,29 @@ class TestHarness (Model):
         stop_addr  = section.addr + len(section.data)
         self.mem.mem[start_addr:stop_addr] = section.data
 
+    # Predecode the text section for ProcFL with the fast semantics
+
+    isa = getattr( self.proc, 'isa', None )
+    if hasattr( isa, 'predecoded' ):
+      isa.predecoded = predecode( mem_image )
+
   #-----------------------------------------------------------------------
   # cleanup
   #-----------------------------------------------------------------------
 
   def cleanup( s ):
-    del s.mem.mem[:]
+    s.mem.mem.clear()
+
+  #-----------------------------------------------------------------------
+  # recycle
+  #-----------------------------------------------------------------------
+  # Empty the source, sink, and memory so that a pooled harness can run
+  # another test program
+
+  def recycle( s ):
+    reset_msgs( s.src )
+    reset_msgs( s.sink )
+    reset_test_memory( s.mem )
 
   #-----------------------------------------------------------------------
   # done
@@ -139,55 +167,77 @@ class TestHarness (Model):
 #=========================================================================
 # run_test
 #=========================================================================
+# With cosim=True, processors which export a commit trace (the RTL
+# processors) are checked against the ISA semantics on every committed
+# instruction, see tinyrv2_cosim. By default co-simulation is turned on
+# with the --cosim pytest option.
+
+def cosim_enabled():
+  if hasattr( sys, '_called_from_test' ):
+    import pytest
+    return pytest.config.getoption('cosim')
+  return False
 
 def run_test( ProcModel, gen_test, dump_vcd=None,
               src_delay=0, sink_delay=0,
               mem_stall_prob=0, mem_latency=0,
-              max_cycles=10000 ):
+              max_cycles=10000, cosim=None ):
 
-  # Instantiate and elaborate the model
+  # Instantiate and elaborate the model, or reuse one from the harness
+  # pool (see harness_pool)
 
-  model = TestHarness( ProcModel, dump_vcd,
-                       src_delay, sink_delay,
-                       mem_stall_prob, mem_latency )
+  def make_harness():
+    model = TestHarness( ProcModel, dump_vcd,
+                         src_delay, sink_delay,
+                         mem_stall_prob, mem_latency )
+    model.vcd_file = dump_vcd
+    return model
 
-  model.vcd_file = dump_vcd
-  model.elaborate()
+  key = ( ProcModel, src_delay, sink_delay, mem_stall_prob, mem_latency )
 
-  # Assemble the test program
+  with checkout_harness( key, make_harness, dump_vcd ) as \
+       ( model, sim ):
 
-  mem_image = assemble( gen_test() )
+    # Assemble the test program
 
-  # Load the program into the model
+    mem_image = assemble( gen_test() )
 
-  model.load( mem_image )
+    # Load the program into the model
 
-  # Create a simulator using the simulation tool
+    model.load( mem_image )
 
-  sim = SimulationTool( model )
+    # Golden model for co-simulation
 
-  # Run the simulation
+    if cosim is None:
+      cosim = cosim_enabled()
 
-  print()
+    checker = None
+    if cosim and hasattr( model.proc, 'commit_pc' ):
+      checker = TinyRV2CoSim( mem_image )
 
-  sim.reset()
-  while not model.done() and sim.ncycles < max_cycles:
-    sim.print_line_trace()
-    sim.cycle()
+    # Run the simulation
+
+    print()
 
-  # print the very last line trace after the last tick
+    sim.reset()
+    while not model.done() and sim.ncycles < max_cycles:
+      sim.print_line_trace()
+      if checker is not None:
+        checker.tick( model.proc )
+      sim.cycle()
 
-  sim.print_line_trace()
+    # print the very last line trace after the last tick
 
-  # Force a test failure if we timed out
+    sim.print_line_trace()
 
-  assert sim.ncycles < max_cycles
+    # Force a test failure if we timed out
 
-  # Add a couple extra ticks so that the VCD dump is nicer
+    assert sim.ncycles < max_cycles
 
-  sim.cycle()
-  sim.cycle()
-  sim.cycle()
+    # Add a couple extra ticks so that the VCD dump is nicer
 
-  model.cleanup()
+    sim.cycle()
+    sim.cycle()
+    sim.cycle()
 
+    model.cleanup()
@@ -0,0 +1,215 @@
+#=========================================================================
+# harness_pool
+#=========================================================================
+# Most test cases only differ in the messages and the memory contents, yet
+# each one builds a new test harness, elaborates it, and creates a new
+# SimulationTool (which for Verilog models also means importing the
+# verilated model again). With the --harness-pool pytest option the test
+# runners instead check out an elaborated harness and its simulator from
+# a pool, keyed by the model class and everything else that changes the
+# structure of the harness (delays, stall probability, latency, ...).
+# Elaboration is then paid once per configuration per pytest session.
+#
+# A harness is only returned to the pool when its test passed, so a
+# failing test never leaves a broken harness behind. Before we hand out a
+# harness again we call its recycle() method, which must empty the test
+# sources/sinks and the test memory; the test runner then loads the new
+# messages and memory image and resets the simulator as usual.
+#
+# A model whose state survives a reset sets the class attribute poolable
+# = False, and a harness which contains one is never returned to the
+# pool. FL models keep their state in Python objects (and in the middle
+# of a greenlet) which the reset signal does not touch. The blocking
+# caches keep their valid and dirty bits in a register file without
+# reset, so the cache wrappers and the lab5 cores which contain them are
+# not pooled either; in practice only the lab2 RTL processors are.
+
+from __future__ import print_function
+
+import sys
+
+from collections import deque
+from contextlib  import contextmanager
+
+from pymtl import Model, SimulationTool
+
+#-------------------------------------------------------------------------
+# pool_enabled
+#-------------------------------------------------------------------------
+
+def pool_enabled():
+  if hasattr( sys, '_called_from_test' ):
+    import pytest
+    return pytest.config.getoption('harness_pool')
+  return False
+
+#-------------------------------------------------------------------------
+# poolable
+#-------------------------------------------------------------------------
+# A harness can go back to the pool unless it or one of its models (a
+# direct attribute, or an element of a list attribute) sets poolable to
+# False. We look at the models the harness actually contains rather than
+# the class or factory the test passed in, since a factory such as
+# lambda: ProcFL( fast=True ) hides what it builds.
+
+def poolable( harness ):
+
+  models = [ harness ]
+  for value in vars( harness ).values():
+    if isinstance( value, Model ):
+      models.append( value )
+    elif isinstance( value, list ):
+      models.extend( x for x in value if isinstance( x, Model ) )
+
+  return all( getattr( model, 'poolable', True ) for model in models )
+
+#-------------------------------------------------------------------------
+# reset_msgs
+#-------------------------------------------------------------------------
+# Empties a test source or sink (or their simple versions) in place, so
+# that the harness can load the messages of the next test.
+
+def reset_msgs( model ):
+  for simple in [ getattr( model, 'src', None ), getattr( model, 'sink', None ),
+                  model ]:
+    if hasattr( simple, 'msgs' ) and hasattr( simple, 'idx' ):
+      del simple.msgs[:]
+      simple.idx = 0
+      return
+  raise ValueError( "{} has no messages to reset".format( model ) )
+
+#-------------------------------------------------------------------------
+# reset_test_memory
+#-------------------------------------------------------------------------
+# Zeroes the backing store of a TestMemory and drops any requests and
+# responses still in flight in its port adapters: the processors keep
+# fetching after the last message, so a finished test usually leaves
+# some behind. The adapters keep their messages in deques; a Pipeline
+# keeps one slot per stage, which must stay there.
+
+def reset_adapter( adapter ):
+
+  for value in vars( adapter ).values():
+    if isinstance( value, deque ):
+      if type( adapter ).__name__ == "Pipeline":
+        for i in xrange( len( value ) ):
+          value[i] = None
+      else:
+        value.clear()
+    elif type( value ).__module__.startswith( ( "pclib.cl", "pclib.fl" ) ) \
+         and not isinstance( value, Model ):
+      reset_adapter( value )
+
+def reset_test_memory( mem ):
+
+  if hasattr( mem.mem, 'clear' ):
+    mem.mem.clear()
+  else:
+    mem.mem[:] = bytearray( len( mem.mem ) )
+
+  for adapter in mem.reqs_q + mem.resps_q:
+    reset_adapter( adapter )
+
+#=========================================================================
+# HarnessPool
+#=========================================================================
+
+class HarnessPool (object):
+
+  def __init__( s ):
+    s.free           = {}
+    s.num_elaborated = 0
+    s.num_reused     = 0
+
+  #-----------------------------------------------------------------------
+  # get
+  #-----------------------------------------------------------------------
+  # Returns ( harness, sim ) for the given key, either from the pool or
+  # by calling make_harness() and elaborating the result
+
+  def get( s, key, make_harness ):
+
+    free = s.free.get( key )
+    if free:
+      harness, sim = free.pop()
+      harness.recycle()
+      sim.ncycles = 0
+      s.num_reused += 1
+      return harness, sim
+
+    harness = make_harness()
+    harness.elaborate()
+    s.num_elaborated += 1
+
+    return harness, SimulationTool( harness )
+
+  #-----------------------------------------------------------------------
+  # put
+  #-----------------------------------------------------------------------
+
+  def put( s, key, harness, sim ):
+    s.free.setdefault( key, [] ).append( ( harness, sim ) )
+
+  #-----------------------------------------------------------------------
+  # clear
+  #-----------------------------------------------------------------------
+
+  def clear( s ):
+    s.free.clear()
+
+# The pool shared by all tests in this process
+
+harness_pool = HarnessPool()
+
+#-------------------------------------------------------------------------
+# checkout_harness
+#-------------------------------------------------------------------------
+# Context manager which yields ( harness, sim ). The harness comes from
+# the pool if pooling is enabled (and we are not dumping VCD, which is
+# set up at elaboration); otherwise we build a fresh one. The harness
+# goes back to the pool only if it is poolable and the body of the with
+# statement did not raise.
+#
+#  with checkout_harness( key, make_harness, dump_vcd ) as \
+#       ( harness, sim ):
+#    harness.load( ... )
+#    sim.reset()
+#    ...
+
+@contextmanager
+def checkout_harness( key, make_harness, dump_vcd=None ):
+
+  if not pool_enabled() or dump_vcd:
+    harness = make_harness()
+    harness.elaborate()
+    yield harness, SimulationTool( harness )
+    return
+
+  harness, sim = harness_pool.get( key, make_harness )
+  yield harness, sim
+  if poolable( harness ):
+    harness_pool.put( key, harness, sim )
+
+#-------------------------------------------------------------------------
+# run_harness
+#-------------------------------------------------------------------------
+# Same as pclib.test.run_sim but for an already elaborated harness
+
+def run_harness( harness, sim, max_cycles=5000 ):
+
+  print()
+
+  sim.reset()
+  while not harness.done() and sim.ncycles < max_cycles:
+    sim.print_line_trace()
+    sim.cycle()
+
+  sim.print_line_trace()
+
+  # Force a test failure if we timed out
+
+  assert sim.ncycles < max_cycles
+
+  sim.cycle()
+  sim.cycle()
+  sim.cycle()
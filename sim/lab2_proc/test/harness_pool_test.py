@@ -0,0 +1,176 @@
+#=========================================================================
+# harness_pool_test.py
+#=========================================================================
+
+import pytest
+
+from collections import deque
+
+from pymtl      import *
+from pclib.test import TestSource, TestSink
+
+from lab2_proc.test              import harness_pool
+from lab2_proc.test.harness_pool import HarnessPool, run_harness
+from lab2_proc.test.harness_pool import reset_msgs, reset_adapter, poolable
+
+#-------------------------------------------------------------------------
+# TestHarness
+#-------------------------------------------------------------------------
+# Source connected straight to a sink
+
+class TestHarness (Model):
+
+  def __init__( s, src_delay, sink_delay ):
+
+    s.src  = TestSource( 32, [], src_delay  )
+    s.sink = TestSink  ( 32, [], sink_delay )
+
+    s.connect( s.src.out, s.sink.in_ )
+
+    s.num_recycled = 0
+
+  def recycle( s ):
+    reset_msgs( s.src )
+    reset_msgs( s.sink )
+    s.num_recycled += 1
+
+  def done( s ):
+    return s.src.done and s.sink.done
+
+  def line_trace( s ):
+    return s.src.line_trace() + " > " + s.sink.line_trace()
+
+#-------------------------------------------------------------------------
+# test_reuse
+#-------------------------------------------------------------------------
+# Run different messages through the same pooled harness
+
+@pytest.mark.parametrize( "src_delay,sink_delay", [ (0,0), (3,5) ] )
+def test_reuse( src_delay, sink_delay ):
+
+  pool = HarnessPool()
+  key  = ( TestHarness, src_delay, sink_delay )
+  make = lambda: TestHarness( src_delay, sink_delay )
+
+  harnesses = []
+  for i in xrange( 4 ):
+
+    harness, sim = pool.get( key, make )
+    harnesses.append( harness )
+
+    msgs = [ Bits( 32, 100*i + j ) for j in xrange( 10 + i ) ]
+    harness.src.src.msgs.extend( msgs )
+    harness.sink.sink.msgs.extend( msgs )
+
+    run_harness( harness, sim )
+    assert sim.ncycles < 100
+
+    pool.put( key, harness, sim )
+
+  assert all( harness is harnesses[0] for harness in harnesses )
+  assert harnesses[0].num_recycled == 3
+  assert pool.num_elaborated == 1
+  assert pool.num_reused     == 3
+
+  # A different configuration gets its own harness
+
+  harness, sim = pool.get( ( TestHarness, 1, 1 ), lambda: TestHarness( 1, 1 ) )
+  assert harness is not harnesses[0]
+  assert pool.num_elaborated == 2
+
+#-------------------------------------------------------------------------
+# test_reset_adapter
+#-------------------------------------------------------------------------
+
+class Pipeline (object):
+  __module__ = "pclib.cl.Pipeline"
+  def __init__( s ):
+    s.data = deque( [ None, 1, 2 ] )
+
+class OutAdapter (object):
+  __module__ = "pclib.cl.OutAdapter"
+  def __init__( s ):
+    s.data = deque( [ 3 ], maxlen=1 )
+    s.pipe = Pipeline()
+
+def test_reset_adapter():
+
+  adapter = OutAdapter()
+  reset_adapter( adapter )
+
+  assert list( adapter.data ) == []
+  assert list( adapter.pipe.data ) == [ None, None, None ]
+
+#-------------------------------------------------------------------------
+# test_poolable
+#-------------------------------------------------------------------------
+
+# Decided by the models in the harness, not by the name of the class or
+# factory the test passed in
+
+class ModelHarness (Model):
+
+  def __init__( s, ModelClass ):
+    s.model = ModelClass()
+
+def test_poolable():
+
+  from lab2_proc.ProcFL      import ProcFL
+  from lab2_proc.ProcBaseRTL import ProcBaseRTL
+
+  def ProcFLFast():
+    return ProcFL( fast=True )
+
+  assert poolable( TestHarness( 0, 0 ) )
+  assert poolable( ModelHarness( ProcBaseRTL ) )
+  assert not poolable( ModelHarness( ProcFL ) )
+  assert not poolable( ModelHarness( ProcFLFast ) )
+
+# The caches do not reset their valid and dirty bits
+
+def test_poolable_cache():
+
+  from lab3_mem.BlockingCacheFL      import BlockingCacheFL
+  from lab3_mem.BlockingCacheBaseRTL import BlockingCacheBaseVRTL
+  from lab3_mem.BlockingCacheAltRTL  import BlockingCacheAltVRTL
+  from lab5_mcore.SingleCoreRTL      import SingleCoreVRTL
+  from lab5_mcore.SingleCorePRTL     import SingleCorePRTL
+  from lab5_mcore.MultiCoreRTL       import MultiCoreVRTL
+  from lab5_mcore.MultiCorePRTL      import MultiCorePRTL
+
+  assert poolable( ModelHarness( BlockingCacheFL ) )
+  assert not poolable( ModelHarness( BlockingCacheBaseVRTL ) )
+  assert not poolable( ModelHarness( BlockingCacheAltVRTL ) )
+
+  for CoreModel in [ SingleCoreVRTL, SingleCorePRTL,
+                     MultiCoreVRTL,  MultiCorePRTL ]:
+    assert not CoreModel.poolable
+
+#-------------------------------------------------------------------------
+# test_pool_fl
+#-------------------------------------------------------------------------
+# inst_add and inst_sub have the same code layout, so a ProcFL reused
+# from the first test would run its cached decode of the add at the PC
+# of the sub
+
+def test_pool_fl( monkeypatch ):
+
+  from lab2_proc.ProcFL       import ProcFL
+  from lab2_proc.test.harness import run_test
+
+  import inst_add
+  import inst_sub
+
+  def ProcFLFast():
+    return ProcFL( fast=True )
+
+  pool = HarnessPool()
+  monkeypatch.setattr( harness_pool, 'pool_enabled', lambda: True )
+  monkeypatch.setattr( harness_pool, 'harness_pool', pool )
+
+  run_test( ProcFLFast, inst_add.gen_basic_test )
+  run_test( ProcFLFast, inst_sub.gen_basic_test )
+
+  assert pool.num_elaborated == 2
+  assert pool.num_reused     == 0
+  assert not pool.free
@@ -39,6 +39,30 @@ def gen_basic_test():
     .word 0x01020304
   """
 
+#-------------------------------------------------------------------------
+# gen_self_modifying_test
+#-------------------------------------------------------------------------
+# Execute the instruction at label patch once, overwrite it with a store,
+# and then execute it again. The second execution must see the new
+# instruction (addi x3, x0, 2 is encoded as 0x00200193). The patch label
+# is at 0x220 since each of the eight instructions before it is 4B.
+
+def gen_self_modifying_test():
+  return """
+    csrr x1, mngr2proc < 0x00000220
+    csrr x2, mngr2proc < 0x00200193
+    jal  x5, patch
+    csrw proc2mngr, x3 > 1
+    sw   x2, 0(x1)
+    jal  x5, patch
+    csrw proc2mngr, x3 > 2
+    jal  x0, done
+  patch:
+    addi x3, x0, 1
+    jalr x0, x5, 0
+  done:
+  """
+
 #-------------------------------------------------------------------------
 # gen_random_test
 #-------------------------------------------------------------------------
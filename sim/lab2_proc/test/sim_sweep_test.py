@@ -0,0 +1,139 @@
+#=========================================================================
+# sim_sweep_test.py
+#=========================================================================
+# The sweeps run a fake simulator script which prints statistics in the
+# same format as the real ones and counts how often it ran.
+
+import json
+import os
+import StringIO
+import sys
+
+import pytest
+
+from lab2_proc import sim_sweep
+from lab2_proc.sim_sweep import sweep, expand, command, parse_stats
+from lab2_proc.sim_sweep import write_json, write_csv
+
+fake_sim = """\
+#!{python}
+import sys
+args = sys.argv[1:]
+open( {count!r}, "a" ).write( "x" )
+impl = args[ args.index( "--impl" ) + 1 ]
+lat  = int( args[ args.index( "--mem-latency" ) + 1 ] )
+if impl == "bad":
+  print "Traceback: something broke"
+  sys.exit( 1 )
+print ""
+print " num_cycles = {{}}".format( 100 + lat )
+print " CPI        = {{:1.2f}}".format( 1.0 + lat / 10.0 )
+print "Average Latency = 3.5"
+print "  [ passed ]"
+"""
+
+@pytest.fixture
+def fake_simulator( tmpdir, monkeypatch ):
+
+  count  = tmpdir.join( "count" )
+  script = tmpdir.join( "fake-sim" )
+  script.write( fake_sim.format( python=sys.executable, count=str( count ) ) )
+  script.chmod( 0755 )
+
+  monkeypatch.setitem( sim_sweep.simulators, "fake-sim", ( str( script ), [] ) )
+
+  return lambda: len( count.read() ) if count.check() else 0
+
+#-------------------------------------------------------------------------
+# test_expand
+#-------------------------------------------------------------------------
+
+def test_expand():
+
+  points = expand([ ( "impl", [ "base", "alt" ] ), ( "mem-latency", [ 0, 4, 8 ] ) ])
+
+  assert len( points ) == 6
+  assert points[0] == [ ( "impl", "base" ), ( "mem-latency", 0 ) ]
+  assert points[1] == [ ( "impl", "base" ), ( "mem-latency", 4 ) ]
+
+  cmd = command( "proc-sim", [ ( "impl", "alt" ), ( "verify", True ),
+                               ( "trace", False ), ( "args", "a.elf" ) ],
+                 [ "--max-cycles", "100" ] )
+
+  assert cmd[0].endswith( "lab2_proc/proc-sim" )
+  assert cmd[1:] == [ "--stats", "--impl", "alt", "--verify",
+                      "--max-cycles", "100", "a.elf" ]
+
+#-------------------------------------------------------------------------
+# test_parse_stats
+#-------------------------------------------------------------------------
+
+def test_parse_stats():
+
+  stats = parse_stats( "\n".join([
+    " num_cycles = 1234",
+    " CPI        = 1.25",
+    "miss_rate    = 0.0625",
+    "Zero-load latency = 6.0",
+    "  [ passed ]",
+    "x == y",
+  ]) )
+
+  assert stats == { "num_cycles" : 1234, "cpi" : 1.25, "miss_rate" : 0.0625,
+                    "zero_load_latency" : 6.0 }
+
+#-------------------------------------------------------------------------
+# test_sweep
+#-------------------------------------------------------------------------
+
+def test_sweep( tmpdir, fake_simulator ):
+
+  cache_dir = str( tmpdir.join( "cache" ) )
+  matrix    = [ ( "impl", [ "base", "alt" ] ), ( "mem-latency", [ 0, 4, 8 ] ) ]
+
+  results = sweep( "fake-sim", matrix, jobs=3, cache_dir=cache_dir )
+
+  assert fake_simulator() == 6
+  assert [ r["options"]["mem-latency"] for r in results ] == [ 0, 4, 8 ]*2
+  assert [ r["stats"]["num_cycles"] for r in results ] == [ 100, 104, 108 ]*2
+  assert results[1]["stats"]["cpi"] == 1.4
+  assert not any( r["cached"] for r in results )
+
+  # Rerunning only computes the new points
+
+  matrix  = [ ( "impl", [ "base", "alt" ] ), ( "mem-latency", [ 0, 4, 8, 12 ] ) ]
+  results = sweep( "fake-sim", matrix, jobs=3, cache_dir=cache_dir )
+
+  assert fake_simulator() == 8
+  assert [ r["cached"] for r in results ] == [ True, True, True, False ]*2
+  assert results[3]["stats"]["num_cycles"] == 112
+
+  # Structured output
+
+  fp = StringIO.StringIO()
+  write_json( results, fp )
+  assert len( json.loads( fp.getvalue() ) ) == 8
+
+  fp = StringIO.StringIO()
+  write_csv( results, fp )
+  lines = fp.getvalue().splitlines()
+  assert lines[0] == "simulator,impl,mem-latency,average_latency,cpi,num_cycles,error"
+  assert lines[1] == "fake-sim,base,0,3.5,1.0,100,"
+
+#-------------------------------------------------------------------------
+# test_sweep_error
+#-------------------------------------------------------------------------
+# Failed points report the output and are not cached
+
+def test_sweep_error( tmpdir, fake_simulator ):
+
+  cache_dir = str( tmpdir.join( "cache" ) )
+  matrix    = [ ( "impl", [ "base", "bad" ] ), ( "mem-latency", [ 0 ] ) ]
+
+  for i in xrange( 2 ):
+    results = sweep( "fake-sim", matrix, cache_dir=cache_dir )
+    assert "error" in results[1]
+    assert "something broke" in results[1]["output"]
+
+  assert fake_simulator() == 3
+  assert results[0]["cached"] and not results[1]["cached"]
@@ -0,0 +1,111 @@
+#=========================================================================
+# tinyrv2_checkpoint_test.py
+#=========================================================================
+
+import pytest
+import random
+
+from lab2_proc.tinyrv2_encoding   import assemble
+from lab2_proc.tinyrv2_isa_sim    import TinyRV2IsaSim
+from lab2_proc.tinyrv2_checkpoint import TinyRV2Checkpoint
+from lab2_proc.tinyrv2_checkpoint import stats_en_pending
+from lab2_proc.tinyrv2_checkpoint import checkpoint_isa_sim
+from lab2_proc.tinyrv2_checkpoint import restore_isa_sim
+from lab2_proc.tinyrv2_checkpoint import gen_restore_image
+
+#-------------------------------------------------------------------------
+# mk_random_isa_sim
+#-------------------------------------------------------------------------
+# An ISA simulator with random registers, PCs, and some data in memory
+
+def mk_random_isa_sim( num_cores ):
+
+  rgen = random.Random( 0xdeadbeef + num_cores )
+
+  isa_sim = TinyRV2IsaSim( num_cores=num_cores )
+  for i, isa in enumerate( isa_sim.isas ):
+    isa.R.regs[1:] = [ rgen.getrandbits(32) for _ in xrange(31) ]
+    isa.PC = 0x400 + 0x40*i
+
+  isa_sim.isas[-1].stats_en = True
+  isa_sim.mngr2proc_q[0].extend( [ 1, 2, 3 ] )
+  isa_sim.M.mem[0x2000:0x2100] = bytearray( range(256) )
+
+  return isa_sim
+
+#-------------------------------------------------------------------------
+# test_save_load
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "num_cores", [ 1, 4 ] )
+def test_save_load( num_cores, tmpdir ):
+
+  isa_sim = mk_random_isa_sim( num_cores )
+
+  ckpt = checkpoint_isa_sim( isa_sim )
+  ckpt.save( str( tmpdir.join( "ckpt.json" ) ) )
+
+  ckpt_restored = TinyRV2Checkpoint.load( str( tmpdir.join( "ckpt.json" ) ) )
+
+  new_isa_sim = TinyRV2IsaSim( num_cores=num_cores )
+  restore_isa_sim( new_isa_sim, ckpt_restored )
+
+  assert new_isa_sim.M.mem == isa_sim.M.mem
+  assert list( new_isa_sim.mngr2proc_q[0] ) == [ 1, 2, 3 ]
+
+  for isa, new_isa in zip( isa_sim.isas, new_isa_sim.isas ):
+    assert new_isa.PC       == isa.PC
+    assert new_isa.R.regs   == isa.R.regs
+    assert new_isa.stats_en == isa.stats_en
+    assert new_isa.coreid   == isa.coreid
+
+#-------------------------------------------------------------------------
+# test_restore_stub
+#-------------------------------------------------------------------------
+# Boot an ISA simulator from reset with the memory image we would use for
+# an RTL simulation and check the stub restores every core.
+
+@pytest.mark.parametrize( "num_cores", [ 1, 4 ] )
+def test_restore_stub( num_cores ):
+
+  ckpt = checkpoint_isa_sim( mk_random_isa_sim( num_cores ) )
+
+  mem, stub_addr = gen_restore_image( ckpt )
+  assert stub_addr > 0x2100
+
+  isa_sim = TinyRV2IsaSim( num_cores=num_cores )
+  isa_sim.M.mem[:] = mem
+
+  for step in xrange( 100 ):
+    for core, isa in enumerate( isa_sim.isas ):
+      if isa.PC != ckpt.pc[core]:
+        isa_sim.step_core( core )
+
+  for core, isa in enumerate( isa_sim.isas ):
+    assert isa.PC       == ckpt.pc[core]
+    assert isa.R.regs   == ckpt.regs[core]
+    assert isa.stats_en == ckpt.stats_en[core]
+
+#-------------------------------------------------------------------------
+# test_stats_en_pending
+#-------------------------------------------------------------------------
+
+def test_stats_en_pending():
+
+  mem_image = assemble( """
+    addi x1, x0, 1
+    addi x2, x0, 2
+    csrw stats_en, x1
+    addi x2, x0, 3
+    csrw stats_en, x0
+  """ )
+
+  isa_sim = TinyRV2IsaSim()
+  isa_sim.load( mem_image )
+
+  pending = []
+  for step in xrange( 5 ):
+    pending.append( stats_en_pending( isa_sim ) )
+    isa_sim.step()
+
+  assert pending == [ False, False, True, False, False ]
@@ -0,0 +1,109 @@
+#=========================================================================
+# tinyrv2_cosim_test.py
+#=========================================================================
+# We do not need an RTL processor to test the checker itself: we record
+# the commit trace of a second ISA simulator as the "processor" and then
+# corrupt it.
+
+import pytest
+
+from lab2_proc.tinyrv2_encoding import assemble
+from lab2_proc.tinyrv2_isa_sim  import TinyRV2IsaSim
+from lab2_proc.tinyrv2_cosim    import TinyRV2CoSim, CoSimMismatch
+
+import inst_add
+import inst_lw
+import inst_jal
+
+#-------------------------------------------------------------------------
+# gen_commit_trace
+#-------------------------------------------------------------------------
+# Returns the list of ( pc, rf_wen, rf_waddr, rf_wdata ) a correct
+# processor would commit. Like the RTL processors we assert rf_wen with
+# rf_waddr = 0 for instructions without a destination register.
+
+def gen_commit_trace( mem_image, num_mngr_msgs ):
+
+  isa_sim = TinyRV2IsaSim()
+  isa_sim.load( mem_image )
+  isa = isa_sim.isas[0]
+
+  for section in mem_image.get_sections():
+    if section.name == ".mngr2proc":
+      for i in xrange( 0, len( section.data ), 4 ):
+        isa_sim.mngr2proc_q[0].append( isa_sim.M[ section.addr + i :
+                                                  section.addr + i + 4 ] )
+
+  trace = []
+  num_msgs = 0
+  while num_msgs < num_mngr_msgs:
+    pc   = isa.PC
+    inst = isa.decode( pc, isa_sim.fetch( pc ) )
+    isa_sim.step_core( 0 )
+    num_msgs += len( isa_sim.proc2mngr_q[0] )
+    isa_sim.proc2mngr_q[0].clear()
+    rd = 0 if inst.name in [ 'sw', 'csrw' ] or inst.name[0] == 'b' else inst.rd
+    trace.append( ( pc, 1, rd, isa.R.regs[rd] ) )
+
+  return trace
+
+def num_proc2mngr_msgs( mem_image ):
+  for section in mem_image.get_sections():
+    if section.name == ".proc2mngr":
+      return len( section.data ) / 4
+  return 0
+
+#-------------------------------------------------------------------------
+# test_cosim_pass
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "gen_test", [
+  inst_add.gen_basic_test,
+  inst_add.gen_value_test,
+  inst_lw.gen_basic_test,
+  inst_jal.gen_basic_test,
+])
+def test_cosim_pass( gen_test ):
+
+  mem_image = assemble( gen_test() )
+  trace = gen_commit_trace( mem_image, num_proc2mngr_msgs( mem_image ) )
+
+  checker = TinyRV2CoSim( mem_image )
+  for commit in trace:
+    checker.commit( *commit )
+
+  assert checker.num_commits == len( trace )
+
+#-------------------------------------------------------------------------
+# test_cosim_mismatch
+#-------------------------------------------------------------------------
+# Corrupt one commit of the trace in different ways and check that we
+# stop right there
+
+@pytest.mark.parametrize( "field,value", [
+  ( 0, 0x1000 ),   # wrong pc
+  ( 1, 0      ),   # missing write
+  ( 2, 31     ),   # wrong destination
+  ( 3, 0xdead ),   # wrong value
+])
+def test_cosim_mismatch( field, value ):
+
+  mem_image = assemble( inst_add.gen_value_test() )
+  trace = gen_commit_trace( mem_image, num_proc2mngr_msgs( mem_image ) )
+
+  # Corrupt a commit which writes a register
+
+  bad = [ i for i, commit in enumerate( trace ) if commit[2] != 0 ][10]
+  trace[bad] = tuple( value if i == field else x
+                      for i, x in enumerate( trace[bad] ) )
+
+  checker = TinyRV2CoSim( mem_image )
+  with pytest.raises( CoSimMismatch ) as excinfo:
+    for commit in trace:
+      checker.commit( *commit )
+
+  assert checker.num_commits == bad + 1
+
+  report = str( excinfo.value )
+  assert "mismatch at commit {}".format( bad ) in report
+  assert report.splitlines()[-1].split()[:2] == [ "*", str( bad ) ]
@@ -5,9 +5,12 @@
 # the reference instruction bits.
 
 import pytest
+import random
 import struct
 
 from lab2_proc.tinyrv2_encoding  import assemble_inst, disassemble_inst
+from lab2_proc.tinyrv2_encoding  import decode_inst_name, tinyrv2_isa_impl
+from lab2_proc.tinyrv2_encoding  import tinyrv2_encoding_table
 from lab2_proc.SparseMemoryImage import SparseMemoryImage
 
 #-------------------------------------------------------------------------
@@ -143,6 +146,40 @@ def test_tinyrv2_inst_csrr():
 def test_tinyrv2_inst_csrw():
   check( "csrw  proc2mngr, x2",     0b01111100000000010001000001110011, "csrw  0x7c0, x02"       )
 
+#-------------------------------------------------------------------------
+# Decoder
+#-------------------------------------------------------------------------
+# The compiled decoder should agree with a linear scan of the encoding
+# table (first match wins) for every row and for random words.
+
+def linear_decode_tmpl( inst_bits ):
+  for inst_tmpl, opcode_mask, opcode_match in tinyrv2_encoding_table:
+    if (inst_bits & opcode_mask) == opcode_match:
+      return inst_tmpl
+  return None
+
+def test_tinyrv2_decode_table():
+
+  opcodes = set([ row[2] & 0x7f for row in tinyrv2_encoding_table ])
+
+  inst_words  = [ row[2] for row in tinyrv2_encoding_table ]
+  inst_words += [ random.randint(1,0xffffffff) for i in xrange(1000) ]
+  inst_words += [ (random.randint(0,0x1ffffff) << 7) | opcode
+                  for opcode in opcodes for i in xrange(1000) ]
+
+  for inst_bits in inst_words:
+
+    ref_tmpl = linear_decode_tmpl( inst_bits )
+
+    if ref_tmpl is None:
+      with pytest.raises( AssertionError ):
+        decode_inst_name( inst_bits )
+    else:
+      assert tinyrv2_isa_impl.decode_tmpl( inst_bits ) == ref_tmpl
+      assert decode_inst_name( inst_bits ) == ref_tmpl.partition(' ')[0]
+
+  assert decode_inst_name( 0 ) == " "
+
 #-------------------------------------------------------------------------
 # mk_section
 #-------------------------------------------------------------------------
@@ -154,3 +191,213 @@ def mk_section( name, addr, words ):
     data.extend(struct.pack("<I",word))
 
   return SparseMemoryImage.Section( name, addr, data )
+
+#-------------------------------------------------------------------------
+# test_assemble_cache
+#-------------------------------------------------------------------------
+
+def test_assemble_cache( tmpdir, monkeypatch ):
+
+  from lab2_proc import tinyrv2_encoding as enc
+
+  monkeypatch.setattr( enc, "asm_cache",     enc.OrderedDict() )
+  monkeypatch.setattr( enc, "asm_cache_dir", str( tmpdir ) )
+
+  asm_code = [ """
+    csrr x1, mngr2proc < {1,2,3,4}
+    addi x1, x1, 1
+    csrw proc2mngr, x1 > {2,3,4,5}
+  """, """
+    nop
+    .data
+    .word 0x01020304
+  """ ]
+
+  ref = enc.assemble_uncached( asm_code )
+
+  # Miss, then a hit in the in-process cache
+
+  hits = enc.asm_cache_hits
+  mem_image = enc.assemble( asm_code )
+  assert mem_image == ref
+  assert enc.asm_cache_hits == hits
+
+  mem_image.get_section( ".text" ).data[0] = 0xff
+  assert enc.assemble( asm_code ) == ref
+  assert enc.asm_cache_hits == hits + 1
+
+  # A fresh process only finds it on disk
+
+  assert len( tmpdir.listdir() ) == 1
+  enc.asm_cache.clear()
+  assert enc.assemble( asm_code ) == ref
+  assert enc.asm_cache_hits == hits + 2
+
+  # The in-process cache is bounded
+
+  monkeypatch.setattr( enc, "asm_cache_size", 2 )
+  for i in xrange( 4 ):
+    enc.assemble( "addi x1, x0, {}".format( i ) )
+  assert len( enc.asm_cache ) == 2
+
+#-------------------------------------------------------------------------
+# test_assemble_inst_word
+#-------------------------------------------------------------------------
+# The integer field encoders used by assemble must give the same bits as
+# the assemble_field functions for every instruction in the table
+
+def gen_field_str( tag, sym ):
+
+  if tag in [ "rs1", "rs2", "rd" ]:
+    return "x{}".format( random.randint(0,31) )
+  if tag == "shamt":
+    return str( random.randint(0,31) )
+  if tag == "csrnum":
+    return random.choice([ "mngr2proc", "proc2mngr", "numcores", "coreid",
+                           "stats_en" ])
+  if tag == "b_imm":
+    return "near"
+  if tag == "j_imm":
+    return random.choice([ "foo", "bar", "near" ])
+  if tag == "u_imm":
+    if random.randint(0,3) == 0:
+      return "%{}[{}]".format( random.choice([ "hi", "lo" ]),
+                               random.choice( sym.keys() ) )
+    return hex( random.randint(0,0xfffff) )
+  if tag == "i_imm" and random.randint(0,3) == 0:
+    return "%{}[{}]".format( random.choice([ "hi", "md", "lo" ]),
+                             random.choice( sym.keys() ) )
+  return str( random.randint(-2048,2047) )
+
+def test_assemble_inst_word():
+
+  sym = { "foo" : 0x200, "bar" : 0x1ffc, "baz" : 0xdeadbeef }
+
+  for row in tinyrv2_encoding_table:
+    (inst_name,sep,inst_tmpl) = row[0].partition(' ')
+    inst_field_tags = inst_tmpl.replace(',',' ').replace('(',' ') \
+                               .replace(')',' ').split()
+    for i in xrange(50):
+      pc = random.randrange( 0x200, 0x4000, 4 )
+      sym["near"] = pc + random.randrange( -4096, 4096, 4 )
+      inst_str = inst_tmpl
+      for tag in inst_field_tags:
+        inst_str = inst_str.replace( tag, gen_field_str( tag, sym ), 1 )
+      inst_str = inst_name + " " + inst_str
+      assert tinyrv2_isa_impl.assemble_inst_word( sym, pc, inst_str ) \
+          == assemble_inst( sym, pc, inst_str ).uint()
+
+#-------------------------------------------------------------------------
+# test_assemble_inst_word_range
+#-------------------------------------------------------------------------
+# Operands which do not fit in their field are rejected, as with the Bits
+# built by the assemble_field functions, and labels must be within the
+# signed range of a branch or jump
+
+def test_assemble_inst_word_range():
+
+  sym = { "foo" : 0x200, "far" : 0x200 + 4096, "away" : 0x200 + (1 << 20) }
+
+  def assemble_word( inst_str ):
+    return tinyrv2_isa_impl.assemble_inst_word( sym, 0x200, inst_str )
+
+  for inst_str in [ "addi x1, x2, -2047", "addi x1, x2, 0xfff",
+                    "sw x1, -2047(x2)",   "sw x1, 0xabc(x2)",
+                    "beq x1, x2, -4094",  "beq x1, x2, 0x1400",
+                    "beq x1, x2, foo",    "jal x1, far",
+                    "jal x1, -0xffffe",   "jal x1, 0x1ffffe" ]:
+    assert assemble_word( inst_str ) \
+        == assemble_inst( sym, 0x200, inst_str ).uint()
+
+  for inst_str in [ "addi x1, x2, -2049",  "addi x1, x2, 0x1000",
+                    "sw x1, -2049(x2)",    "sw x1, 0x1000(x2)",
+                    "beq x1, x2, -4098",   "beq x1, x2, 0x2000",
+                    "beq x1, x2, far",     "jal x1, away",
+                    "jal x1, -0x100002",   "jal x1, 0x200000" ]:
+    with pytest.raises( AssertionError ):
+      assemble_word( inst_str )
+
+#-------------------------------------------------------------------------
+# test_assemble_mngr
+#-------------------------------------------------------------------------
+# Single-core mngr values seen before the first curly braces are copied
+# to every core, later ones are sent to every core
+
+def test_assemble_mngr():
+
+  from lab2_proc.tinyrv2_encoding import assemble_uncached
+
+  mem_image = assemble_uncached( """
+    csrr x1, mngr2proc < 5
+    csrw proc2mngr, x1 > -1
+    csrr x2, mngr2proc < {1,2}
+    csrw proc2mngr, x2 > {3,4}
+    csrw proc2mngr, x2 > 6
+  """ )
+
+  def words( name ):
+    data = mem_image.get_section( name ).data
+    return list( struct.unpack( "<{}I".format( len(data)/4 ), str(data) ) )
+
+  assert [ s.name for s in mem_image.get_sections() ] == \
+    [ ".text", ".mngr0_2proc", ".mngr1_2proc", ".proc0_2mngr", ".proc1_2mngr" ]
+
+  assert words( ".text" ) == \
+    [ assemble_inst( {}, 0, "csrr x1, mngr2proc" ).uint(),
+      assemble_inst( {}, 0, "csrw proc2mngr, x1" ).uint(),
+      assemble_inst( {}, 0, "csrr x2, mngr2proc" ).uint(),
+      assemble_inst( {}, 0, "csrw proc2mngr, x2" ).uint(),
+      assemble_inst( {}, 0, "csrw proc2mngr, x2" ).uint() ]
+
+  assert words( ".mngr0_2proc" ) == [ 5, 1 ]
+  assert words( ".mngr1_2proc" ) == [ 5, 2 ]
+  assert words( ".proc0_2mngr" ) == [ 0xffffffff, 3, 6 ]
+  assert words( ".proc1_2mngr" ) == [ 0xffffffff, 4, 6 ]
+  assert mem_image.get_section( ".mngr0_2proc" ).addr == 0x15000
+  assert mem_image.get_section( ".proc1_2mngr" ).addr == 0x18000
+
+  for value in [ "0x100000000", "{1,-0x80000001}" ]:
+    with pytest.raises( AssertionError ):
+      assemble_uncached( "csrw proc2mngr, x1 > " + value )
+
+#-------------------------------------------------------------------------
+# test_disassemble
+#-------------------------------------------------------------------------
+
+def test_disassemble():
+
+  import StringIO
+  from lab2_proc.tinyrv2_encoding import assemble, disassemble
+  from lab2_proc.tinyrv2_encoding import disassemble_words, write_disassembly
+
+  mem_image = assemble( """
+    addi x1, x0, 1
+  loop:
+    addi x1, x1, 1
+    bne  x1, x0, loop
+  """ )
+
+  text_section = mem_image.get_section( ".text" )
+  text_section.data.extend( struct.pack( "<I", 0xffffffff ) )
+
+  words = list( disassemble_words( text_section, batch_nwords=3 ) )
+  assert [ addr for addr, word, text in words ] == [ 0x200, 0x204, 0x208, 0x20c ]
+  assert words[1][1] == assemble_inst( {}, 0, "addi x1, x1, 1" ).uint()
+  assert compare_str( words[1][2], "addi x01, x01, 0x001" )
+  assert words[3][2] == ".word 0xffffffff"
+
+  assert disassemble( mem_image ).splitlines()[2] == \
+    " {:0>8x}  {:0>8x}  {}".format( *words[2] )
+
+  mem_image.add_symbol( "_start", 0x200 )
+  mem_image.add_symbol( "loop",   0x204 )
+
+  out = StringIO.StringIO()
+  write_disassembly( mem_image, out, batch_nlines=2 )
+  lines = out.getvalue().splitlines()
+
+  assert lines[1] == "Disassembly of section .text:"
+  assert lines[3] == "00000200 <_start>:"
+  assert lines[6] == "00000204 <loop>:"
+  assert lines[7] == " {:0>8x}  {:0>8x}  {}".format( *words[1] )
+  assert len( lines ) == 10
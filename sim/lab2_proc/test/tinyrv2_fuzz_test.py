@@ -0,0 +1,126 @@
+#=========================================================================
+# tinyrv2_fuzz_test.py
+#=========================================================================
+
+import pytest
+
+from lab2_proc.tinyrv2_encoding import assemble
+from lab2_proc.tinyrv2_isa_sim  import TinyRV2IsaSim
+from lab2_proc.tinyrv2_fuzz     import RandomProgram, run_reference, minimize
+from lab2_proc.tinyrv2_fuzz     import num_regs, data_nwords
+
+#-------------------------------------------------------------------------
+# run_isa_sim
+#-------------------------------------------------------------------------
+# Runs an annotated test program on the ISA simulator and returns the
+# proc2mngr stream along with the expected one from the .proc2mngr section
+
+def run_isa_sim( test ):
+
+  mem_image = assemble( test )
+
+  isa_sim = TinyRV2IsaSim()
+  isa_sim.load( mem_image )
+
+  sections = dict( ( section.name, section ) for section in mem_image.get_sections() )
+
+  mngr2proc = sections[".mngr2proc"]
+  for i in xrange( 0, len( mngr2proc.data ), 4 ):
+    isa_sim.mngr2proc_q[0].append( isa_sim.M[ mngr2proc.addr + i :
+                                              mngr2proc.addr + i + 4 ] )
+
+  proc2mngr = sections[".proc2mngr"]
+  expected  = [ int( isa_sim.M[ proc2mngr.addr + i : proc2mngr.addr + i + 4 ] )
+                for i in xrange( 0, len( proc2mngr.data ), 4 ) ]
+
+  text   = sections[".text"]
+  isa    = isa_sim.isas[0]
+  stream = []
+  while text.addr <= isa.PC < text.addr + len( text.data ):
+    isa_sim.step_core( 0 )
+    while isa_sim.proc2mngr_q[0]:
+      stream.append( int( isa_sim.proc2mngr_q[0].popleft() ) )
+
+  return stream, expected
+
+#-------------------------------------------------------------------------
+# test_deterministic
+#-------------------------------------------------------------------------
+
+def test_deterministic():
+
+  assert RandomProgram( 42 ).items == RandomProgram( 42 ).items
+  assert RandomProgram( 42 ).gen_test() == RandomProgram( 42 ).gen_test()
+  assert RandomProgram( 42 ).items != RandomProgram( 43 ).items
+
+#-------------------------------------------------------------------------
+# test_self_checking
+#-------------------------------------------------------------------------
+# The annotated program must pass on the ISA simulator and send at least
+# the final registers and data region
+
+@pytest.mark.parametrize( "seed", range( 8 ) )
+def test_self_checking( seed ):
+
+  program = RandomProgram( seed, num_items=150 )
+  stream, expected = run_isa_sim( program.gen_test() )
+
+  assert stream == expected
+  assert len( stream ) >= num_regs + data_nwords
+
+#-------------------------------------------------------------------------
+# test_subsets
+#-------------------------------------------------------------------------
+# Any subset of the items which keeps the labels is a valid program
+
+def test_subsets():
+
+  program = RandomProgram( 7, num_items=80 )
+  items   = [ item for i, item in enumerate( program.items )
+              if i % 3 == 0 or item.endswith( ":" ) ]
+
+  stream, expected = run_isa_sim( program.gen_test( items ) )
+  assert stream == expected
+
+#-------------------------------------------------------------------------
+# test_run_reference
+#-------------------------------------------------------------------------
+# The outputs are keyed by the PC of the csrw which sends them, so every
+# key must be a csrw proc2mngr in the program
+
+def test_run_reference():
+
+  program = RandomProgram( 3 )
+  lines   = program.asm()
+  outputs = run_reference( lines )
+
+  insts = [ line for line in lines[ : lines.index( ".data" ) ]
+            if not line.endswith( ":" ) ]
+  for pc in outputs:
+    assert insts[ ( pc - 0x200 ) / 4 ].startswith( "csrw proc2mngr" )
+
+#-------------------------------------------------------------------------
+# test_minimize
+#-------------------------------------------------------------------------
+# Pretend a processor fails any program with both a mul and an sra
+
+def test_minimize():
+
+  program = RandomProgram( 11, num_items=200 )
+
+  def fails( items ):
+    insts = [ item.split()[0] for item in items if not item.endswith( ":" ) ]
+    return "mul" in insts and "sra" in insts
+
+  assert fails( program.items )
+
+  items = minimize( program.items, fails )
+  insts = [ item for item in items if not item.endswith( ":" ) ]
+
+  assert fails( items )
+  assert sorted( inst.split()[0] for inst in insts ) == [ "mul", "sra" ]
+  assert [ item for item in items if item.endswith( ":" ) ] == \
+         [ item for item in program.items if item.endswith( ":" ) ]
+
+  stream, expected = run_isa_sim( program.gen_test( items ) )
+  assert stream == expected
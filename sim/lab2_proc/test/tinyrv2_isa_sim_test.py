@@ -0,0 +1,130 @@
+#=========================================================================
+# tinyrv2_isa_sim_test.py
+#=========================================================================
+# Runs the instruction tests on the backdoor ISA simulator. There is no
+# test source/sink here, so we feed the .mngr2proc section straight into
+# the mngr2proc queue and compare what shows up in the proc2mngr queue
+# against the .proc2mngr section.
+
+import pytest
+import struct
+
+from harness import asm_test
+
+from lab2_proc.tinyrv2_encoding import assemble
+from lab2_proc.tinyrv2_isa_sim  import TinyRV2IsaSim, BackdoorMemory
+
+import inst_add
+import inst_addi
+import inst_auipc
+import inst_beq
+import inst_bge
+import inst_bltu
+import inst_bne
+import inst_csr
+import inst_jal
+import inst_jalr
+import inst_lui
+import inst_lw
+import inst_mul
+import inst_sll
+import inst_slt
+import inst_sltiu
+import inst_sra
+import inst_srai
+import inst_sub
+import inst_sw
+import inst_xori
+
+#-------------------------------------------------------------------------
+# run_isa_sim_test
+#-------------------------------------------------------------------------
+
+def run_isa_sim_test( gen_test, translate=False, max_steps=10000 ):
+
+  mem_image = assemble( gen_test() )
+
+  isa_sim = TinyRV2IsaSim( translate=translate )
+  isa_sim.load( mem_image )
+
+  def words( section ):
+    return [ struct.unpack_from( "<I", section.data, i )[0]
+             for i in xrange( 0, len(section.data), 4 ) ]
+
+  ref_msgs = []
+  for section in mem_image.get_sections():
+    if section.name == ".mngr2proc":
+      isa_sim.mngr2proc_q[0].extend( words( section ) )
+    elif section.name == ".proc2mngr":
+      ref_msgs.extend( words( section ) )
+
+  # Run until we have seen every reference message
+
+  proc2mngr_q = isa_sim.proc2mngr_q[0]
+  num_msgs    = 0
+  num_steps   = 0
+
+  while num_msgs < len( ref_msgs ) and num_steps < max_steps:
+    isa_sim.step()
+    num_steps += 1
+    while proc2mngr_q:
+      msg = proc2mngr_q.popleft()
+      assert msg == ref_msgs[ num_msgs ], \
+        "proc2mngr message {}: {:0>8x} != {:0>8x}" \
+          .format( num_msgs, msg, ref_msgs[ num_msgs ] )
+      num_msgs += 1
+
+  assert num_steps < max_steps
+
+#-------------------------------------------------------------------------
+# test_backdoor_memory
+#-------------------------------------------------------------------------
+
+def test_backdoor_memory():
+
+  mem = BackdoorMemory( 64 )
+
+  mem[0:4] = 0xdeadbeef
+  assert mem[0:4] == 0xdeadbeef
+  assert mem[0]   == 0xef
+  assert mem[3]   == 0xde
+  assert mem[1:3] == 0xadbe
+
+  mem[5] = 0x1ff
+  assert mem[4:8] == 0x0000ff00
+
+  mem[8:10] = 0xcafe
+  assert mem[8:12] == 0x0000cafe
+
+#-------------------------------------------------------------------------
+# test_isa_sim
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "name,test", [
+  asm_test( inst_add.gen_random_test     ),
+  asm_test( inst_sub.gen_random_test     ),
+  asm_test( inst_mul.gen_random_test     ),
+  asm_test( inst_slt.gen_random_test     ),
+  asm_test( inst_sra.gen_random_test     ),
+  asm_test( inst_sll.gen_random_test     ),
+  asm_test( inst_addi.gen_random_test    ),
+  asm_test( inst_xori.gen_random_test    ),
+  asm_test( inst_sltiu.gen_random_test   ),
+  asm_test( inst_srai.gen_random_test    ),
+  asm_test( inst_lui.gen_random_test     ),
+  asm_test( inst_auipc.gen_random_test   ),
+  asm_test( inst_lw.gen_random_test      ),
+  asm_test( inst_sw.gen_random_test      ),
+  asm_test( inst_sw.gen_self_modifying_test ),
+  asm_test( inst_beq.gen_random_test     ),
+  asm_test( inst_bne.gen_random_test     ),
+  asm_test( inst_bge.gen_random_test     ),
+  asm_test( inst_bltu.gen_random_test    ),
+  asm_test( inst_jal.gen_basic_test      ),
+  asm_test( inst_jalr.gen_basic_test     ),
+  asm_test( inst_csr.gen_random_test     ),
+  asm_test( inst_csr.gen_core_stats_test ),
+])
+@pytest.mark.parametrize( "translate", [ False, True ] )
+def test_isa_sim( name, test, translate ):
+  run_isa_sim_test( test, translate )
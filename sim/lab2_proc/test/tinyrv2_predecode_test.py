@@ -0,0 +1,118 @@
+#=========================================================================
+# tinyrv2_predecode_test.py
+#=========================================================================
+
+import pytest
+import random
+import struct
+
+from lab2_proc.SparseMemoryImage      import SparseMemoryImage
+from lab2_proc.tinyrv2_encoding       import assemble, decode_inst_name
+from lab2_proc.tinyrv2_encoding       import tinyrv2_encoding_table
+from lab2_proc.tinyrv2_semantics_fast import decode_fields
+from lab2_proc.tinyrv2_predecode      import PredecodeTable, np
+from lab2_proc.tinyrv2_predecode      import predecode, static_stats
+
+#-------------------------------------------------------------------------
+# mk_text_section
+#-------------------------------------------------------------------------
+# Every instruction in the encoding table with random operand bits, some
+# random (mostly illegal) words, and a few zero words
+
+def mk_text_section():
+
+  words = []
+  for row in tinyrv2_encoding_table:
+    for i in xrange(20):
+      words.append( row[2] | ( random.getrandbits(32) & ~row[1] ) )
+  words += [ random.getrandbits(32) for i in xrange(200) ]
+  words += [ 0 ] * 4
+  random.shuffle( words )
+
+  data = bytearray( struct.pack( "<{}I".format( len(words) ), *words ) )
+  return SparseMemoryImage.Section( ".text", 0x200, data ), words
+
+#-------------------------------------------------------------------------
+# test_lookup
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "use_numpy", [ False, True ] )
+def test_lookup( use_numpy ):
+
+  if use_numpy and np is None:
+    pytest.skip( "NumPy is not installed" )
+
+  section, words = mk_text_section()
+  table = PredecodeTable( section, use_numpy=use_numpy )
+
+  assert table.nwords == len( words )
+
+  for i, word in enumerate( words ):
+
+    pc = 0x200 + 4*i
+    try:
+      name = decode_inst_name( word )
+    except AssertionError:
+      name = None
+
+    entry = table.lookup( pc, word )
+    if name is None:
+      assert entry is None
+    else:
+      assert entry == ( name, decode_fields( word ) )
+
+    assert table.opcode[i] == word & 0x7F
+    assert table.funct3[i] == (word >> 12) & 0x7
+    assert table.funct7[i] == (word >> 25) & 0x7F
+
+  # Outside the section, misaligned, or the word has changed
+
+  assert table.lookup( 0x1fc, words[0] ) is None
+  assert table.lookup( 0x200 + 4*len(words), 0 ) is None
+  assert table.lookup( 0x202, words[0] ) is None
+  assert table.lookup( 0x200, words[0] ^ 1 ) is None
+
+#-------------------------------------------------------------------------
+# test_numpy_matches_python
+#-------------------------------------------------------------------------
+
+def test_numpy_matches_python():
+
+  if np is None:
+    pytest.skip( "NumPy is not installed" )
+
+  section, words = mk_text_section()
+  table_np = PredecodeTable( section, use_numpy=True  )
+  table_py = PredecodeTable( section, use_numpy=False )
+
+  assert table_np.__dict__ == table_py.__dict__
+
+#-------------------------------------------------------------------------
+# test_static_stats
+#-------------------------------------------------------------------------
+
+def test_static_stats():
+
+  mem_image = assemble( """
+    addi x1, x0, 4
+  loop:
+    lw   x2, 0(x3)
+    mul  x2, x2, x2
+    sw   x2, 4(x3)
+    addi x1, x1, -1
+    bne  x1, x0, loop
+    csrw proc2mngr, x0 > 0
+  """ )
+
+  mem_image.get_section( ".text" ).data.extend( bytearray( 4 ) )
+
+  stats = static_stats( mem_image )
+
+  assert stats['num_insts'] == 7
+  assert stats['illegal']   == 1
+  assert stats['by_name']   == { 'addi' : 2, 'lw' : 1, 'mul' : 1, 'sw' : 1,
+                                 'bne' : 1, 'csrw' : 1 }
+  assert stats['by_type']   == { 'alu' : 2, 'load' : 1, 'mul' : 1,
+                                 'store' : 1, 'branch' : 1, 'csr' : 1 }
+
+  assert predecode( SparseMemoryImage() ) is None
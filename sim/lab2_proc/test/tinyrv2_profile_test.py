@@ -0,0 +1,112 @@
+#=========================================================================
+# tinyrv2_profile_test.py
+#=========================================================================
+
+import json
+import pytest
+
+from lab2_proc.tinyrv2_encoding import assemble
+from lab2_proc.tinyrv2_isa_sim  import TinyRV2IsaSim
+from lab2_proc.tinyrv2_profile  import TinyRV2Profile
+from lab2_proc.tinyrv2_profile  import SymbolIndex
+
+#-------------------------------------------------------------------------
+# run_profile
+#-------------------------------------------------------------------------
+# Copy four words at 0x2000 up by one word and profile the program.
+# Symbols: _start (0x200), loop (0x208), and data (0x2000), where the
+# last one is not a function since it is not in .text.
+
+def run_profile( translate ):
+
+  mem_image = assemble( """
+    addi x1, x0, 4
+    lui  x3, 2
+  loop:
+    lw   x2, 0(x3)
+    sw   x2, 4(x3)
+    addi x3, x3, 4
+    addi x1, x1, -1
+    bne  x1, x0, loop
+    csrw proc2mngr, x0 > 0
+    .data
+    .word 1
+    .word 2
+    .word 3
+    .word 4
+  """ )
+
+  mem_image.add_symbol( "_start", 0x200  )
+  mem_image.add_symbol( "loop",   0x208  )
+  mem_image.add_symbol( "data",   0x2000 )
+
+  isa_sim = TinyRV2IsaSim( translate=translate )
+  isa_sim.load( mem_image )
+  isa_sim.profile = TinyRV2Profile()
+
+  while not isa_sim.proc2mngr_q[0]:
+    isa_sim.step()
+
+  return isa_sim.profile, SymbolIndex( mem_image )
+
+#-------------------------------------------------------------------------
+# test_profile
+#-------------------------------------------------------------------------
+# Translation is bypassed while profiling, so both modes should give the
+# same profile
+
+@pytest.mark.parametrize( "translate", [ False, True ] )
+def test_profile( translate ):
+
+  profile, symbols = run_profile( translate )
+
+  assert profile.num_insts == 23
+  assert profile.opcode_counts == {
+    'addi' : 9, 'lui' : 1, 'lw' : 4, 'sw' : 4, 'bne' : 4, 'csrw' : 1 }
+
+  assert profile.pc_counts[0x200] == 1
+  assert profile.pc_counts[0x208] == 4
+  assert profile.branches == { 0x218 : [ 3, 1 ] }
+
+  assert profile.func_counts( symbols ) == { '_start' : 2, 'loop' : 21 }
+
+  result = profile.to_dict( symbols )
+
+  assert result['functions'][0] == { 'function' : 'loop', 'count' : 21 }
+  assert result['branches'][0]['taken_ratio'] == 0.75
+  assert result['code_footprint_bytes'] == 32
+
+  assert result['loads'] == { 'count' : 4, 'min_addr' : 0x2000,
+                              'max_addr' : 0x200c, 'footprint_bytes' : 16 }
+  assert result['stores'] == { 'count' : 4, 'min_addr' : 0x2004,
+                               'max_addr' : 0x2010, 'footprint_bytes' : 32 }
+
+#-------------------------------------------------------------------------
+# test_symbol_index
+#-------------------------------------------------------------------------
+
+def test_symbol_index():
+
+  profile, symbols = run_profile( False )
+
+  assert symbols.lookup( 0x1fc ) == ( None, None )
+  assert symbols.lookup( 0x204 ) == ( '_start', 4 )
+  assert symbols.lookup( 0x21c ) == ( 'loop', 0x14 )
+  assert symbols.pc_str( 0x20c ) == "0000020c <loop+0x4>"
+
+#-------------------------------------------------------------------------
+# test_report
+#-------------------------------------------------------------------------
+
+def test_report( tmpdir ):
+
+  profile, symbols = run_profile( False )
+
+  report = profile.report( symbols )
+  assert "Profile: 23 instructions" in report
+  assert "00000218 <loop+0x10>" in report
+
+  filename = str( tmpdir.join( "profile.json" ) )
+  profile.save( filename, symbols )
+  with open( filename ) as fp:
+    assert json.load( fp )['num_insts'] == 23
@@ -0,0 +1,152 @@
+#=========================================================================
+# tinyrv2_simpoint_test.py
+#=========================================================================
+
+import pytest
+
+from lab2_proc.tinyrv2_encoding import assemble
+from lab2_proc.tinyrv2_isa_sim  import TinyRV2IsaSim
+from lab2_proc.tinyrv2_simpoint import BBVCollector
+from lab2_proc.tinyrv2_simpoint import find_simpoints
+from lab2_proc.tinyrv2_simpoint import estimate_cpi
+
+#-------------------------------------------------------------------------
+# mk_two_phase_collector
+#-------------------------------------------------------------------------
+# A collector with 30 intervals alternating between two loops, the first
+# of which runs twice as often as the second
+
+def mk_two_phase_collector():
+
+  collector = BBVCollector( interval=100 )
+  for i in xrange( 30 ):
+    if i % 3 == 2:
+      collector.record( 0, 0x400, 100, 0x400 )
+    else:
+      collector.record( 0, 0x800, 60, 0x800 )
+      collector.record( 0, 0x900, 40, 0x900 )
+  collector.finish()
+
+  return collector
+
+#-------------------------------------------------------------------------
+# test_bbv_collector
+#-------------------------------------------------------------------------
+
+def test_bbv_collector():
+
+  collector = BBVCollector( interval=8 )
+
+  # Blocks starting at 0x200 (with a fall through) and 0x300
+
+  collector.record( 0, 0x200, 2, 0x208 )
+  collector.record( 0, 0x208, 1, 0x300 )
+  collector.record( 0, 0x300, 4, 0x200 )
+  collector.record( 0, 0x200, 3, 0x300 )
+  collector.record( 0, 0x300, 2, 0x310 )
+  collector.finish()
+
+  assert collector.sizes == [ 10, 2 ]
+  assert collector.bbvs  == [ { 0x200 : 6, 0x300 : 4 }, { 0x300 : 2 } ]
+
+#-------------------------------------------------------------------------
+# test_isa_sim_bbv
+#-------------------------------------------------------------------------
+# Collect BBVs from a real program with and without translation
+
+@pytest.mark.parametrize( "translate", [ False, True ] )
+def test_isa_sim_bbv( translate ):
+
+  mem_image = assemble( """
+    addi x1, x0, 20
+  loop:
+    addi x2, x2, 1
+    addi x1, x1, -1
+    bne  x1, x0, loop
+    csrw proc2mngr, x2 > 20
+  """ )
+
+  isa_sim = TinyRV2IsaSim( translate=translate )
+  isa_sim.load( mem_image )
+  isa_sim.bbv = BBVCollector( interval=1000 )
+
+  while not isa_sim.proc2mngr_q[0]:
+    isa_sim.step()
+  isa_sim.bbv.finish()
+
+  assert isa_sim.bbv.sizes == [ 62 ]
+  assert isa_sim.bbv.bbvs  == [ { 0x200 : 4, 0x204 : 58 } ]
+
+#-------------------------------------------------------------------------
+# test_fast_forward
+#-------------------------------------------------------------------------
+
+def test_fast_forward():
+
+  mem_image = assemble( """
+    addi x1, x0, 100
+  loop:
+    addi x2, x2, 1
+    addi x1, x1, -1
+    bne  x1, x0, loop
+  """ )
+
+  isa_sim = TinyRV2IsaSim( translate=True )
+  isa_sim.load( mem_image )
+  isa_sim.fast_forward( 200 )
+
+  assert isa_sim.num_total_inst == [ 200 ]
+  assert isa_sim.isas[0].R.regs[2] == 67
+
+#-------------------------------------------------------------------------
+# test_find_simpoints
+#-------------------------------------------------------------------------
+
+def test_find_simpoints():
+
+  simpoints = find_simpoints( mk_two_phase_collector(), max_k=5 )
+
+  assert simpoints['k'] == 2
+  assert simpoints['total_insts'] == 3000
+
+  weights = sorted( c['weight'] for c in simpoints['clusters'] )
+  assert abs( weights[0] - 1.0/3 ) < 1e-9
+  assert abs( weights[1] - 2.0/3 ) < 1e-9
+
+  # Each point should be an interval from its own phase
+
+  for point in simpoints['points']:
+    weight = simpoints['clusters'][ point['cluster'] ]['weight']
+    phase2 = point['interval'] % 3 == 2
+    assert phase2 == ( weight < 0.5 )
+    assert point['start_inst'] == 100*point['interval']
+
+  assert len( simpoints['points'] ) == 4
+
+#-------------------------------------------------------------------------
+# test_estimate_cpi
+#-------------------------------------------------------------------------
+
+def test_estimate_cpi():
+
+  simpoints = {
+    'clusters' : [ { 'weight' : 0.75, 'num_intervals' : 30 },
+                   { 'weight' : 0.25, 'num_intervals' : 10 } ],
+    'points'   : [ { 'cluster' : 0 }, { 'cluster' : 0 },
+                   { 'cluster' : 1 }, { 'cluster' : 1 } ],
+  }
+
+  est_cpi, error = estimate_cpi( simpoints, [ 1.0, 1.0, 3.0, 3.0 ] )
+  assert abs( est_cpi - 1.5 ) < 1e-9
+  assert abs( error ) < 1e-9
+
+  est_cpi, error = estimate_cpi( simpoints, [ 1.0, 2.0, 3.0, 3.0 ] )
+  assert abs( est_cpi - ( 0.75*1.5 + 0.25*3.0 ) ) < 1e-9
+  assert error > 0.0
+
+  # No error bound with a single point per cluster
+
+  simpoints['points'] = [ { 'cluster' : 0 }, { 'cluster' : 1 } ]
+  est_cpi, error = estimate_cpi( simpoints, [ 1.0, 3.0 ] )
+  assert abs( est_cpi - 1.5 ) < 1e-9
+  assert error is None
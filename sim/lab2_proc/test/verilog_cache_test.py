@@ -0,0 +1,128 @@
+#=========================================================================
+# verilog_cache_test.py
+#=========================================================================
+# We do not need Verilator to test the cache itself: the "build" just
+# writes the output files and counts how often it ran.
+
+import multiprocessing
+import os
+import time
+
+from lab2_proc.verilog_cache import cached_build, cache_key, sources_hash
+
+#-------------------------------------------------------------------------
+# build_in
+#-------------------------------------------------------------------------
+# Worker which builds (or fetches) libVfoo.so and foo_v.py in its own
+# directory
+
+def build_in( args ):
+
+  cache_dir, work_dir, count_file = args
+
+  outputs = [ os.path.join( work_dir, name ) for name in [ "libVfoo.so", "foo_v.py" ] ]
+
+  def build():
+    with open( count_file, "a" ) as fp:
+      fp.write( "x" )
+    time.sleep( 0.2 )
+    for filename in outputs:
+      with open( filename, "w" ) as fp:
+        fp.write( "artifact " + os.path.basename( filename ) )
+
+  return cached_build( cache_dir, "1234abcd", outputs, build )
+
+#-------------------------------------------------------------------------
+# test_concurrent
+#-------------------------------------------------------------------------
+# Many workers ask for the same design at once, but only one builds it
+
+def test_concurrent( tmpdir ):
+
+  cache_dir  = str( tmpdir.mkdir( "cache" ) )
+  count_file = str( tmpdir.join( "count" ) )
+
+  work_dirs = [ str( tmpdir.mkdir( "work{}".format( i ) ) ) for i in xrange( 6 ) ]
+
+  pool = multiprocessing.Pool( 6 )
+  hits = pool.map( build_in, [ ( cache_dir, d, count_file ) for d in work_dirs ] )
+  pool.close()
+  pool.join()
+
+  assert open( count_file ).read() == "x"
+  assert sorted( hits ) == [ False ] + [ True ]*5
+
+  for work_dir in work_dirs:
+    assert open( os.path.join( work_dir, "libVfoo.so" ) ).read() == \
+           "artifact libVfoo.so"
+
+  # No temporary files are left behind
+
+  entries = os.listdir( os.path.join( cache_dir, "12" ) )
+  assert sorted( entries ) == [ "1234abcd", "1234abcd.lock" ]
+
+  # A later session hits in the cache
+
+  work_dir = str( tmpdir.mkdir( "later" ) )
+  assert build_in( ( cache_dir, work_dir, count_file ) )
+  assert open( count_file ).read() == "x"
+
+#-------------------------------------------------------------------------
+# test_failed_build
+#-------------------------------------------------------------------------
+# A failing build does not leave an entry, so the next one tries again
+
+def test_failed_build( tmpdir ):
+
+  cache_dir = str( tmpdir.mkdir( "cache" ) )
+  output    = str( tmpdir.join( "libVfoo.so" ) )
+
+  def fail():
+    raise RuntimeError( "verilator failed" )
+
+  try:
+    cached_build( cache_dir, "deadbeef", [ output ], fail )
+    assert False
+  except RuntimeError:
+    pass
+
+  def build():
+    with open( output, "w" ) as fp:
+      fp.write( "ok" )
+
+  assert not cached_build( cache_dir, "deadbeef", [ output ], build )
+  assert cached_build( cache_dir, "deadbeef", [ output ], build )
+
+#-------------------------------------------------------------------------
+# test_cache_key
+#-------------------------------------------------------------------------
+
+def test_cache_key( tmpdir ):
+
+  src_dir = tmpdir.mkdir( "src" )
+  src_dir.join( "FooVRTL.v" ).write( "module Foo; endmodule" )
+  src_dir.join( "notes.txt" ).write( "not verilog" )
+
+  top = tmpdir.join( "Foo_0x1.v" )
+  top.write( "module Foo_0x1; Foo #(.p_nbits(32)) foo(); endmodule" )
+
+  dirs = [ str( src_dir ) ]
+  key  = cache_key( str( top ), dirs, ( False, False, 'zeros' ) )
+
+  assert key == cache_key( str( top ), dirs, ( False, False, 'zeros' ) )
+
+  # Flags, included sources, and the top-level Verilog change the key
+
+  assert key != cache_key( str( top ), dirs, ( True, False, 'zeros' ) )
+
+  old_hash = sources_hash( dirs )
+  src_dir.join( "notes.txt" ).write( "still not verilog" )
+  assert sources_hash( dirs ) == old_hash
+
+  src_dir.join( "FooVRTL.v" ).write( "module Foo; wire x; endmodule" )
+  assert sources_hash( dirs ) != old_hash
+  assert key != cache_key( str( top ), dirs, ( False, False, 'zeros' ) )
+
+  new_key = cache_key( str( top ), dirs, ( False, False, 'zeros' ) )
+  top.write( "module Foo_0x1; Foo #(.p_nbits(16)) foo(); endmodule" )
+  assert new_key != cache_key( str( top ), dirs, ( False, False, 'zeros' ) )
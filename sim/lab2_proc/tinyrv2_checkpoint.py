@@ -0,0 +1,301 @@
+#=========================================================================
+# tinyrv2_checkpoint
+#=========================================================================
+# Architectural checkpoints of a TinyRV2 system. A checkpoint captures the
+# state of each core's ISA semantics (registers, PC, stats_en, core id),
+# the pending messages in each core's mngr2proc/proc2mngr queues, and the
+# full memory contents. Checkpoints are stored as a JSON file with the
+# memory zlib-compressed and base64-encoded.
+#
+# The main use is to fast-forward through program setup (bthread_init,
+# data initialization) with the ISA simulator and start a slow RTL
+# simulation right where stats_en is about to turn on. Since we cannot
+# write the register file of an RTL processor directly, the RTL loader
+# restores the registers with a small boot stub instead:
+#
+#  - the word at the reset PC (0x200) is replaced with a jump to the stub
+#  - the stub is placed in unused memory right after the program's data
+#  - in multicore systems the stub first dispatches on the core id
+#  - each core's stub sets stats_en if needed, loads x2..x31 and then x1
+#    with lui/addi pairs, and jumps to the checkpointed PC
+#
+# The first word at 0x200 is the beginning of _start in crt0.S, which
+# only runs once at boot, so losing it does not matter as long as the
+# checkpoint was taken after boot. Checkpoints taken by isa-sim are
+# always taken right before the csrw that turns on stats_en, so stats
+# are not enabled while the stub runs.
+
+import base64
+import json
+import zlib
+
+from tinyrv2_encoding import assemble_inst
+
+#-------------------------------------------------------------------------
+# Constants
+#-------------------------------------------------------------------------
+
+reset_pc        = 0x200
+stack_nbytes    = 0x4000   # per-core stack size, see crt0.S
+stub_core_bytes = 0x200    # space for the stub of each core
+
+#=========================================================================
+# TinyRV2Checkpoint
+#=========================================================================
+
+class TinyRV2Checkpoint (object):
+
+  def __init__( s, num_cores=1 ):
+
+    s.num_cores = num_cores
+
+    s.pc        = [ reset_pc ] * num_cores
+    s.regs      = [ [ 0 ] * 32 for _ in xrange( num_cores ) ]
+    s.stats_en  = [ False ] * num_cores
+    s.coreid    = range( num_cores )
+
+    s.mngr2proc = [ [] for _ in xrange( num_cores ) ]
+    s.proc2mngr = [ [] for _ in xrange( num_cores ) ]
+
+    # Number of instructions each core executed before the checkpoint
+
+    s.num_total_inst = [ 0 ] * num_cores
+
+    s.mem = bytearray()
+
+  #-----------------------------------------------------------------------
+  # save
+  #-----------------------------------------------------------------------
+
+  def save( s, filename ):
+
+    state = {
+      'num_cores'      : s.num_cores,
+      'pc'             : s.pc,
+      'regs'           : s.regs,
+      'stats_en'       : s.stats_en,
+      'coreid'         : s.coreid,
+      'mngr2proc'      : s.mngr2proc,
+      'proc2mngr'      : s.proc2mngr,
+      'num_total_inst' : s.num_total_inst,
+      'mem_nbytes'     : len( s.mem ),
+      'mem'            : base64.b64encode( zlib.compress( str( s.mem ) ) ),
+    }
+
+    with open( filename, 'w' ) as fp:
+      json.dump( state, fp )
+
+  #-----------------------------------------------------------------------
+  # load
+  #-----------------------------------------------------------------------
+
+  @staticmethod
+  def load( filename ):
+
+    with open( filename, 'r' ) as fp:
+      state = json.load( fp )
+
+    ckpt = TinyRV2Checkpoint( state['num_cores'] )
+
+    ckpt.pc             = state['pc']
+    ckpt.regs           = state['regs']
+    ckpt.stats_en       = state['stats_en']
+    ckpt.coreid         = state['coreid']
+    ckpt.mngr2proc      = state['mngr2proc']
+    ckpt.proc2mngr      = state['proc2mngr']
+    ckpt.num_total_inst = state['num_total_inst']
+
+    ckpt.mem = bytearray( zlib.decompress(
+                 base64.b64decode( state['mem'] ) ) )
+    assert len( ckpt.mem ) == state['mem_nbytes']
+
+    return ckpt
+
+#-------------------------------------------------------------------------
+# stats_en_pending
+#-------------------------------------------------------------------------
+# Returns True if the next instruction of the given core turns on
+# stats_en, which is where isa-sim takes its checkpoints.
+
+def stats_en_pending( isa_sim, core=0 ):
+
+  isa = isa_sim.isas[core]
+  if isa.stats_en:
+    return False
+
+  inst = isa.decode_cache.get( isa.PC )
+  if inst is None:
+    inst = isa.decode( isa.PC, isa_sim.fetch( isa.PC ) )
+
+  return inst.name == 'csrw' and inst.csrnum == 0x7C1 \
+     and isa.R.regs[ inst.rs1 ] != 0
+
+#-------------------------------------------------------------------------
+# checkpoint_isa_sim
+#-------------------------------------------------------------------------
+# Capture the state of a TinyRV2IsaSim
+
+def checkpoint_isa_sim( isa_sim ):
+
+  ckpt = TinyRV2Checkpoint( isa_sim.num_cores )
+
+  for i, isa in enumerate( isa_sim.isas ):
+    ckpt.pc[i]        = int( isa.PC )
+    ckpt.regs[i]      = [ int( isa.R.regs[j] ) for j in xrange( 32 ) ]
+    ckpt.stats_en[i]  = bool( isa.stats_en )
+    ckpt.coreid[i]    = int( isa.coreid )
+    ckpt.mngr2proc[i] = [ int( msg ) for msg in isa_sim.mngr2proc_q[i] ]
+    ckpt.proc2mngr[i] = [ int( msg ) for msg in isa_sim.proc2mngr_q[i] ]
+
+  ckpt.num_total_inst = list( isa_sim.num_total_inst )
+  ckpt.mem            = isa_sim.M.mem[:]
+
+  return ckpt
+
+#-------------------------------------------------------------------------
+# restore_isa_sim
+#-------------------------------------------------------------------------
+# Restore a checkpoint into a freshly constructed TinyRV2IsaSim
+
+def restore_isa_sim( isa_sim, ckpt ):
+
+  assert isa_sim.num_cores == ckpt.num_cores, \
+    "Checkpoint has {} cores but the simulator has {}" \
+      .format( ckpt.num_cores, isa_sim.num_cores )
+
+  isa_sim.reset()
+
+  for i, isa in enumerate( isa_sim.isas ):
+    isa.PC        = ckpt.pc[i]
+    isa.R.regs[:] = ckpt.regs[i]
+    isa.stats_en  = ckpt.stats_en[i]
+    isa.coreid    = ckpt.coreid[i]
+    isa_sim.mngr2proc_q[i].extend( ckpt.mngr2proc[i] )
+    isa_sim.proc2mngr_q[i].extend( ckpt.proc2mngr[i] )
+
+  isa_sim.num_total_inst[:] = ckpt.num_total_inst
+  isa_sim.M.mem[:len( ckpt.mem )] = ckpt.mem
+
+#-------------------------------------------------------------------------
+# gen_core_stub
+#-------------------------------------------------------------------------
+# Returns the instruction words which restore the state of the given core
+# when placed at addr.
+
+def gen_core_stub( ckpt, core, addr ):
+
+  asm = []
+
+  if ckpt.stats_en[core]:
+    asm.append( "addi x1, x0, 1" )
+    asm.append( "csrw stats_en, x1" )
+
+  # Load x1 last since the dispatch code uses it
+
+  for reg in range( 2, 32 ) + [ 1 ]:
+    value = ckpt.regs[core][reg]
+    hi    = ( (value + 0x800) >> 12 ) & 0xFFFFF
+    lo    = value & 0xFFF
+    asm.append( "lui x{}, 0x{:05x}".format( reg, hi ) )
+    asm.append( "addi x{0}, x{0}, 0x{1:03x}".format( reg, lo ) )
+
+  jal_pc = addr + 4*len( asm )
+  asm.append( "jal x0, {}".format( ckpt.pc[core] - jal_pc ) )
+
+  assert 4*len( asm ) <= stub_core_bytes
+
+  return [ assemble_inst( {}, addr + 4*i, inst ).uint()
+           for i, inst in enumerate( asm ) ]
+
+#-------------------------------------------------------------------------
+# stub_num_insts
+#-------------------------------------------------------------------------
+# Number of instructions the given core commits from reset until it
+# reaches the checkpointed PC: the jump at the reset PC, the multicore
+# dispatch, and its own stub.
+
+def stub_num_insts( ckpt, core ):
+  num_insts  = 1
+  num_insts += 5 if ckpt.num_cores > 1 else 0
+  num_insts += 2 if ckpt.stats_en[core] else 0
+  num_insts += 2*31 + 1
+  return num_insts
+
+#-------------------------------------------------------------------------
+# gen_restore_image
+#-------------------------------------------------------------------------
+# Returns a copy of the checkpoint memory with the boot stub installed,
+# along with the address of the stub.
+
+def gen_restore_image( ckpt ):
+
+  for core in xrange( ckpt.num_cores ):
+    assert ckpt.pc[core] != reset_pc, \
+      "Cannot restore a checkpoint taken before core {} left the reset PC" \
+        .format( core )
+
+  mem = bytearray( ckpt.mem )
+
+  # Place the stub in the first free 256B-aligned space after the last
+  # non-zero byte below the stacks
+
+  stack_base = len( mem ) - stack_nbytes * ckpt.num_cores
+  data_end   = len( mem[:stack_base].rstrip( b'\x00' ) )
+  stub_addr  = ( data_end + 0x1ff ) & ~0xff
+
+  dispatch_nbytes = 32 if ckpt.num_cores > 1 else 0
+  stub_nbytes     = dispatch_nbytes + stub_core_bytes * ckpt.num_cores
+
+  assert stub_addr + stub_nbytes <= stack_base, \
+    "No room for the checkpoint restore stub"
+
+  words = {}
+
+  # Multicore dispatch: jump to stub_addr + 32 + coreid*stub_core_bytes
+
+  if ckpt.num_cores > 1:
+    dispatch = [
+      "csrr x1, coreid",
+      "slli x1, x1, 9",
+      "auipc x2, 0",
+      "add x1, x1, x2",
+      "jalr x0, x1, 24",
+    ]
+    for i, inst in enumerate( dispatch ):
+      words[ stub_addr + 4*i ] = \
+        assemble_inst( {}, stub_addr + 4*i, inst ).uint()
+
+  for core in xrange( ckpt.num_cores ):
+    core_addr = stub_addr + dispatch_nbytes + core*stub_core_bytes
+    for i, word in enumerate( gen_core_stub( ckpt, core, core_addr ) ):
+      words[ core_addr + 4*i ] = word
+
+  # Jump from the reset PC to the stub
+
+  words[ reset_pc ] = assemble_inst( {}, reset_pc,
+                        "jal x0, {}".format( stub_addr - reset_pc ) ).uint()
+
+  for addr, word in words.items():
+    for i in xrange( 4 ):
+      mem[ addr + i ] = ( word >> (8*i) ) & 0xFF
+
+  return mem, stub_addr
+
+#-------------------------------------------------------------------------
+# restore_sim_harness
+#-------------------------------------------------------------------------
+# Initialize the memory of a SimHarness (see lab5_mcore/test/harnesses.py)
+# so that the RTL processors resume from the checkpoint after reset. The
+# SimHarness has no mngr2proc source and only core 0 talks to the
+# manager, so we require the mngr queues to be empty.
+
+def restore_sim_harness( model, ckpt ):
+
+  for core in xrange( ckpt.num_cores ):
+    assert not ckpt.mngr2proc[core] and not ckpt.proc2mngr[core], \
+      "Cannot restore pending mngr messages into an RTL simulation"
+
+  mem, stub_addr = gen_restore_image( ckpt )
+  model.mem.mem[ 0:len( mem ) ] = mem
+
+  return stub_addr
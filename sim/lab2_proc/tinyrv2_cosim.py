@@ -0,0 +1,129 @@
+#=========================================================================
+# tinyrv2_cosim
+#=========================================================================
+# Lockstep co-simulation of an RTL processor against the TinyRV2 ISA
+# semantics. The RTL processors export a commit trace from their W stage
+# (commit_pc, commit_rf_wen, commit_rf_waddr, commit_rf_wdata) which is
+# valid whenever commit_inst is high. For each committed instruction we
+# step a golden ISA model by one instruction and compare:
+#
+#  - the PC of the committed instruction
+#  - the destination register, if the instruction writes one
+#  - the value written back to the destination register
+#
+# The golden model runs on its own copy of the program memory and gets
+# the same mngr2proc messages as the processor, so a bug is caught at the
+# first instruction that goes wrong instead of whenever a wrong value
+# finally reaches the proc2mngr sink. On a mismatch we raise CoSimMismatch
+# with the last few committed instructions.
+
+from collections import deque
+
+from tinyrv2_isa_sim import TinyRV2IsaSim
+
+#-------------------------------------------------------------------------
+# Parameters
+#-------------------------------------------------------------------------
+
+trace_window = 8         # number of commits shown on a mismatch
+
+# Instructions which do not write a register. The RTL processors may
+# still assert rf_wen for these with rf_waddr = 0, which we ignore.
+
+no_rd_insts = set([ 'sw', 'sb', 'beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu',
+                    'csrw' ])
+
+#=========================================================================
+# CoSimMismatch
+#=========================================================================
+
+class CoSimMismatch (AssertionError):
+  pass
+
+#=========================================================================
+# TinyRV2CoSim
+#=========================================================================
+
+class TinyRV2CoSim (object):
+
+  def __init__( s, mem_image ):
+
+    s.isa_sim = TinyRV2IsaSim()
+    s.isa_sim.load( mem_image )
+
+    # The golden model sees the same mngr2proc messages as the processor
+
+    for section in mem_image.get_sections():
+      if section.name == ".mngr2proc":
+        for i in xrange( 0, len( section.data ), 4 ):
+          s.isa_sim.mngr2proc_q[0].append( s.isa_sim.M[ section.addr + i :
+                                                        section.addr + i + 4 ] )
+
+    s.num_commits = 0
+    s.history     = deque( maxlen=trace_window )
+
+  #-----------------------------------------------------------------------
+  # tick
+  #-----------------------------------------------------------------------
+  # Call once per cycle with the processor model. Checks the committed
+  # instruction, if any.
+
+  def tick( s, proc ):
+    if proc.commit_inst:
+      s.commit( proc.commit_pc.uint(), proc.commit_rf_wen.uint(),
+                proc.commit_rf_waddr.uint(), proc.commit_rf_wdata.uint() )
+
+  #-----------------------------------------------------------------------
+  # commit
+  #-----------------------------------------------------------------------
+
+  def commit( s, pc, rf_wen, rf_waddr, rf_wdata ):
+
+    isa    = s.isa_sim.isas[0]
+    ref_pc = isa.PC
+
+    inst = isa.decode_cache.get( ref_pc )
+    if inst is None:
+      inst = isa.decode( ref_pc, s.isa_sim.fetch( ref_pc ) )
+
+    s.isa_sim.step_core( 0 )
+    s.isa_sim.proc2mngr_q[0].clear()
+
+    ref_wb = None
+    if inst.name not in no_rd_insts and inst.rd != 0:
+      ref_wb = ( inst.rd, isa.R.regs[ inst.rd ] & 0xFFFFFFFF )
+
+    dut_wb = None
+    if rf_wen and rf_waddr != 0:
+      dut_wb = ( rf_waddr, rf_wdata )
+
+    s.history.append( ( s.num_commits, ref_pc, inst, ref_wb, pc, dut_wb ) )
+    s.num_commits += 1
+
+    if pc != ref_pc or dut_wb != ref_wb:
+      raise CoSimMismatch( s.report() )
+
+  #-----------------------------------------------------------------------
+  # report
+  #-----------------------------------------------------------------------
+  # The last few commits, with the mismatching one marked
+
+  def report( s ):
+
+    def wb_str( wb ):
+      if wb is None:
+        return " "*13
+      return "x{:02d}={:0>8x}".format( wb[0], wb[1] )
+
+    lines = [ "Co-simulation mismatch at commit {}:".format( s.num_commits-1 ),
+              "",
+              "     commit  ref pc   {: <24} ref wb        dut pc   dut wb" \
+                .format( "inst" ) ]
+
+    for num, ref_pc, inst, ref_wb, pc, dut_wb in s.history:
+      mark = "*" if ( pc != ref_pc or dut_wb != ref_wb ) else " "
+      lines.append( "  {} {:>7}  {:0>8x} {: <24} {}  {:0>8x} {}" \
+        .format( mark, num, ref_pc, inst, wb_str( ref_wb ), pc,
+                 wb_str( dut_wb ) ) )
+
+    return "\n".join( lines )
@@ -12,8 +12,13 @@
 # Author : Christopher Batten, Shunning Jiang
 # Date   : Aug 27, 2016
 
+import cPickle
+import hashlib
+import os
 import struct
+import tempfile
 
+from collections       import OrderedDict
 from pymtl             import Bits, concat
 from string            import translate,maketrans
 from SparseMemoryImage import SparseMemoryImage
@@ -414,6 +419,126 @@ tinyrv2_fields = \
   "j_imm"  : [ assemble_field_j_imm,  disassemble_field_j_imm  ],
 }
 
+#-------------------------------------------------------------------------
+# Field Encoders
+#-------------------------------------------------------------------------
+# Integer versions of the assemble_field functions above used by the
+# program assembler. Each encoder takes the same arguments minus the
+# instruction bits and returns the field already shifted into place, so
+# an instruction is just the opcode match OR'd with its fields. These
+# must produce exactly the same bits as the assemble_field functions
+# (see tinyrv2_encoding_test.py), and like the Bits those functions build
+# they reject immediates which do not fit in the field. The offset to a
+# branch or jump label must also fit as a signed value.
+
+tinyrv2_csrnums = \
+{
+  "mngr2proc" : 0xFC0,
+  "proc2mngr" : 0x7C0,
+  "numcores"  : 0xFC1,
+  "coreid"    : 0xF14,
+  "stats_en"  : 0x7C1,
+}
+
+tinyrv2_reg_specifiers = dict( ( "x{}".format(i), i ) for i in xrange(32) )
+
+def encode_reg( field_str ):
+  if field_str in tinyrv2_reg_specifiers:
+    return tinyrv2_reg_specifiers[ field_str ]
+  assert field_str[0] == "x"
+  reg_specifier = int(field_str.lstrip("x"))
+  assert 0 <= reg_specifier <= 31
+  return reg_specifier
+
+# Bit offset of the %hi/%md/%lo part of a label for i_imm and u_imm
+
+tinyrv2_i_imm_label_shifts = { "%hi[" : 20, "%md[" : 13, "%lo[" : 0 }
+tinyrv2_u_imm_label_shifts = { "%hi[" : 12, "%lo[" : 0 }
+
+def encode_label_imm( sym, field_str, shifts, mask ):
+  label_addr = sym[ field_str[4:-1] ] & 0xffffffff
+  return ( label_addr >> shifts[ field_str[:4] ] ) & mask
+
+def encode_field_rs1( sym, pc, field_str ):
+  return encode_reg( field_str ) << 15
+
+def encode_field_rs2( sym, pc, field_str ):
+  return encode_reg( field_str ) << 20
+
+def encode_field_rd( sym, pc, field_str ):
+  return encode_reg( field_str ) << 7
+
+def encode_field_shamt( sym, pc, field_str ):
+  shamt = int(field_str,0)
+  assert 0 <= shamt <= 31
+  return shamt << 20
+
+def encode_field_i_imm( sym, pc, field_str ):
+  if field_str[0] == "%":
+    imm = encode_label_imm( sym, field_str, tinyrv2_i_imm_label_shifts, 0xfff )
+  else:
+    imm = int(field_str,0)
+  assert -(1 << 11) <= imm < (1 << 12)
+  return ( imm & 0xfff ) << 20
+
+def encode_field_csrnum( sym, pc, field_str ):
+  return tinyrv2_csrnums[ field_str ] << 20
+
+def encode_field_s_imm( sym, pc, field_str ):
+  imm = int(field_str,0)
+  assert -(1 << 11) <= imm < (1 << 12)
+  imm &= 0xfff
+  return ( ( imm & 0x1f ) << 7 ) | ( ( imm >> 5 ) << 25 )
+
+def encode_field_b_imm( sym, pc, field_str ):
+  if field_str in sym:
+    imm = sym[field_str] - pc
+    assert -(1 << 12) <= imm < (1 << 12)
+  else:
+    imm = int(field_str,0)
+    assert -(1 << 12) <= imm < (1 << 13)
+  imm &= 0x1fff
+  return ( ( ( imm >>  1 ) & 0xf  ) <<  8 ) \
+       | ( ( ( imm >>  5 ) & 0x3f ) << 25 ) \
+       | ( ( ( imm >> 11 ) & 0x1  ) <<  7 ) \
+       | ( ( ( imm >> 12 ) & 0x1  ) << 31 )
+
+def encode_field_u_imm( sym, pc, field_str ):
+  if field_str[0] == "%":
+    imm = encode_label_imm( sym, field_str, tinyrv2_u_imm_label_shifts,
+                            0xfff if field_str.startswith( "%lo[" ) else 0xfffff )
+  else:
+    imm = int(field_str,0)
+  assert imm < (1 << 20)
+  return ( imm & 0xfffff ) << 12
+
+def encode_field_j_imm( sym, pc, field_str ):
+  if field_str in sym:
+    imm = sym[field_str] - pc
+    assert -(1 << 20) <= imm < (1 << 20)
+  else:
+    imm = int(field_str,0)
+    assert -(1 << 20) <= imm < (1 << 21)
+  imm &= 0x1fffff
+  return ( ( ( imm >>  1 ) & 0x3ff ) << 21 ) \
+       | ( ( ( imm >> 11 ) & 0x1   ) << 20 ) \
+       | ( ( ( imm >> 12 ) & 0xff  ) << 12 ) \
+       | ( ( ( imm >> 20 ) & 0x1   ) << 31 )
+
+tinyrv2_field_encoders = \
+{
+  "rs1"    : encode_field_rs1,
+  "rs2"    : encode_field_rs2,
+  "shamt"  : encode_field_shamt,
+  "rd"     : encode_field_rd,
+  "i_imm"  : encode_field_i_imm,
+  "csrnum" : encode_field_csrnum,
+  "s_imm"  : encode_field_s_imm,
+  "b_imm"  : encode_field_b_imm,
+  "u_imm"  : encode_field_u_imm,
+  "j_imm"  : encode_field_j_imm,
+}
+
 #=========================================================================
 # IsaImpl
 #=========================================================================
@@ -422,22 +547,65 @@ tinyrv2_fields = \
 # assembly/disassembly functions. I am not sure if we still want to
 # refactor this here, but it is good enough for now.
 
+# Field strings are delimited by whitespace, commas, and/or parentheses.
+# We translate the non-whitespace delimiters into whitespace so that we
+# can use split.
+
+asm_field_delims = maketrans(",()","   ")
+
 class IsaImpl (object):
 
   #-----------------------------------------------------------------------
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( self, nbits, inst_encoding_table, inst_fields ):
+  def __init__( self, nbits, inst_encoding_table, inst_fields,
+                inst_field_encoders=None ):
 
     self.nbits                   = nbits
     self.inst_encoding_table     = inst_encoding_table
     self.asm_field_funcs_dict    = {}
     self.disasm_field_funcs_dict = {}
     self.opcode_match_dict       = {}
+    self.asm_encoders_dict       = {}
 
     self.disasm_field_funcs_dict[''] = {} # this is for all-zero case
 
+    # The decode table is compiled from the opcode mask/match columns.
+    # The mask bits common to every row (the major opcode for TinyRV2)
+    # select a short list of decode groups. Each group holds one opcode
+    # mask and a dictionary from opcode match to the table entry, so
+    # decoding is a few dictionary lookups regardless of how many
+    # instructions are in the table.
+
+    self.decode_common_mask = (1 << nbits) - 1
+    for row in inst_encoding_table:
+      self.decode_common_mask &= row[1]
+
+    self.decode_groups = {}
+
+    for row_idx, row in enumerate( inst_encoding_table ):
+
+      inst_tmpl    = row[0]
+      opcode_mask  = row[1]
+      opcode_match = row[2]
+      inst_name    = inst_tmpl.partition(' ')[0]
+
+      groups = self.decode_groups.setdefault(
+                 opcode_match & self.decode_common_mask, [] )
+
+      for group_mask, match_dict in groups:
+        if group_mask == opcode_mask:
+          break
+      else:
+        match_dict = {}
+        groups.append( (opcode_mask, match_dict) )
+
+      # If two rows have the same mask/match the first one wins, which
+      # is what the linear scan used to do.
+
+      match_dict.setdefault( opcode_match, (row_idx, inst_tmpl, inst_name) )
+
     for row in inst_encoding_table:
 
       # Extract the columns from the row
@@ -455,12 +623,9 @@ class IsaImpl (object):
 
       self.opcode_match_dict[ inst_name ] = opcode_match
 
-      # Split the remainder of the template into field strings. First we
-      # translate non-whitespace deliminters into whitespace so that we
-      # can use split.
+      # Split the remainder of the template into field strings
 
-      translation_table = maketrans(",()","   ")
-      inst_field_tags = translate(inst_tmpl,translation_table).split()
+      inst_field_tags = translate(inst_tmpl,asm_field_delims).split()
 
       # Create the list of asm field functions
 
@@ -472,6 +637,12 @@ class IsaImpl (object):
 
       self.asm_field_funcs_dict[ inst_name ] = asm_field_funcs
 
+      # Add the opcode match and the list of integer field encoders
+
+      if inst_field_encoders is not None:
+        self.asm_encoders_dict[ inst_name ] = \
+          ( opcode_match, [ inst_field_encoders[tag] for tag in inst_field_tags ] )
+
       # Create the list of disasm field functions
 
       disasm_field_funcs = {}
@@ -483,33 +654,43 @@ class IsaImpl (object):
       self.disasm_field_funcs_dict[ inst_name ] = disasm_field_funcs
 
   #-----------------------------------------------------------------------
-  # decode_tmpl
+  # decode_entry
   #-----------------------------------------------------------------------
-  # For now this is O(n) where n is the number of instructions in the
-  # encoding table. Obviously, this is pretty slow. I am sure we can do
-  # better by creating some kind of tree-based data structure.
+  # Returns the (row index, template, name) entry for the given
+  # instruction. Several groups can match the same instruction (e.g.,
+  # nop also matches addi), in which case we return the entry which
+  # comes first in the encoding table. The cost only depends on the
+  # number of distinct opcode masks per major opcode, not on the number
+  # of instructions in the table.
 
-  def decode_tmpl( self, inst_bits ):
+  def decode_entry( self, inst_bits ):
 
-    if inst_bits == 0: # hacky
-      return ""
+    inst_bits = int( inst_bits )
 
-    for row in self.inst_encoding_table:
+    entry  = None
+    groups = self.decode_groups.get( inst_bits & self.decode_common_mask, () )
+    for opcode_mask, match_dict in groups:
+      match = match_dict.get( inst_bits & opcode_mask )
+      if match is not None and ( entry is None or match[0] < entry[0] ):
+        entry = match
 
-      # Extract the columns from the row
+    # Illegal instruction
 
-      inst_tmpl    = row[0]
-      opcode_mask  = row[1]
-      opcode_match = row[2]
+    if entry is None:
+      raise AssertionError( "Illegal instruction {}!".format( inst_bits ) )
 
-      # If match, then return instruction name
+    return entry
 
-      if (inst_bits & opcode_mask) == opcode_match:
-        return inst_tmpl
+  #-----------------------------------------------------------------------
+  # decode_tmpl
+  #-----------------------------------------------------------------------
 
-    # Illegal instruction
+  def decode_tmpl( self, inst_bits ):
 
-    raise AssertionError( "Illegal instruction {}!".format( inst_bits ) )
+    if inst_bits == 0: # hacky
+      return ""
+
+    return self.decode_entry( inst_bits )[1]
 
   #-----------------------------------------------------------------------
   # decode_name
@@ -517,13 +698,10 @@ class IsaImpl (object):
 
   def decode_inst_name( self, inst_bits ):
 
-    # Decode template
-
-    inst_tmpl = self.decode_tmpl( inst_bits )
-
-    # Extract instruction name
+    if inst_bits == 0:
+      return ""
 
-    return inst_tmpl.partition(' ')[0]
+    return self.decode_entry( inst_bits )[2]
 
   #-----------------------------------------------------------------------
   # assemble_inst
@@ -540,12 +718,9 @@ class IsaImpl (object):
 
     inst_bits = Bits( self.nbits, self.opcode_match_dict[ inst_name ] )
 
-    # Split the remainder of the asm string into field strings. First
-    # we translate non-whitespace deliminters into whitespace so that
-    # we can use split.
+    # Split the remainder of the asm string into field strings
 
-    translation_table = maketrans(",()","   ")
-    asm_field_strs = translate(inst_str,translation_table).split()
+    asm_field_strs = translate(inst_str,asm_field_delims).split()
 
     # Retrieve the list of asm field functions for this instruction
 
@@ -560,6 +735,24 @@ class IsaImpl (object):
 
     return inst_bits
 
+  #-----------------------------------------------------------------------
+  # assemble_inst_word
+  #-----------------------------------------------------------------------
+  # Same as assemble_inst but uses the integer field encoders and returns
+  # the instruction as an int instead of Bits.
+
+  def assemble_inst_word( self, sym, pc, inst_str ):
+
+    (inst_name,sep,inst_str) = inst_str.partition(' ')
+
+    inst_word, encoders = self.asm_encoders_dict[ inst_name ]
+    asm_field_strs = inst_str.translate(asm_field_delims).split()
+
+    for asm_field_str, encoder in zip( asm_field_strs, encoders ):
+      inst_word |= encoder( sym, pc, asm_field_str )
+
+    return inst_word
+
   #-----------------------------------------------------------------------
   # disassemble_inst
   #-----------------------------------------------------------------------
@@ -592,7 +785,8 @@ class IsaImpl (object):
 # Here is the actual riscv_isa_impl. I think I refactored this because the
 # idea was that the IsaImpl class could be reused across different ISAs?
 
-tinyrv2_isa_impl = IsaImpl( 32, tinyrv2_encoding_table, tinyrv2_fields )
+tinyrv2_isa_impl = IsaImpl( 32, tinyrv2_encoding_table, tinyrv2_fields,
+                            tinyrv2_field_encoders )
 
 #=========================================================================
 # Assemble
@@ -601,7 +795,14 @@ tinyrv2_isa_impl = IsaImpl( 32, tinyrv2_encoding_table, tinyrv2_fields )
 def assemble_inst( sym, pc, inst_str ):
   return tinyrv2_isa_impl.assemble_inst( sym, pc, inst_str )
 
-def assemble( asm_code ):
+# A mngr value is a 32-bit word, written either signed or unsigned
+
+def encode_mngr_word( value_str ):
+  value = int(value_str,0)
+  assert -(1 << 31) <= value < (1 << 32)
+  return value & 0xffffffff
+
+def assemble_uncached( asm_code ):
 
   # If asm_code is a single string, then put it in a list to simplify the
   # rest of the logic.
@@ -616,15 +817,20 @@ def assemble( asm_code ):
   for asm_seq in asm_code_list:
     asm_list.extend( asm_seq.splitlines() )
 
-  # First pass to create symbol table. This is obviously very simplistic.
-  # We can maybe make it more robust in the future.
+  # Strip comments and whitespace once for all passes
 
-  addr = 0x00000200
-  sym  = {}
-  for line in asm_list:
-    line = line.partition('#')[0]
-    line = line.strip()
+  asm_list = [ line.partition('#')[0].strip() for line in asm_list ]
 
+  # First pass to create symbol table. This is obviously very simplistic.
+  # We can maybe make it more robust in the future. We also count the
+  # instructions before the data section so that we can preallocate the
+  # text section.
+
+  addr      = 0x00000200
+  sym       = {}
+  num_insts = 0
+  in_text   = True
+  for line in asm_list:
     if line == "":
       continue
 
@@ -633,7 +839,7 @@ def assemble( asm_code ):
       addr = int(addr_str,0)
 
     elif line.startswith(".data"):
-      pass
+      in_text = False
 
     else:
       (label,sep,rest) = line.partition(':')
@@ -641,19 +847,24 @@ def assemble( asm_code ):
         sym[label.strip()] = addr
       else:
         addr += 4
+        num_insts += in_text
 
-  # Second pass to assemble text section
+  # Second pass to assemble text section. Instructions are encoded as
+  # integers and written straight into the preallocated text section,
+  # while the mngr values are collected as lists of words and packed at
+  # the end.
 
   asm_list_idx    = 0
   addr            = 0x00000200
-  text_bytes      = bytearray()
-  mngr2proc_bytes = bytearray()
-  proc2mngr_bytes = bytearray()
+  text_bytes      = bytearray( 4*num_insts )
+  text_offset     = 0
+  mngr2proc_words = []
+  proc2mngr_words = []
 
   # Shunning: the way I handle multiple manager is as follows.
   #
   # At the beginning the single_core sign is true and all "> 1" "< 2"
-  # values are dumped into the above mngr2proc_bytes and mngr2proc_bytes.
+  # values are dumped into the above mngr2proc_words and proc2mngr_words.
   # So, for single core testing the assembler works as usual.
   #
   # For multicore testing, I assume that all lists wrapped by curly braces
@@ -663,36 +874,24 @@ def assemble( asm_code ):
   # Later if I see "> {1,2,3}" I will throw out assertion error.
   #
   # Also, Upon the first occurence of the mentioned curly braces, I will
-  # just duplicate mngr2proc_bytes for #core times, and put the duplicates
+  # just duplicate mngr2proc_words for #core times, and put the duplicates
   # into mngrs2procs.  Later, when I see a "> 1", I will check the
   # single_core flag. If it's False, it will dump the check message into
-  # all the duplicated bytearrays.
+  # all the duplicated lists.
   #
   # The problem of co-existence if we keep mngr2proc and mngrs2procs, is
   # that unless we record the exact order we receive the csr instructions,
   # we cannot arbitrarily interleave the values in mngr2proc and mngrs2procs.
 
-  mngrs2procs_bytes = []
-  procs2mngrs_bytes = []
+  mngrs2procs_words = []
+  procs2mngrs_words = []
   single_core       = True
   num_cores         = 1
 
-  def duplicate():
-
-    # duplicate the bytes and no more mngr2proc/proc2mngr
-
-    for i in xrange( num_cores ):
-      mngrs2procs_bytes.append( bytearray() )
-      mngrs2procs_bytes[i][:] = mngr2proc_bytes
-
-      procs2mngrs_bytes.append( bytearray() )
-      procs2mngrs_bytes[i][:] = proc2mngr_bytes
+  assemble_inst_word = tinyrv2_isa_impl.assemble_inst_word
 
   for line in asm_list:
     asm_list_idx += 1
-    line = line.partition('#')[0]
-    line = line.strip()
-
     if line == "":
       continue
 
@@ -703,84 +902,62 @@ def assemble( asm_code ):
     elif line.startswith(".data"):
       break
 
-    else:
-      if ':' not in line:
-
-        inst_str = line
-
-        # First see if we have either a < or a >
-
-        if '<' in line:
-          (temp,sep,value) = line.partition('<')
+    elif ':' not in line:
 
-          value = value.lstrip(' ')
-          if value.startswith('{'):
-            values = map( lambda x:int(x, 0), value[1:-1].split(',') )
+      # First see if we have either a < or a >
 
-            if not single_core and len(values)!=num_cores:
-              raise Exception( "Previous curly brace pair has {} elements in between, but this one \"{}\" has {}."
-                               .format(num_cores, line, len(values)) )
+      (inst_str,sep,value) = line.partition('<')
+      if sep == "":
+        (inst_str,sep,value) = line.partition('>')
 
-            if single_core:
-              single_core = False
-              num_cores   = len(values)
-              duplicate()
-
-            for i in xrange( num_cores ):
-              mngrs2procs_bytes[i].extend(struct.pack("<I", Bits(32, values[i]) ))
-
-          else:
-            bits = Bits( 32, int(value,0) )
-
-            if single_core:
-              mngr2proc_bytes.extend(struct.pack("<I",bits))
-            else:
-              for x in mngrs2procs_bytes:
-                x.extend(struct.pack("<I",bits))
+      if sep != "":
 
-          inst_str = temp
+        value = value.lstrip(' ')
+        if value.startswith('{'):
+          values = map( encode_mngr_word, value[1:-1].split(',') )
 
-        elif '>' in line:
-          (temp,sep,value) = line.partition('>')
+          if not single_core and len(values)!=num_cores:
+            raise Exception( "Previous curly brace pair has {} elements in between, but this one \"{}\" has {}."
+                             .format(num_cores, line, len(values)) )
 
-          value = value.lstrip(' ')
-          if value.startswith('{'):
-            values = map( lambda x:int(x, 0), value[1:-1].split(',') )
+          # duplicate the words and no more mngr2proc/proc2mngr
 
-            if not single_core and len(values)!=num_cores:
-              raise Exception( "Previous curly brace pair has {} elements in between, but this one \"{}\" has {}."
-                               .format(num_cores, line, len(values)) )
+          if single_core:
+            single_core       = False
+            num_cores         = len(values)
+            mngrs2procs_words = [ list(mngr2proc_words) for i in xrange(num_cores) ]
+            procs2mngrs_words = [ list(proc2mngr_words) for i in xrange(num_cores) ]
 
-            if single_core:
-              single_core = False
-              num_cores   = len(values)
-              duplicate()
+          words_list = mngrs2procs_words if sep == '<' else procs2mngrs_words
+          for i in xrange( num_cores ):
+            words_list[i].append( values[i] )
 
-            for i in xrange( num_cores ):
-              procs2mngrs_bytes[i].extend(struct.pack("<I", Bits(32, values[i]) ))
+        else:
+          word = encode_mngr_word( value )
 
+          if single_core:
+            ( mngr2proc_words if sep == '<' else proc2mngr_words ).append( word )
           else:
-            bits = Bits( 32, int(value,0) )
+            for words in ( mngrs2procs_words if sep == '<' else procs2mngrs_words ):
+              words.append( word )
 
-            if single_core:
-              proc2mngr_bytes.extend(struct.pack("<I",bits))
-            else:
-              for x in procs2mngrs_bytes:
-                x.extend(struct.pack("<I",bits))
+      struct.pack_into( "<I", text_bytes, text_offset,
+                        assemble_inst_word( sym, addr, inst_str ) )
+      text_offset += 4
+      addr += 4
 
-          inst_str = temp
+  def pack_words( words ):
+    return bytearray( struct.pack( "<{}I".format(len(words)), *words ) )
 
-        bits = assemble_inst( sym, addr, inst_str )
-        text_bytes.extend(struct.pack("<I",bits.uint()))
-        addr += 4
+  mngr2proc_bytes   = pack_words( mngr2proc_words )
+  proc2mngr_bytes   = pack_words( proc2mngr_words )
+  mngrs2procs_bytes = map( pack_words, mngrs2procs_words )
+  procs2mngrs_bytes = map( pack_words, procs2mngrs_words )
 
   # Assemble data section
 
   data_bytes = bytearray()
   for line in asm_list[asm_list_idx:]:
-    line = line.partition('#')[0]
-    line = line.strip()
-
     if line == "":
       continue
 
@@ -849,6 +1026,100 @@ def assemble( asm_code ):
 
   return mem_image
 
+#=========================================================================
+# Assembly Cache
+#=========================================================================
+# The same test programs are assembled once for each processor and for
+# each delay/latency parametrization, so assemble is memoized by a hash
+# of the assembly text. Results are kept in a small in-process LRU and,
+# if asm_cache_dir is set (via the TINYRV2_ASM_CACHE environment
+# variable or py.test --asm-cache), in one pickle file per program on
+# disk. The disk key also includes a hash of this file so a change to
+# the assembler never picks up stale results. Each call returns a fresh
+# copy of the cached image since callers are free to modify it.
+
+asm_cache_size = 512
+asm_cache_dir  = os.environ.get( "TINYRV2_ASM_CACHE", "" )
+asm_cache      = OrderedDict()
+asm_cache_hits = 0
+
+def _assembler_hash():
+  try:
+    with open( os.path.splitext( __file__ )[0] + ".py", "rb" ) as fp:
+      return hashlib.sha1( fp.read() ).hexdigest()
+  except IOError:
+    return ""
+
+asm_version = _assembler_hash()
+
+def asm_cache_key( asm_code ):
+  if not isinstance( asm_code, str ):
+    asm_code = "\n".join( asm_code )
+  return hashlib.sha1( asm_version + asm_code ).hexdigest()
+
+def _asm_cache_load( filename ):
+  try:
+    with open( filename, "rb" ) as fp:
+      sections, symbols = cPickle.load( fp )
+  except Exception:
+    return None
+  mem_image = SparseMemoryImage()
+  for name, addr, data in sections:
+    mem_image.add_section( name, addr, bytearray( data ) )
+  for name, addr in symbols.iteritems():
+    mem_image.add_symbol( name, addr )
+  return mem_image
+
+def _asm_cache_save( filename, mem_image ):
+
+  sections = [ ( sec.name, sec.addr, str( sec.data ) )
+               for sec in mem_image.get_sections() ]
+
+  # Write to a temporary file and rename it so that concurrent test
+  # sessions never see a partially written entry
+
+  try:
+    fd, tmp_filename = tempfile.mkstemp( dir=os.path.dirname( filename ) )
+    with os.fdopen( fd, "wb" ) as fp:
+      cPickle.dump( ( sections, mem_image.symbols ), fp, 2 )
+    os.rename( tmp_filename, filename )
+  except EnvironmentError:
+    pass
+
+def assemble( asm_code ):
+
+  global asm_cache_hits
+
+  key = asm_cache_key( asm_code )
+
+  mem_image = asm_cache.pop( key, None )
+
+  if mem_image is None and asm_cache_dir:
+    filename  = os.path.join( asm_cache_dir, key[:2], key + ".pkl" )
+    mem_image = _asm_cache_load( filename )
+    if mem_image is None:
+      mem_image = assemble_uncached( asm_code )
+      if not os.path.isdir( os.path.dirname( filename ) ):
+        try:
+          os.makedirs( os.path.dirname( filename ) )
+        except OSError:
+          pass
+      _asm_cache_save( filename, mem_image )
+    else:
+      asm_cache_hits += 1
+
+  elif mem_image is None:
+    mem_image = assemble_uncached( asm_code )
+
+  else:
+    asm_cache_hits += 1
+
+  asm_cache[ key ] = mem_image
+  while len( asm_cache ) > asm_cache_size:
+    asm_cache.popitem( last=False )
+
+  return mem_image.copy()
+
 #=========================================================================
 # Disassemble
 #=========================================================================
@@ -858,109 +1129,102 @@ def disassemble_inst( inst_bits ):
 
 def decode_inst_name( inst ):
 
-  # Originally I was just using this:
-  #
-  #  return parc_isa_impl.decode_inst_name( inst_bits )
-  #
-  # which basically just does a linear search in the encoding table to
-  # find a match. Eventually, I think we should figure out a way to
-  # automatically turn the encoding table into some kind of fast
-  # tree-bsaed search, but for now we just explicitly create a big case
-  # statement to do the instruction name decode.
-
-  # Short names
-
-  opcode = tinyrv2_field_slice_opcode
-  funct3 = tinyrv2_field_slice_funct3
-  funct7 = tinyrv2_field_slice_funct7
-
-  inst_name = ""
-
-  if inst == 0b00000000000000000000000000010011: inst_name = "nop"
-
-  elif inst[opcode] == 0b0110011:
-    if   inst[funct7] == 0b0000000:
-      if   inst[funct3] == 0b000:     inst_name = "add"
-      elif inst[funct3] == 0b001:     inst_name = "sll"
-      elif inst[funct3] == 0b010:     inst_name = "slt"
-      elif inst[funct3] == 0b011:     inst_name = "sltu"
-      elif inst[funct3] == 0b100:     inst_name = "xor"
-      elif inst[funct3] == 0b101:     inst_name = "srl"
-      elif inst[funct3] == 0b110:     inst_name = "or"
-      elif inst[funct3] == 0b111:     inst_name = "and"
-    elif inst[funct7] == 0b0100000:
-      if   inst[funct3] == 0b000:     inst_name = "sub"
-      elif inst[funct3] == 0b101:     inst_name = "sra"
-    elif inst[funct7] == 0b0000001:
-      if   inst[funct3] == 0b000:     inst_name = "mul"
-
-  elif inst[opcode] == 0b0010011:
-    if   inst[funct3] == 0b000:       inst_name = "addi"
-    elif inst[funct3] == 0b010:       inst_name = "slti"
-    elif inst[funct3] == 0b011:       inst_name = "sltiu"
-    elif inst[funct3] == 0b100:       inst_name = "xori"
-    elif inst[funct3] == 0b110:       inst_name = "ori"
-    elif inst[funct3] == 0b111:       inst_name = "andi"
-    elif inst[funct3] == 0b001:       inst_name = "slli"
-    elif inst[funct3] == 0b101:
-      if   inst[funct7] == 0b0000000: inst_name = "srli"
-      elif inst[funct7] == 0b0100000: inst_name = "srai"
-
-  elif inst[opcode] == 0b0100011:
-    if   inst[funct3] == 0b010:       inst_name = "sw"
-    elif inst[funct3] == 0b000:       inst_name = "sb"
-
-  elif inst[opcode] == 0b0000011:
-    if   inst[funct3] == 0b010:       inst_name = "lw"
-    elif inst[funct3] == 0b000:       inst_name = "lb"
-
-  elif inst[opcode] == 0b1100011:
-    if   inst[funct3] == 0b000:       inst_name = "beq"
-    elif inst[funct3] == 0b001:       inst_name = "bne"
-    elif inst[funct3] == 0b100:       inst_name = "blt"
-    elif inst[funct3] == 0b101:       inst_name = "bge"
-    elif inst[funct3] == 0b110:       inst_name = "bltu"
-    elif inst[funct3] == 0b111:       inst_name = "bgeu"
-
-  elif inst[opcode] == 0b0110111:     inst_name = "lui"
-
-  elif inst[opcode] == 0b0010111:     inst_name = "auipc"
-
-  elif inst[opcode] == 0b1101111:     inst_name = "jal"
-
-  elif inst[opcode] == 0b1100111:     inst_name = "jalr"
-
-  elif inst[opcode] == 0b1110011:
-    if   inst[funct3] == 0b001:       inst_name = "csrw"
-    elif inst[funct3] == 0b010:       inst_name = "csrr"
-
-  elif inst == 0: inst_name = " "
-
-  if inst_name == "":
-    raise AssertionError( "Illegal instruction {}!".format(inst) )
-
-  return inst_name
+  # The instruction name is decoded using the table compiled from the
+  # encoding table in IsaImpl, so there is no separate case statement
+  # which could drift from the table. The all-zero word is special: it
+  # decodes to " " which the semantics treat as a "dumb" instruction.
+
+  if inst == 0:
+    return " "
+
+  return tinyrv2_isa_impl.decode_entry( inst )[2]
+
+#-------------------------------------------------------------------------
+# disassemble_words
+#-------------------------------------------------------------------------
+# Generator which yields ( addr, word, text ) for each word of a section.
+# Words are unpacked a batch at a time and the text for each distinct
+# word is cached, since loops and stack frames make the same words show
+# up over and over in real programs. Words which do not decode (e.g.,
+# constants in the text section) are shown as a .word directive.
+
+def disassemble_words( section, batch_nwords=4096 ):
+
+  data   = section.data
+  nwords = len(data) / 4
+  cache  = {}
+
+  for start in xrange( 0, nwords, batch_nwords ):
+
+    num   = min( batch_nwords, nwords - start )
+    words = struct.unpack_from( "<{}I".format(num), data, 4*start )
+    addr  = section.addr + 4*start
+
+    for word in words:
+
+      text = cache.get( word )
+      if text is None:
+        try:
+          text = disassemble_inst( Bits(32,word) )
+        except AssertionError:
+          text = ".word 0x{:0>8x}".format( word )
+        cache[ word ] = text
+
+      yield addr, word, text
+      addr += 4
 
 def disassemble( mem_image ):
 
-  # Get the text section to disassemble
+  # Disassemble the text section
 
   text_section = mem_image.get_section( ".text" )
 
-  # Iterate through the text section four bytes at a time
+  return "".join( " {:0>8x}  {:0>8x}  {}\n".format( addr, word, text )
+                  for addr, word, text in disassemble_words( text_section ) )
+
+#-------------------------------------------------------------------------
+# write_disassembly
+#-------------------------------------------------------------------------
+# Writes an objdump-style listing of the code sections of a memory image
+# (e.g., one read with elf.elf_reader) to a file object. If labels is
+# true, each symbol is printed as a label before its address. Lines are
+# written in batches so large binaries can be streamed to a file.
+
+code_sections = [ '.text', '.init', '.fini', '.xcpthandler' ]
+
+def write_disassembly( mem_image, file_obj, section_names=None, labels=True,
+                       batch_nlines=4096 ):
+
+  if section_names is None:
+    section_names = code_sections
+
+  # Symbols by address, if several share an address we print them all
+
+  symbols = {}
+  if labels:
+    for name, addr in sorted( mem_image.symbols.iteritems() ):
+      symbols.setdefault( addr, [] ).append( name )
+
+  for section in mem_image.get_sections():
+
+    if section.name not in section_names:
+      continue
+
+    lines = [ "\nDisassembly of section {}:\n".format( section.name ) ]
+
+    for addr, word, text in disassemble_words( section ):
 
-  addr = text_section.addr
-  asm_code = ""
-  for i in xrange(0,len(text_section.data),4):
+      if addr in symbols:
+        for name in symbols[addr]:
+          lines.append( "\n{:0>8x} <{}>:\n".format( addr, name ) )
 
-    print hex(addr+i)
+      lines.append( " {:0>8x}  {:0>8x}  {}\n".format( addr, word, text ) )
 
-    bits = struct.unpack_from("<I",buffer(text_section.data,i,4))[0]
-    inst_str= disassemble_inst( Bits(32,bits) )
-    disasm_line = " {:0>8x}  {:0>8x}  {}\n".format( addr+i, bits, inst_str )
-    asm_code += disasm_line
+      if len( lines ) >= batch_nlines:
+        file_obj.write( "".join( lines ) )
+        lines = []
 
-  return asm_code
+    file_obj.write( "".join( lines ) )
 
 #=========================================================================
 # TinyRV2Inst
@@ -0,0 +1,304 @@
+#=========================================================================
+# tinyrv2_fuzz
+#=========================================================================
+# Random TinyRV2 programs for differential testing of the processors
+# (see proc-fuzz). A RandomProgram is a list of items, each one or a few
+# lines of assembly, built from the instruction templates in the encoding
+# table:
+#
+#  - register-register and register-immediate ALU instructions and mul,
+#    whose sources are biased towards recently written registers so we
+#    get long dependency chains
+#  - lw/sw to a 256B data region which x31 points to
+#  - forward branches, jal, and auipc/jalr pairs, so every program
+#    terminates and every instruction runs at most once
+#  - csrr from mngr2proc/numcores/coreid and csrw to proc2mngr
+#  - runs of nops (see inst_utils.gen_nops) to vary the distances
+#    between dependent instructions
+#
+# The program starts by loading random values into x1-x30 and ends by
+# sending every register and the whole data region to proc2mngr, so the
+# proc2mngr stream captures the final architectural state. We run the
+# program on the ISA simulator to find the value each csrw proc2mngr
+# sends and annotate the assembly with it, so the resulting test
+# program checks itself on any processor, just like the directed tests.
+#
+# minimize() shrinks a failing program by removing items as long as the
+# given predicate still fails (delta debugging). Labels are never
+# removed, so any subset of the items is still a valid program.
+
+import random
+
+from tinyrv2_encoding           import tinyrv2_encoding_table, assemble
+from tinyrv2_isa_sim            import TinyRV2IsaSim
+from lab2_proc.test.inst_utils  import gen_nops
+
+#-------------------------------------------------------------------------
+# Parameters
+#-------------------------------------------------------------------------
+
+reset_pc     = 0x0200
+data_addr    = 0x2000
+data_nwords  = 64
+base_reg     = 31         # x31 always points to the data region
+num_regs     = 31         # x1-x30 are used by the program, plus x31
+
+# Instruction templates from the encoding table, by name
+
+inst_tmpls = dict( ( row[0].partition(' ')[0], row[0].partition(' ')[2] )
+                   for row in tinyrv2_encoding_table )
+
+alu_insts    = [ 'add', 'addi', 'sub', 'and', 'andi', 'or', 'ori', 'xor',
+                 'xori', 'slt', 'slti', 'sltu', 'sltiu', 'sll', 'slli',
+                 'srl', 'srli', 'sra', 'srai', 'lui', 'auipc', 'mul' ]
+branch_insts = [ 'beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu' ]
+
+# Relative weight of each kind of item
+
+item_weights = [ ( 'alu', 50 ), ( 'load', 10 ), ( 'store', 10 ),
+                 ( 'branch', 10 ), ( 'jump', 4 ), ( 'csr', 8 ),
+                 ( 'nops', 8 ) ]
+
+#=========================================================================
+# RandomProgram
+#=========================================================================
+
+class RandomProgram (object):
+
+  def __init__( s, seed, num_items=100 ):
+
+    s.seed = seed
+    s.rng  = random.Random( seed )
+
+    s.init_values = [ s.rng.getrandbits(32) for i in xrange( num_regs ) ]
+    s.data        = [ s.rng.getrandbits(32) for i in xrange( data_nwords ) ]
+
+    s.recent_dests = []
+    s.num_labels   = 0
+
+    s.items = []
+    pending_labels = []
+    for i in xrange( num_items ):
+      s.items.append( s.gen_item( pending_labels ) )
+      pending_labels = [ ( n-1, label ) for n, label in pending_labels ]
+      for n, label in pending_labels:
+        if n == 0:
+          s.items.append( label + ":" )
+      pending_labels = [ ( n, label ) for n, label in pending_labels if n > 0 ]
+
+    for n, label in pending_labels:
+      s.items.append( label + ":" )
+
+    del s.rng
+
+  #-----------------------------------------------------------------------
+  # operand helpers
+  #-----------------------------------------------------------------------
+
+  def src( s ):
+    if s.recent_dests and s.rng.random() < 0.6:
+      return "x{}".format( s.rng.choice( s.recent_dests[-3:] ) )
+    return "x{}".format( s.rng.randint( 0, num_regs ) )
+
+  def dest( s ):
+    reg = s.rng.randint( 1, num_regs-1 )
+    s.recent_dests = ( s.recent_dests + [ reg ] )[-8:]
+    return "x{}".format( reg )
+
+  def fill( s, inst ):
+
+    # Replace each field tag in the template with a random operand. We
+    # pick sources before the destination so that an instruction does
+    # not depend on its own result.
+
+    tmpl = inst_tmpls[ inst ]
+    ops  = {
+      "rs1"   : s.src(),
+      "rs2"   : s.src(),
+      "shamt" : str( s.rng.randint( 0, 31 ) ),
+      "i_imm" : str( s.rng.randint( -2048, 2047 ) ),
+      "u_imm" : "0x{:05x}".format( s.rng.getrandbits( 20 ) ),
+    }
+    ops["rd"] = s.dest()
+
+    fields = tmpl.replace( ',', ' ' ).split()
+    for field in fields:
+      tmpl = tmpl.replace( field, ops[field], 1 )
+
+    return "{} {}".format( inst, tmpl )
+
+  #-----------------------------------------------------------------------
+  # gen_item
+  #-----------------------------------------------------------------------
+
+  def gen_item( s, pending_labels ):
+
+    total = sum( weight for kind, weight in item_weights )
+    pick  = s.rng.randint( 1, total )
+    for kind, weight in item_weights:
+      pick -= weight
+      if pick <= 0:
+        break
+
+    if kind == 'alu':
+      return s.fill( s.rng.choice( alu_insts ) )
+
+    if kind == 'load':
+      return "lw {}, {}(x{})".format( s.dest(), 4*s.rng.randrange( data_nwords ),
+                                      base_reg )
+
+    if kind == 'store':
+      return "sw {}, {}(x{})".format( s.src(), 4*s.rng.randrange( data_nwords ),
+                                      base_reg )
+
+    # Forward branches and jals to a label a few items ahead
+
+    if kind in [ 'branch', 'jump' ] and s.rng.random() < 0.8:
+      label = "L{}".format( s.num_labels )
+      s.num_labels += 1
+      pending_labels.append( ( s.rng.randint( 1, 6 ), label ) )
+      if kind == 'branch':
+        return "{} {}, {}, {}".format( s.rng.choice( branch_insts ),
+                                       s.src(), s.src(), label )
+      return "jal {}, {}".format( s.dest(), label )
+
+    # auipc/jalr pair which skips the next instruction
+
+    if kind == 'jump':
+      link = s.dest()
+      return "auipc {}, 0\n    jalr {}, {}, 12\n    {}" \
+        .format( link, s.dest(), link, s.fill( s.rng.choice( alu_insts ) ) )
+
+    if kind == 'csr':
+      choice = s.rng.randint( 0, 3 )
+      if choice == 0:
+        return "csrr {}, mngr2proc < {}".format( s.dest(),
+                                                 s.rng.getrandbits(32) )
+      if choice == 1:
+        return "csrr {}, {}".format( s.dest(),
+                                     s.rng.choice([ "numcores", "coreid" ]) )
+      return "csrw proc2mngr, {}".format( s.src() )
+
+    return gen_nops( s.rng.randint( 1, 4 ) ).rstrip()
+
+  #-----------------------------------------------------------------------
+  # asm
+  #-----------------------------------------------------------------------
+  # Returns the list of assembly lines for the program with the given
+  # items (by default all of them). Each line which sends a message to
+  # proc2mngr is annotated with the value from outputs, a dict from the
+  # PC of the csrw to the value it sends.
+
+  def asm( s, items=None, outputs=None ):
+
+    if items is None:
+      items = s.items
+
+    lines = [ "lui x{}, {}".format( base_reg, data_addr >> 12 ) ]
+    for reg in xrange( 1, num_regs ):
+      lines.append( "csrr x{}, mngr2proc < {}".format( reg,
+                                                       s.init_values[reg] ) )
+
+    for item in items:
+      lines.extend( line.strip() for line in item.splitlines() )
+
+    # Send the final state
+
+    for reg in xrange( 1, num_regs+1 ):
+      lines.append( "csrw proc2mngr, x{}".format( reg ) )
+    for i in xrange( data_nwords ):
+      lines.append( "lw x1, {}(x{})".format( 4*i, base_reg ) )
+      lines.append( "csrw proc2mngr, x1" )
+
+    # Annotate the csrw proc2mngr instructions with the values they send
+
+    if outputs is not None:
+      pc = reset_pc
+      for i, line in enumerate( lines ):
+        if line.endswith( ":" ):
+          continue
+        if line.startswith( "csrw proc2mngr" ) and pc in outputs:
+          lines[i] = "{} > {}".format( line, outputs[pc] )
+        pc += 4
+
+    lines.append( ".data" )
+    lines.extend( ".word {}".format( word ) for word in s.data )
+
+    return lines
+
+  #-----------------------------------------------------------------------
+  # gen_test
+  #-----------------------------------------------------------------------
+  # Returns the self-checking test program for the given items
+
+  def gen_test( s, items=None ):
+    outputs = run_reference( s.asm( items ) )
+    return "\n".join( s.asm( items, outputs ) )
+
+#-------------------------------------------------------------------------
+# run_reference
+#-------------------------------------------------------------------------
+# Runs the (unannotated) program on the ISA simulator and returns a dict
+# from the PC of each csrw proc2mngr to the value it sent. The program
+# only branches forward so it ends when the PC runs off the text section.
+
+def run_reference( lines ):
+
+  mem_image = assemble( "\n".join( lines ) )
+  end_pc    = reset_pc + len( mem_image.get_section( ".text" ).data )
+
+  isa_sim = TinyRV2IsaSim()
+  isa_sim.load( mem_image )
+
+  for section in mem_image.get_sections():
+    if section.name == ".mngr2proc":
+      for i in xrange( 0, len( section.data ), 4 ):
+        isa_sim.mngr2proc_q[0].append( isa_sim.M[ section.addr + i :
+                                                  section.addr + i + 4 ] )
+
+  isa     = isa_sim.isas[0]
+  outputs = {}
+  while reset_pc <= isa.PC < end_pc:
+    pc = isa.PC
+    isa_sim.step_core( 0 )
+    if isa_sim.proc2mngr_q[0]:
+      outputs[pc] = "0x{:0>8x}".format( int( isa_sim.proc2mngr_q[0].popleft() ) )
+
+  return outputs
+
+#-------------------------------------------------------------------------
+# minimize
+#-------------------------------------------------------------------------
+# Delta debugging over the items of a failing program. fails( items )
+# should return True if the program with just these items still fails.
+# We try to remove chunks of items, halving the chunk size whenever no
+# chunk can be removed, and return the smallest failing list of items.
+
+def minimize( items, fails ):
+
+  def select( keep ):
+    keep = set( keep )
+    return [ item for i, item in enumerate( items )
+             if i in keep or item.endswith( ":" ) ]
+
+  keep  = [ i for i, item in enumerate( items ) if not item.endswith( ":" ) ]
+  chunk = max( len( keep ) / 2, 1 )
+
+  while keep:
+
+    removed = False
+    start   = 0
+    while start < len( keep ):
+      candidate = keep[:start] + keep[start+chunk:]
+      if fails( select( candidate ) ):
+        keep    = candidate
+        removed = True
+      else:
+        start += chunk
+
+    if not removed:
+      if chunk == 1:
+        break
+      chunk = max( chunk / 2, 1 )
+
+  return select( keep )
@@ -0,0 +1,253 @@
+#=========================================================================
+# tinyrv2_isa_sim
+#=========================================================================
+# A pure ISA simulator which runs the TinyRV2 semantics directly against
+# a SparseMemory. There is no PyMTL model, no elaboration, and no
+# SimulationTool: instruction fetch, loads, and stores access the memory
+# through a "backdoor" instead of going through val/rdy memory ports,
+# and the proc/mngr queues are plain deques. This makes it useful as a
+# fast functional golden model for long ELF runs.
+#
+# In multicore mode all cores share the same memory and we step them in
+# round-robin order, one instruction (or one translated basic block) per
+# core per step. Only core 0 talks to the manager; like in isa-sim, the
+# proc2mngr messages of the other cores are dropped.
+
+from collections import deque
+
+from tinyrv2_semantics_fast import TinyRV2SemanticsFast
+from SparseMemory           import SparseMemory
+from tinyrv2_predecode      import predecode
+
+import tinyrv2_translator
+
+#=========================================================================
+# BackdoorMemory
+#=========================================================================
+# Byte-addressable memory with the same indexing interface as the
+# BytesMemPortAdapter used by ProcFL, except that values are plain ints
+# and every access completes immediately. The underlying SparseMemory is
+# exposed as mem, just like in TestMemory, so the same loading code works
+# for both.
+
+class BackdoorMemory (object):
+
+  def __init__( s, nbytes=2**20 ):
+    s.mem = SparseMemory( nbytes )
+
+  def __getitem__( s, idx ):
+    if isinstance( idx, slice ):
+      return s.mem.read( idx.start, idx.stop - idx.start )
+    return s.mem[idx]
+
+  def __setitem__( s, idx, value ):
+    if isinstance( idx, slice ):
+      s.mem.write( idx.start, idx.stop - idx.start, int( value ) )
+    else:
+      s.mem[idx] = int( value ) & 0xFF
+
+#=========================================================================
+# TinyRV2IsaSim
+#=========================================================================
+
+class TinyRV2IsaSim (object):
+
+  #-----------------------------------------------------------------------
+  # Constructor
+  #-----------------------------------------------------------------------
+
+  def __init__( s, num_cores=1, trace_regs=False, translate=False,
+                mem_nbytes=2**20 ):
+
+    s.num_cores  = num_cores
+    s.trace_regs = trace_regs
+
+    # Translated blocks access the register file directly, so we cannot
+    # trace registers in translation mode (same as ProcFL)
+
+    s.translate  = translate and not trace_regs
+
+    s.M = BackdoorMemory( mem_nbytes )
+
+    s.mngr2proc_q = [ deque() for _ in xrange( num_cores ) ]
+    s.proc2mngr_q = [ deque() for _ in xrange( num_cores ) ]
+
+    s.isas = [ TinyRV2SemanticsFast( s.M, s.mngr2proc_q[i],
+                                     s.proc2mngr_q[i],
+                                     num_cores=num_cores )
+               for i in xrange( num_cores ) ]
+
+    for isa in s.isas:
+      isa.R.trace_regs = trace_regs
+
+    # Stats, using the same names as ProcFL
+
+    s.num_total_inst = [ 0 ] * num_cores
+    s.num_inst       = [ 0 ] * num_cores
+
+    # Number of instructions each core committed in the last step
+
+    s.commit_count = [ 0 ] * num_cores
+
+    # The last PC and instruction of each core for line tracing. We only
+    # format these in line_trace since disassembling every instruction
+    # would dominate the simulation time.
+
+    s.traces = [ None ] * num_cores
+
+    # Optional basic block vector collector (see tinyrv2_simpoint) and
+    # profiler (see tinyrv2_profile). The profiler needs to see every
+    # instruction, so it only works without translation.
+
+    s.bbv     = None
+    s.profile = None
+
+    s.reset()
+
+  #-----------------------------------------------------------------------
+  # reset
+  #-----------------------------------------------------------------------
+
+  def reset( s ):
+    for i, isa in enumerate( s.isas ):
+      isa.reset()
+      isa.coreid = i
+
+  #-----------------------------------------------------------------------
+  # load
+  #-----------------------------------------------------------------------
+  # Copy all sections of a SparseMemoryImage into memory and predecode
+  # the text section
+
+  def load( s, mem_image ):
+    for section in mem_image.get_sections():
+      start_addr = section.addr
+      stop_addr  = section.addr + len(section.data)
+      s.M.mem[start_addr:stop_addr] = section.data
+
+    predecoded = predecode( mem_image )
+    for isa in s.isas:
+      isa.predecoded = predecoded
+
+  #-----------------------------------------------------------------------
+  # stats_en
+  #-----------------------------------------------------------------------
+  # Like the stats_en port of isa-sim's TestHarness this is core 0's
+  # stats_en.
+
+  @property
+  def stats_en( s ):
+    return s.isas[0].stats_en
+
+  #-----------------------------------------------------------------------
+  # fetch
+  #-----------------------------------------------------------------------
+
+  def fetch( s, addr ):
+    return s.M[addr:addr+4]
+
+  #-----------------------------------------------------------------------
+  # step_core
+  #-----------------------------------------------------------------------
+  # Execute the next instruction (or translated basic block) on the
+  # given core and return the number of instructions committed.
+
+  def step_core( s, core ):
+
+    isa = s.isas[core]
+    pc  = isa.PC
+
+    if s.translate and s.profile is None:
+
+      block = isa.block_cache.get( pc )
+      if block is None:
+        block = tinyrv2_translator.translate( isa, pc, s.fetch )
+
+      if block:
+        num_block_inst = block( isa )
+        s.traces[core] = ( pc, "block ({} insts)".format( num_block_inst ) )
+        return num_block_inst
+
+    inst = isa.decode_cache.get( pc )
+    if inst is None:
+      inst = isa.decode( pc, s.M[pc:pc+4] )
+
+    if s.profile is not None:
+      rs1_value = isa.R.regs[ inst.rs1 ]
+
+    try:
+      isa.execute( inst )
+    except:
+      print( "Unexpected error at PC={:0>8x}!".format(pc) )
+      raise
+
+    if s.profile is not None:
+      s.profile.record( pc, inst, rs1_value, isa.PC )
+
+    s.traces[core] = ( pc, inst )
+    return 1
+
+  #-----------------------------------------------------------------------
+  # step
+  #-----------------------------------------------------------------------
+  # Step every core once. The number of instructions each core committed
+  # is left in commit_count.
+
+  def step( s ):
+
+    for core in xrange( s.num_cores ):
+
+      isa      = s.isas[core]
+      pc       = isa.PC
+      stats_en = isa.stats_en
+      count    = s.step_core( core )
+
+      s.commit_count[core]    = count
+      s.num_total_inst[core] += count
+      if stats_en:
+        s.num_inst[core] += count
+
+      if s.bbv is not None:
+        s.bbv.record( core, pc, count, isa.PC )
+
+    # Drop messages from cores which are not connected to the manager
+
+    for core in xrange( 1, s.num_cores ):
+      s.proc2mngr_q[core].clear()
+
+  #-----------------------------------------------------------------------
+  # fast_forward
+  #-----------------------------------------------------------------------
+  # Step until the cores have executed num_insts instructions in total.
+  # Close to the target we stop translating so that we do not overshoot
+  # by a whole basic block; in multicore mode we can still overshoot by
+  # up to num_cores-1 instructions. Messages to the manager are dropped.
+
+  def fast_forward( s, num_insts ):
+
+    translate = s.translate
+
+    while sum( s.num_total_inst ) < num_insts:
+      remaining   = num_insts - sum( s.num_total_inst )
+      s.translate = translate and \
+        remaining > tinyrv2_translator.max_block_insts * s.num_cores
+      s.step()
+      s.proc2mngr_q[0].clear()
+
+    s.translate = translate
+
+  #-----------------------------------------------------------------------
+  # Line tracing
+  #-----------------------------------------------------------------------
+
+  def line_trace( s ):
+
+    traces = [ " "*33 if trace is None else
+               "{:0>8x} {: <24}".format( trace[0], trace[1] )
+               for trace in s.traces ]
+
+    if s.trace_regs:
+      traces = [ trace + "  " + isa.R.trace_regs_str()
+                 for trace, isa in zip( traces, s.isas ) ]
+
+    return ' | '.join( traces )
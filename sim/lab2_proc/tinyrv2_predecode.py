@@ -0,0 +1,194 @@
+#=========================================================================
+# tinyrv2_predecode
+#=========================================================================
+# Decodes a whole text section at load time into a struct-of-arrays
+# table: one list per field (opcode, rd, rs1, rs2, funct3, funct7, the
+# sign-extended immediates, ...) plus the instruction name, indexed by
+# (pc - base) >> 2. The fast ISA semantics use the table on a decode
+# cache miss instead of decoding the word again, and the per-name counts
+# give static instruction statistics for any binary.
+#
+# If NumPy is available the section is viewed as a uint32 array and
+# every field is extracted with a few vectorized passes; the instruction
+# names are resolved by applying the opcode mask/match of each row of
+# the encoding table to the whole array. Without NumPy we fall back to
+# decoding each distinct word. Either way the columns end up as plain
+# Python lists so that looking up a single instruction stays cheap.
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+from tinyrv2_encoding       import tinyrv2_encoding_table, tinyrv2_isa_impl
+from tinyrv2_semantics_fast import decode_fields, decoded_fields
+
+#-------------------------------------------------------------------------
+# Parameters
+#-------------------------------------------------------------------------
+
+# Instruction types for the static statistics
+
+inst_types = \
+{
+  'alu'    : [ 'nop', 'add', 'addi', 'sub', 'and', 'andi', 'or', 'ori',
+               'xor', 'xori', 'slt', 'slti', 'sltu', 'sltiu', 'sra', 'srai',
+               'srl', 'srli', 'sll', 'slli', 'lui', 'auipc' ],
+  'mul'    : [ 'mul' ],
+  'load'   : [ 'lw', 'lb' ],
+  'store'  : [ 'sw', 'sb' ],
+  'branch' : [ 'beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu' ],
+  'jump'   : [ 'jal', 'jalr' ],
+  'csr'    : [ 'csrr', 'csrw' ],
+}
+
+inst_type_of = dict( ( name, inst_type )
+                     for inst_type, names in inst_types.iteritems()
+                     for name in names )
+
+# Name of each row of the encoding table
+
+row_names = [ row[0].partition(' ')[0] for row in tinyrv2_encoding_table ]
+
+#=========================================================================
+# PredecodeTable
+#=========================================================================
+
+class PredecodeTable (object):
+
+  def __init__( s, section, use_numpy=True ):
+
+    s.name   = section.name
+    s.base   = section.addr
+    s.nwords = len( section.data ) / 4
+
+    if np is not None and use_numpy:
+      s._decode_numpy( section.data )
+    else:
+      s._decode_python( section.data )
+
+  #-----------------------------------------------------------------------
+  # _decode_numpy
+  #-----------------------------------------------------------------------
+
+  def _decode_numpy( s, data ):
+
+    # Work on int64 so shifts and sign extension cannot overflow
+
+    words = np.frombuffer( data, dtype='<u4', count=s.nwords ).astype( np.int64 )
+
+    columns = dict( zip( decoded_fields, decode_fields( words ) ) )
+    columns['opcode'] = words & 0x7F
+    columns['funct3'] = (words >> 12) & 0x7
+    columns['funct7'] = (words >> 25) & 0x7F
+
+    # The first matching row of the encoding table wins, as in
+    # IsaImpl.decode_entry
+
+    row_idx = np.full( s.nwords, -1, dtype=np.int32 )
+    for idx, row in enumerate( tinyrv2_encoding_table ):
+      hit = ( row_idx < 0 ) & ( ( words & row[1] ) == row[2] )
+      row_idx[ hit ] = idx
+
+    names = np.array( row_names + [ None ], dtype=object )[ row_idx ]
+    names[ words == 0 ] = " "
+
+    s.words = words.tolist()
+    s.names = names.tolist()
+    for field, column in columns.iteritems():
+      setattr( s, field, column.tolist() )
+
+  #-----------------------------------------------------------------------
+  # _decode_python
+  #-----------------------------------------------------------------------
+
+  def _decode_python( s, data ):
+
+    data = bytearray( data[ : 4*s.nwords ] )
+    s.words = [ data[i] | (data[i+1] << 8) | (data[i+2] << 16) | (data[i+3] << 24)
+                for i in xrange( 0, 4*s.nwords, 4 ) ]
+
+    columns = zip( *map( decode_fields, s.words ) ) or [ () ] * len( decoded_fields )
+    for field, column in zip( decoded_fields, columns ):
+      setattr( s, field, list( column ) )
+
+    s.opcode = [ word & 0x7F for word in s.words ]
+    s.funct3 = [ (word >> 12) & 0x7 for word in s.words ]
+    s.funct7 = [ (word >> 25) & 0x7F for word in s.words ]
+
+    names = { 0 : " " }
+    for word in set( s.words ):
+      if word not in names:
+        try:
+          names[word] = tinyrv2_isa_impl.decode_entry( word )[2]
+        except AssertionError:
+          names[word] = None
+
+    s.names = [ names[word] for word in s.words ]
+
+  #-----------------------------------------------------------------------
+  # lookup
+  #-----------------------------------------------------------------------
+  # Returns ( name, fields ) for the instruction at pc, with the fields in
+  # decoded_fields order. Returns None if pc is not in the table, if the
+  # predecoded word differs from the given one (e.g., the program wrote
+  # to its text section), or if the word is illegal.
+
+  def lookup( s, pc, word ):
+
+    idx = ( pc - s.base ) >> 2
+    if pc & 3 or not 0 <= idx < s.nwords or s.words[idx] != word:
+      return None
+
+    name = s.names[idx]
+    if name is None:
+      return None
+
+    return name, ( s.rd[idx], s.rs1[idx], s.rs2[idx], s.shamt[idx],
+                   s.csrnum[idx], s.i_imm[idx], s.s_imm[idx], s.b_imm[idx],
+                   s.u_imm[idx], s.j_imm[idx] )
+
+  #-----------------------------------------------------------------------
+  # stats
+  #-----------------------------------------------------------------------
+  # Static instruction counts by name and by type. Zero words and words
+  # which do not decode (e.g., constants in the text section) are counted
+  # as illegal.
+
+  def stats( s ):
+
+    by_name = {}
+    for name in s.names:
+      by_name[name] = by_name.get( name, 0 ) + 1
+
+    illegal = by_name.pop( None, 0 ) + by_name.pop( " ", 0 )
+
+    by_type = {}
+    for name, count in by_name.iteritems():
+      inst_type = inst_type_of.get( name, 'other' )
+      by_type[inst_type] = by_type.get( inst_type, 0 ) + count
+
+    return { 'num_insts' : s.nwords - illegal, 'illegal' : illegal,
+             'by_name' : by_name, 'by_type' : by_type }
+
+#-------------------------------------------------------------------------
+# predecode
+#-------------------------------------------------------------------------
+# Returns the PredecodeTable for the .text section of a memory image, or
+# None if it does not have one
+
+def predecode( mem_image ):
+  for section in mem_image.get_sections():
+    if section.name == ".text":
+      return PredecodeTable( section )
+  return None
+
+#-------------------------------------------------------------------------
+# static_stats
+#-------------------------------------------------------------------------
+
+def static_stats( mem_image ):
+  table = predecode( mem_image )
+  if table is None:
+    return { 'num_insts' : 0, 'illegal' : 0, 'by_name' : {}, 'by_type' : {} }
+  return table.stats()
@@ -0,0 +1,256 @@
+#=========================================================================
+# tinyrv2_profile
+#=========================================================================
+# Instruction-mix and hot-spot profiler for the TinyRV2 ISA simulator.
+# Attach a TinyRV2Profile to TinyRV2IsaSim.profile and it records every
+# executed instruction:
+#
+#  - dynamic instruction count per opcode and per PC
+#  - taken/not-taken counts per branch PC
+#  - the address range and the number of distinct cache lines touched by
+#    loads and stores
+#
+# Counts per function are derived from the per-PC counts by attributing
+# each PC to the closest preceding function symbol in the ELF file. The
+# results can be printed as a sorted text report or saved as JSON.
+
+import json
+
+#-------------------------------------------------------------------------
+# Parameters
+#-------------------------------------------------------------------------
+
+line_nbytes = 16         # cache line size used for the footprints
+
+load_insts   = set([ 'lw', 'lb' ])
+store_insts  = set([ 'sw', 'sb' ])
+branch_insts = set([ 'beq', 'bne', 'blt', 'bge', 'bltu', 'bgeu' ])
+
+# Sections which hold code, see elf.py
+
+code_sections = set([ '.text', '.init', '.fini', '.xcpthandler' ])
+
+#=========================================================================
+# SymbolIndex
+#=========================================================================
+# Maps a PC to the function containing it. We only know where each
+# function starts, so a PC belongs to the closest symbol at or below it
+# within the code sections, see SparseMemoryImage.lookup_symbol.
+
+class SymbolIndex (object):
+
+  def __init__( s, mem_image=None ):
+    s.mem_image = mem_image
+
+  # Returns ( name, offset ), or ( None, None ) if there is no symbol
+
+  def lookup( s, pc ):
+    if s.mem_image is None:
+      return None, None
+    return s.mem_image.lookup_symbol( pc, code_sections )
+
+  def func_name( s, pc ):
+    name, offset = s.lookup( pc )
+    return name if name is not None else "<unknown>"
+
+  def pc_str( s, pc ):
+    name, offset = s.lookup( pc )
+    if name is None:
+      return "{:0>8x}".format( pc )
+    return "{:0>8x} <{}+0x{:x}>".format( pc, name, offset )
+
+#=========================================================================
+# MemRange
+#=========================================================================
+# Address range and footprint of the loads or stores
+
+class MemRange (object):
+
+  def __init__( s ):
+    s.count    = 0
+    s.min_addr = None
+    s.max_addr = None
+    s.lines    = set()
+
+  def record( s, addr ):
+    s.count += 1
+    if s.min_addr is None or addr < s.min_addr:
+      s.min_addr = addr
+    if s.max_addr is None or addr > s.max_addr:
+      s.max_addr = addr
+    s.lines.add( addr // line_nbytes )
+
+  def to_dict( s ):
+    return {
+      'count'           : s.count,
+      'min_addr'        : s.min_addr,
+      'max_addr'        : s.max_addr,
+      'footprint_bytes' : len( s.lines ) * line_nbytes,
+    }
+
+#=========================================================================
+# TinyRV2Profile
+#=========================================================================
+
+class TinyRV2Profile (object):
+
+  def __init__( s ):
+
+    s.num_insts     = 0
+    s.opcode_counts = {}     # opcode name -> count
+    s.pc_counts     = {}     # pc -> count
+    s.pc_insts      = {}     # pc -> decoded instruction, for the report
+    s.branches      = {}     # pc -> [ taken, not taken ]
+
+    s.loads         = MemRange()
+    s.stores        = MemRange()
+
+  #-----------------------------------------------------------------------
+  # record
+  #-----------------------------------------------------------------------
+  # Called after each instruction executes. rs1_value is the value of rs1
+  # before the instruction executed (a load may overwrite its own base
+  # register), and next_pc is the PC after the instruction.
+
+  def record( s, pc, inst, rs1_value, next_pc ):
+
+    name = inst.name
+
+    s.num_insts += 1
+    s.opcode_counts[name] = s.opcode_counts.get( name, 0 ) + 1
+
+    count = s.pc_counts.get( pc )
+    if count is None:
+      s.pc_counts[pc] = 1
+      s.pc_insts[pc]  = inst
+    else:
+      s.pc_counts[pc] = count + 1
+
+    if name in branch_insts:
+      branch = s.branches.get( pc )
+      if branch is None:
+        branch = s.branches[pc] = [ 0, 0 ]
+        s.pc_insts[pc] = inst
+      if next_pc != pc + 4:
+        branch[0] += 1
+      else:
+        branch[1] += 1
+
+    elif name in load_insts:
+      s.loads.record( (rs1_value + inst.i_imm) & 0xFFFFFFFF )
+
+    elif name in store_insts:
+      s.stores.record( (rs1_value + inst.s_imm) & 0xFFFFFFFF )
+
+  #-----------------------------------------------------------------------
+  # func_counts
+  #-----------------------------------------------------------------------
+  # Returns a dict from function name to dynamic instruction count
+
+  def func_counts( s, symbols ):
+    counts = {}
+    for pc, count in s.pc_counts.iteritems():
+      name = symbols.func_name( pc )
+      counts[name] = counts.get( name, 0 ) + count
+    return counts
+
+  #-----------------------------------------------------------------------
+  # to_dict
+  #-----------------------------------------------------------------------
+  # Everything as a JSON-friendly dict. Lists are sorted by decreasing
+  # count.
+
+  def to_dict( s, symbols=None ):
+
+    symbols = symbols or SymbolIndex()
+
+    def by_count( counts ):
+      return sorted( counts.items(), key=lambda item : (-item[1], item[0]) )
+
+    return {
+      'num_insts' : s.num_insts,
+
+      'opcodes'   : [ { 'opcode' : name, 'count' : count }
+                      for name, count in by_count( s.opcode_counts ) ],
+
+      'functions' : [ { 'function' : name, 'count' : count }
+                      for name, count in by_count( s.func_counts( symbols ) ) ],
+
+      'pcs'       : [ { 'pc' : pc, 'count' : count,
+                        'function' : symbols.func_name( pc ),
+                        'inst' : str( s.pc_insts[pc] ) }
+                      for pc, count in by_count( s.pc_counts ) ],
+
+      'branches'  : [ { 'pc' : pc, 'taken' : taken, 'not_taken' : not_taken,
+                        'taken_ratio' : float( taken ) / (taken + not_taken),
+                        'function' : symbols.func_name( pc ) }
+                      for pc, (taken, not_taken) in
+                        sorted( s.branches.items(),
+                                key=lambda item : (-sum( item[1] ), item[0]) ) ],
+
+      'code_footprint_bytes' : len( set( pc // line_nbytes
+                                         for pc in s.pc_counts ) ) * line_nbytes,
+
+      'loads'     : s.loads.to_dict(),
+      'stores'    : s.stores.to_dict(),
+    }
+
+  def save( s, filename, symbols=None ):
+    with open( filename, 'w' ) as fp:
+      json.dump( s.to_dict( symbols ), fp, indent=2 )
+
+  #-----------------------------------------------------------------------
+  # report
+  #-----------------------------------------------------------------------
+  # Text report with the top entries of each table
+
+  def report( s, symbols=None, top=20 ):
+
+    symbols = symbols or SymbolIndex()
+    profile = s.to_dict( symbols )
+    total   = float( max( s.num_insts, 1 ) )
+
+    lines = []
+
+    lines.append( "Profile: {} instructions".format( s.num_insts ) )
+
+    lines.append( "" )
+    lines.append( "  Instruction mix:" )
+    for entry in profile['opcodes']:
+      lines.append( "    {:<8} {:>12} {:>7.2%}" \
+        .format( entry['opcode'], entry['count'], entry['count']/total ) )
+
+    lines.append( "" )
+    lines.append( "  Functions:" )
+    for entry in profile['functions'][:top]:
+      lines.append( "    {:<28} {:>12} {:>7.2%}" \
+        .format( entry['function'], entry['count'], entry['count']/total ) )
+
+    lines.append( "" )
+    lines.append( "  Hot PCs:" )
+    for entry in profile['pcs'][:top]:
+      lines.append( "    {:<36} {:<24} {:>12} {:>7.2%}" \
+        .format( symbols.pc_str( entry['pc'] ), entry['inst'],
+                 entry['count'], entry['count']/total ) )
+
+    lines.append( "" )
+    lines.append( "  Branches:" )
+    for entry in profile['branches'][:top]:
+      lines.append( "    {:<36} {:>12} taken {:>7.2%}" \
+        .format( symbols.pc_str( entry['pc'] ),
+                 entry['taken'] + entry['not_taken'], entry['taken_ratio'] ) )
+
+    lines.append( "" )
+    lines.append( "  Memory:" )
+    lines.append( "    code     footprint {:>8} B" \
+      .format( profile['code_footprint_bytes'] ) )
+    for kind in [ 'loads', 'stores' ]:
+      mem = profile[kind]
+      if mem['count'] == 0:
+        lines.append( "    {:<8} none".format( kind ) )
+      else:
+        lines.append( "    {:<8} footprint {:>8} B  range {:0>8x}-{:0>8x}  count {}" \
+          .format( kind, mem['footprint_bytes'], mem['min_addr'],
+                   mem['max_addr'], mem['count'] ) )
+
+    return "\n".join( lines )
@@ -0,0 +1,556 @@
+#=========================================================================
+# tinyrv2_semantics_fast
+#=========================================================================
+# This class defines the same semantics as TinyRV2Semantics, but the
+# architectural state is kept in native Python integers instead of Bits
+# objects. The register file is a flat list of ints, the PC is an int,
+# and values are masked to 32 bits only when they are written back or
+# when a signed interpretation is needed. The interface (constructor,
+# reset, execute, R, PC, stats_en, coreid) matches TinyRV2Semantics so
+# that the FL processor can use either engine.
+#
+# The engine also owns a decode cache keyed by PC. Each entry is a
+# DecodedInst which holds the execute handler together with the
+# pre-extracted, pre-sign-extended operands, so a loop body is decoded
+# once no matter how many times it runs. Stores through the engine
+# invalidate any cached entry they overwrite.
+#
+# The engine also holds the block cache used by tinyrv2_translator. Both
+# caches register the words of code they depend on in code_words, which
+# maps a word address to the start PCs of the translated blocks covering
+# it, so a store only has to do one dict lookup to find out whether it
+# hit known code.
+
+from pymtl            import Bits
+from tinyrv2_encoding import decode_inst_name, disassemble_inst
+
+#-------------------------------------------------------------------------
+# Syntax Helpers
+#-------------------------------------------------------------------------
+
+MASK32 = 0xFFFFFFFF
+
+def signed( value ):
+  return value - 0x100000000 if value & 0x80000000 else value
+
+def sext( value, nbits ):
+  sign_bit = 1 << (nbits-1)
+  return (value & (sign_bit-1)) - (value & sign_bit)
+
+#-------------------------------------------------------------------------
+# decode_fields
+#-------------------------------------------------------------------------
+# Extracts every field of an instruction word. The immediates are
+# sign-extended (u_imm is already shifted). This only uses shifts, masks
+# and subtraction so it works both on a single int and on a whole NumPy
+# array of words (see tinyrv2_predecode).
+
+decoded_fields = ( 'rd', 'rs1', 'rs2', 'shamt', 'csrnum',
+                   'i_imm', 's_imm', 'b_imm', 'u_imm', 'j_imm' )
+
+def decode_fields( bits ):
+
+  rd     = (bits >>  7) & 0x1F
+  rs1    = (bits >> 15) & 0x1F
+  rs2    = (bits >> 20) & 0x1F
+  shamt  = (bits >> 20) & 0x1F
+  csrnum = (bits >> 20) & 0xFFF
+
+  i_imm  = sext( bits >> 20, 12 )
+
+  s_imm  = sext( ((bits >> 20) & 0xFE0)
+               | ((bits >>  7) & 0x01F), 12 )
+
+  b_imm  = sext( ((bits >> 19) & 0x1000)
+               | ((bits <<  4) & 0x0800)
+               | ((bits >> 20) & 0x07E0)
+               | ((bits >>  7) & 0x001E), 13 )
+
+  u_imm  = bits & 0xFFFFF000
+
+  j_imm  = sext( ((bits >> 11) & 0x100000)
+               | ( bits        & 0x0FF000)
+               | ((bits >>  9) & 0x000800)
+               | ((bits >> 20) & 0x0007FE), 21 )
+
+  return rd, rs1, rs2, shamt, csrnum, i_imm, s_imm, b_imm, u_imm, j_imm
+
+#=========================================================================
+# DecodedInst
+#=========================================================================
+# An instruction with every field extracted up front as an int. The
+# immediates are already sign-extended (u_imm is already shifted), so
+# the execute functions below never need to touch Bits. The handler is
+# the execute function for this instruction, looked up once at decode.
+# The fields can also be given as a tuple in decoded_fields order, e.g.,
+# from a predecoded text section.
+
+class DecodedInst (object):
+
+  __slots__ = ( 'name', 'bits', 'handler', 'disasm',
+                'rd', 'rs1', 'rs2', 'shamt', 'csrnum',
+                'i_imm', 's_imm', 'b_imm', 'u_imm', 'j_imm' )
+
+  def __init__( self, name, bits, handler=None, fields=None ):
+
+    self.name    = name
+    self.bits    = bits
+    self.handler = handler
+    self.disasm  = None
+
+    if fields is None:
+      fields = decode_fields( bits )
+
+    ( self.rd, self.rs1, self.rs2, self.shamt, self.csrnum, self.i_imm,
+      self.s_imm, self.b_imm, self.u_imm, self.j_imm ) = fields
+
+  # Disassembly is only needed for line tracing, so we create it lazily
+  # and keep it with the cached instruction.
+
+  def __str__( self ):
+    if self.disasm is None:
+      self.disasm = disassemble_inst( Bits( 32, self.bits ) )
+    return self.disasm
+
+class TinyRV2SemanticsFast (object):
+
+  #-----------------------------------------------------------------------
+  # IllegalInstruction
+  #-----------------------------------------------------------------------
+
+  class IllegalInstruction (Exception):
+    pass
+
+  #-----------------------------------------------------------------------
+  # RegisterFile
+  #-----------------------------------------------------------------------
+
+  class RegisterFile (object):
+
+    def __init__( self ):
+
+      self.regs = [ 0 ] * 32
+
+      self.trace_str  = ""
+      self.trace_regs = False
+      self.src0 = ""
+      self.src1 = ""
+      self.dest = ""
+
+    def __getitem__( self, idx ):
+      if self.trace_regs:
+        if self.src0 == "":
+          self.src0 = "X[{:2d}]={:0>8x}".format( idx, self.regs[idx] )
+        else:
+          self.src1 = "X[{:2d}]={:0>8x}".format( idx, self.regs[idx] )
+
+      return self.regs[idx]
+
+    def __setitem__( self, idx, value ):
+
+      trunc_value = value & MASK32
+
+      if self.trace_regs:
+        self.dest = "X[{:2d}]={:0>8x}".format( idx, trunc_value )
+
+      if idx != 0:
+        self.regs[idx] = trunc_value
+
+    def trace_regs_str( self ):
+      self.trace_str = "{:14} {:14} {:14}".format( self.dest, self.src0, self.src1 )
+      self.src0 = ""
+      self.src1 = ""
+      self.dest = ""
+      return self.trace_str
+
+  #-----------------------------------------------------------------------
+  # Constructor
+  #-----------------------------------------------------------------------
+
+  def __init__( self, memory, mngr2proc_queue, proc2mngr_queue, num_cores=1 ):
+
+    self.R = TinyRV2SemanticsFast.RegisterFile()
+    self.M = memory
+
+    self.mngr2proc_queue = mngr2proc_queue
+    self.proc2mngr_queue = proc2mngr_queue
+
+    self.numcores = num_cores
+    self.coreid   = -1
+
+    # Optional PredecodeTable for the text section, see decode
+
+    self.predecoded = None
+
+    # Only support RISC-V 32-bit ISA
+    self.xlen = 32
+
+    self.reset()
+
+  #-----------------------------------------------------------------------
+  # reset
+  #-----------------------------------------------------------------------
+
+  def reset( s ):
+
+    s.PC = 0x00000200
+    s.stats_en = False
+    s.coreid   = -1
+
+    s.decode_cache = {}
+    s.block_cache  = {}
+    s.code_words   = {}
+
+  #-----------------------------------------------------------------------
+  # decode
+  #-----------------------------------------------------------------------
+  # Decode the instruction word fetched from the given PC and add it to
+  # the decode cache. Callers should first check decode_cache themselves
+  # so that a hit does not even need to fetch the instruction. If the
+  # text section was predecoded when it was loaded we take the name and
+  # fields from there, as long as the word in memory is still the one
+  # that was predecoded.
+
+  def decode( s, pc, inst_bits ):
+    inst_bits = int( inst_bits )
+
+    entry = None
+    if s.predecoded is not None:
+      entry = s.predecoded.lookup( pc, inst_bits )
+
+    if entry is not None:
+      name, fields = entry
+      inst = DecodedInst( name, inst_bits, s.execute_dispatch[name], fields )
+    else:
+      name = decode_inst_name( inst_bits )
+      inst = DecodedInst( name, inst_bits, s.execute_dispatch[name] )
+
+    s.decode_cache[pc] = inst
+    s.code_words.setdefault( pc, [] )
+    return inst
+
+  #-----------------------------------------------------------------------
+  # invalidate
+  #-----------------------------------------------------------------------
+  # Drop any cached instruction or translated block overlapping the bytes
+  # [addr,addr+nbytes). This keeps self-modifying code (e.g., tests that
+  # write to .text) correct. Note that stores from other cores are not
+  # seen here.
+
+  def invalidate( s, addr, nbytes ):
+    for word in ( addr & ~3, (addr+nbytes-1) & ~3 ):
+      block_pcs = s.code_words.pop( word, None )
+      if block_pcs is not None:
+        s.decode_cache.pop( word, None )
+        for block_pc in block_pcs:
+          s.block_cache.pop( block_pc, None )
+
+  #-----------------------------------------------------------------------
+  # Basic Instructions
+  #-----------------------------------------------------------------------
+
+  def execute_nop( s, inst ):
+    s.PC += 4
+
+  #-----------------------------------------------------------------------
+  # Register-register arithmetic, logical, and comparison instructions
+  #-----------------------------------------------------------------------
+
+  def execute_add( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] + s.R[inst.rs2]
+    s.PC += 4
+
+  def execute_sub( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] - s.R[inst.rs2]
+    s.PC += 4
+
+  def execute_sll( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] << (s.R[inst.rs2] & 0x1F)
+    s.PC += 4
+
+  def execute_slt( s, inst ):
+    s.R[inst.rd] = signed( s.R[inst.rs1] ) < signed( s.R[inst.rs2] )
+    s.PC += 4
+
+  def execute_sltu( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] < s.R[inst.rs2]
+    s.PC += 4
+
+  def execute_xor( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] ^ s.R[inst.rs2]
+    s.PC += 4
+
+  def execute_srl( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] >> (s.R[inst.rs2] & 0x1F)
+    s.PC += 4
+
+  def execute_sra( s, inst ):
+    s.R[inst.rd] = signed( s.R[inst.rs1] ) >> (s.R[inst.rs2] & 0x1F)
+    s.PC += 4
+
+  def execute_or( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] | s.R[inst.rs2]
+    s.PC += 4
+
+  def execute_and( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] & s.R[inst.rs2]
+    s.PC += 4
+
+  #-----------------------------------------------------------------------
+  # Register-immediate arithmetic, logical, and comparison instructions
+  #-----------------------------------------------------------------------
+
+  def execute_addi( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] + inst.i_imm
+    s.PC += 4
+
+  def execute_slti( s, inst ):
+    s.R[inst.rd] = signed( s.R[inst.rs1] ) < inst.i_imm
+    s.PC += 4
+
+  def execute_sltiu( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] < (inst.i_imm & MASK32)
+    s.PC += 4
+
+  def execute_xori( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] ^ inst.i_imm
+    s.PC += 4
+
+  def execute_ori( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] | inst.i_imm
+    s.PC += 4
+
+  def execute_andi( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] & inst.i_imm
+    s.PC += 4
+
+  def execute_slli( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] << inst.shamt
+    s.PC += 4
+
+  def execute_srli( s, inst ):
+    s.R[inst.rd] = s.R[inst.rs1] >> inst.shamt
+    s.PC += 4
+
+  def execute_srai( s, inst ):
+    s.R[inst.rd] = signed( s.R[inst.rs1] ) >> inst.shamt
+    s.PC += 4
+
+  #-----------------------------------------------------------------------
+  # Other instructions
+  #-----------------------------------------------------------------------
+
+  def execute_lui( s, inst ):
+    s.R[inst.rd] = inst.u_imm
+    s.PC += 4
+
+  def execute_auipc( s, inst ):
+    s.R[inst.rd] = inst.u_imm + s.PC
+    s.PC += 4
+
+  #-----------------------------------------------------------------------
+  # Load/store instructions
+  #-----------------------------------------------------------------------
+
+  def execute_lw( s, inst ):
+    addr = (s.R[inst.rs1] + inst.i_imm) & MASK32
+    s.R[inst.rd] = int( s.M[addr:addr+4] )
+    s.PC += 4
+
+  def execute_sw( s, inst ):
+    addr = (s.R[inst.rs1] + inst.s_imm) & MASK32
+    s.M[addr:addr+4] = s.R[inst.rs2]
+    s.invalidate( addr, 4 )
+    s.PC += 4
+
+  def execute_lb( s, inst ):
+    addr = (s.R[inst.rs1] + inst.i_imm) & MASK32
+    s.R[inst.rd] = sext( int( s.M[addr] ), 8 )
+    s.PC += 4
+
+  def execute_sb( s, inst ):
+    addr = (s.R[inst.rs1] + inst.s_imm) & MASK32
+    s.M[addr] = s.R[inst.rs2] & 0xFF
+    s.invalidate( addr, 1 )
+    s.PC += 4
+
+  #-----------------------------------------------------------------------
+  # Unconditional jump instructions
+  #-----------------------------------------------------------------------
+
+  def execute_jal( s, inst ):
+    s.R[inst.rd] = s.PC + 4
+    s.PC = (s.PC + inst.j_imm) & MASK32
+
+  def execute_jalr( s, inst ):
+    temp = s.R[inst.rs1] + inst.i_imm
+    s.R[inst.rd] = s.PC + 4
+    s.PC = temp & 0xFFFFFFFE
+
+  #-----------------------------------------------------------------------
+  # Conditional branch instructions
+  #-----------------------------------------------------------------------
+
+  def execute_beq( s, inst ):
+    if s.R[inst.rs1] == s.R[inst.rs2]:
+      s.PC = (s.PC + inst.b_imm) & MASK32
+    else:
+      s.PC += 4
+
+  def execute_bne( s, inst ):
+    if s.R[inst.rs1] != s.R[inst.rs2]:
+      s.PC = (s.PC + inst.b_imm) & MASK32
+    else:
+      s.PC += 4
+
+  def execute_blt( s, inst ):
+    if signed( s.R[inst.rs1] ) < signed( s.R[inst.rs2] ):
+      s.PC = (s.PC + inst.b_imm) & MASK32
+    else:
+      s.PC += 4
+
+  def execute_bge( s, inst ):
+    if signed( s.R[inst.rs1] ) >= signed( s.R[inst.rs2] ):
+      s.PC = (s.PC + inst.b_imm) & MASK32
+    else:
+      s.PC += 4
+
+  def execute_bltu( s, inst ):
+    if s.R[inst.rs1] < s.R[inst.rs2]:
+      s.PC = (s.PC + inst.b_imm) & MASK32
+    else:
+      s.PC += 4
+
+  def execute_bgeu( s, inst ):
+    if s.R[inst.rs1] >= s.R[inst.rs2]:
+      s.PC = (s.PC + inst.b_imm) & MASK32
+    else:
+      s.PC += 4
+
+  #-----------------------------------------------------------------------
+  # Mul/Div instructions
+  #-----------------------------------------------------------------------
+
+  def execute_mul( s, inst ):
+    s.R[ inst.rd ] = s.R[inst.rs1] * s.R[inst.rs2]
+    s.PC += 4
+
+  #-----------------------------------------------------------------------
+  # CSR instructions
+  #-----------------------------------------------------------------------
+
+  def execute_csrr( s, inst ):
+
+    # CSR: mngr2proc
+    # for mngr2proc just ignore the rs1 and do _not_ write to CSR at all.
+    # this is the same as setting rs1 = x0.
+
+    if   inst.csrnum == 0xFC0:
+      bits = s.mngr2proc_queue.popleft()
+      s.mngr2proc_str = str(bits)
+      s.R[inst.rd] = int( bits )
+
+    # CSR: numcores
+    elif inst.csrnum == 0xFC1:
+      s.R[inst.rd] = s.numcores
+
+    # CSR: coreid
+    elif inst.csrnum == 0xF14:
+      s.R[inst.rd] = int( s.coreid )
+
+    else:
+      raise TinyRV2SemanticsFast.IllegalInstruction(
+        "Unrecognized CSR register ({}) for csrr at PC={:0>8x}" \
+          .format(inst.csrnum,s.PC) )
+
+    s.PC += 4
+
+  def execute_csrw( s, inst ):
+
+    # CSR: proc2mngr
+    # for proc2mngr we ignore the rd and do _not_ write old value to rd.
+    # this is the same as setting rd = x0.
+
+    if   inst.csrnum == 0x7C0:
+      bits = s.R[inst.rs1]
+      s.proc2mngr_str = "{:0>8x}".format(bits)
+      s.proc2mngr_queue.append( bits )
+
+    # CSR: stats_en
+
+    elif inst.csrnum == 0x7C1:
+      s.stats_en = bool( s.R[inst.rs1] )
+
+    else:
+      raise TinyRV2SemanticsFast.IllegalInstruction(
+        "Unrecognized CSR register ({}) for csrw at PC={:0>8x}" \
+          .format(inst.csrnum,s.PC) )
+
+    s.PC += 4
+
+  def execute_dumb( s, inst ):
+    pass
+
+  #-----------------------------------------------------------------------
+  # exec
+  #-----------------------------------------------------------------------
+
+  execute_dispatch = {
+
+    'nop'   : execute_nop,
+
+    'add'   : execute_add,
+    'addi'  : execute_addi,
+    'sub'   : execute_sub,
+    'mul'   : execute_mul,
+    'and'   : execute_and,
+    'andi'  : execute_andi,
+    'or'    : execute_or,
+    'ori'   : execute_ori,
+    'xor'   : execute_xor,
+    'xori'  : execute_xori,
+
+    'slt'   : execute_slt,
+    'slti'  : execute_slti,
+    'sltu'  : execute_sltu,
+    'sltiu' : execute_sltiu,
+
+    'sra'   : execute_sra,
+    'srai'  : execute_srai,
+    'srl'   : execute_srl,
+    'srli'  : execute_srli,
+    'sll'   : execute_sll,
+    'slli'  : execute_slli,
+
+    'lui'   : execute_lui,
+    'auipc' : execute_auipc,
+    'lw'    : execute_lw,
+    'sw'    : execute_sw,
+    'lb'    : execute_lb,
+    'sb'    : execute_sb,
+
+    'jal'   : execute_jal,
+    'jalr'  : execute_jalr,
+    'beq'   : execute_beq,
+    'bne'   : execute_bne,
+    'blt'   : execute_blt,
+    'bge'   : execute_bge,
+    'bltu'  : execute_bltu,
+    'bgeu'  : execute_bgeu,
+
+    'csrr' : execute_csrr,
+    'csrw' : execute_csrw,
+
+    ' '    : execute_dumb # this is for all-zero
+
+  }
+
+  # execute accepts either a DecodedInst (e.g., from the decode cache) or
+  # the same TinyRV2Inst as TinyRV2Semantics. For the latter we pull the
+  # raw instruction word out once and decode every field as an int.
+
+  def execute( self, inst ):
+    if not isinstance( inst, DecodedInst ):
+      name = inst.name
+      inst = DecodedInst( name, inst.bits.uint(), self.execute_dispatch[name] )
+    inst.handler( self, inst )
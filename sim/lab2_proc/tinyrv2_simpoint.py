@@ -0,0 +1,335 @@
+#=========================================================================
+# tinyrv2_simpoint
+#=========================================================================
+# SimPoint-style phase analysis for sampled simulation. We split the
+# dynamic instruction stream into fixed-size intervals and record a basic
+# block vector (BBV) for each one, i.e., how many instructions executed
+# in each basic block during the interval. Then we:
+#
+#  - normalize each BBV and randomly project it down to a few dimensions
+#  - cluster the projected vectors with k-means for k = 1 .. max_k and
+#    pick the smallest k whose BIC score is within 90% of the best one
+#  - pick the intervals closest to each centroid as simulation points and
+#    weight each cluster by the fraction of instructions it covers
+#
+# Simulating a few points per cluster in detail and combining the
+# results with these weights gives an estimate of the CPI of the whole
+# program. With more than one point per cluster we also get the variance
+# within each cluster, which gives us an error bound on the estimate
+# (stratified sampling).
+
+import json
+import math
+import random
+
+#-------------------------------------------------------------------------
+# Parameters
+#-------------------------------------------------------------------------
+
+projection_dims = 15     # dimensions after random projection
+kmeans_seeds    = 5      # number of k-means runs with different seeds
+kmeans_iters    = 100    # max iterations per k-means run
+bic_threshold   = 0.9    # fraction of the BIC range we must reach
+
+#=========================================================================
+# BBVCollector
+#=========================================================================
+# Attach to TinyRV2IsaSim.bbv to collect BBVs. A basic block is keyed by
+# its leader PC, which is the first PC executed after a non-sequential PC
+# change. Intervals are measured in instructions summed over all cores.
+
+class BBVCollector (object):
+
+  def __init__( s, interval, num_cores=1 ):
+
+    s.interval = interval
+
+    s.bbvs     = []     # one dict (leader PC -> insts) per interval
+    s.sizes    = []     # number of instructions in each interval
+
+    s.cur_bbv  = {}
+    s.cur_size = 0
+
+    s.leaders  = [ None ] * num_cores
+
+  def record( s, core, pc, count, next_pc ):
+
+    leader = s.leaders[core]
+    if leader is None:
+      leader = pc
+
+    s.cur_bbv[leader] = s.cur_bbv.get( leader, 0 ) + count
+    s.cur_size += count
+
+    # The next instruction starts a new block unless we fell through
+
+    if next_pc == pc + 4*count:
+      s.leaders[core] = leader
+    else:
+      s.leaders[core] = None
+
+    if s.cur_size >= s.interval:
+      s.end_interval()
+
+  def end_interval( s ):
+    if s.cur_size > 0:
+      s.bbvs.append( s.cur_bbv )
+      s.sizes.append( s.cur_size )
+    s.cur_bbv  = {}
+    s.cur_size = 0
+
+  # Close the last (partial) interval at the end of the program
+
+  def finish( s ):
+    s.end_interval()
+
+#-------------------------------------------------------------------------
+# project
+#-------------------------------------------------------------------------
+# Normalize each BBV and randomly project it to projection_dims
+# dimensions. The random vector for each basic block is derived from its
+# leader PC so that the projection does not depend on iteration order.
+
+def project( bbvs, seed=0 ):
+
+  block_vecs = {}
+
+  def block_vec( pc ):
+    vec = block_vecs.get( pc )
+    if vec is None:
+      rgen = random.Random( (seed << 32) | pc )
+      vec  = [ rgen.uniform( -1.0, 1.0 ) for _ in xrange( projection_dims ) ]
+      block_vecs[pc] = vec
+    return vec
+
+  points = []
+  for bbv in bbvs:
+    total = float( sum( bbv.values() ) )
+    point = [ 0.0 ] * projection_dims
+    for pc, count in bbv.iteritems():
+      weight = count / total
+      for i, x in enumerate( block_vec( pc ) ):
+        point[i] += weight * x
+    points.append( point )
+
+  return points
+
+#-------------------------------------------------------------------------
+# Vector helpers
+#-------------------------------------------------------------------------
+
+def dist2( a, b ):
+  return sum( (x - y)*(x - y) for x, y in zip( a, b ) )
+
+def closest( point, centroids ):
+  return min( xrange( len( centroids ) ),
+              key=lambda k : dist2( point, centroids[k] ) )
+
+#-------------------------------------------------------------------------
+# kmeans
+#-------------------------------------------------------------------------
+# Lloyd's algorithm with k-means++ initialization. Returns the labels,
+# centroids, and sum of squared distances of the best of kmeans_seeds
+# runs.
+
+def kmeans( points, k, seed=0 ):
+
+  best = None
+
+  for run in xrange( kmeans_seeds ):
+
+    rgen = random.Random( seed*1000 + run )
+
+    # k-means++ initialization
+
+    centroids = [ list( rgen.choice( points ) ) ]
+    while len( centroids ) < k:
+      d2    = [ min( dist2( p, c ) for c in centroids ) for p in points ]
+      total = sum( d2 )
+      if total == 0.0:
+        centroids.append( list( rgen.choice( points ) ) )
+        continue
+      target = rgen.uniform( 0.0, total )
+      for p, d in zip( points, d2 ):
+        target -= d
+        if target <= 0.0:
+          break
+      centroids.append( list( p ) )
+
+    # Lloyd iterations
+
+    labels = None
+    for it in xrange( kmeans_iters ):
+
+      new_labels = [ closest( p, centroids ) for p in points ]
+      if new_labels == labels:
+        break
+      labels = new_labels
+
+      for j in xrange( k ):
+        members = [ p for p, l in zip( points, labels ) if l == j ]
+        if members:
+          centroids[j] = [ sum( xs ) / len( members ) for xs in zip( *members ) ]
+
+    sse = sum( dist2( p, centroids[l] ) for p, l in zip( points, labels ) )
+
+    if best is None or sse < best[2]:
+      best = ( labels, centroids, sse )
+
+  return best
+
+#-------------------------------------------------------------------------
+# bic
+#-------------------------------------------------------------------------
+# Bayesian information criterion of a clustering assuming spherical
+# Gaussian clusters (Pelleg and Moore, "X-means", 2000), which is what
+# SimPoint uses to choose k. Larger is better.
+
+def bic( points, labels, k, sse ):
+
+  num_points = len( points )
+  dims       = len( points[0] )
+
+  if num_points <= k:
+    return float('-inf')
+
+  variance = max( sse / ( num_points - k ), 1e-12 )
+
+  log_likelihood = 0.0
+  for j in xrange( k ):
+    n = labels.count( j )
+    if n == 0:
+      continue
+    log_likelihood += ( - n/2.0 * math.log( 2*math.pi )
+                        - n*dims/2.0 * math.log( variance )
+                        - (n - k)/2.0
+                        + n * math.log( n )
+                        - n * math.log( num_points ) )
+
+  num_params = (k - 1) + dims*k + 1
+
+  return log_likelihood - num_params/2.0 * math.log( num_points )
+
+#-------------------------------------------------------------------------
+# find_simpoints
+#-------------------------------------------------------------------------
+# Cluster the BBVs of a BBVCollector and return a dict which can be
+# dumped as JSON:
+#
+#  {
+#    "interval"     : instructions per interval,
+#    "total_insts"  : instructions in the whole program,
+#    "k"            : number of clusters,
+#    "clusters"     : [ { "weight" : w, "num_intervals" : n }, ... ],
+#    "points"       : [ { "cluster" : k, "interval" : i,
+#                         "start_inst" : s, "num_insts" : n }, ... ],
+#  }
+
+def find_simpoints( collector, max_k=10, points_per_cluster=2, seed=0 ):
+
+  sizes  = collector.sizes
+  points = project( collector.bbvs, seed )
+
+  # Cluster for each k and choose k with the BIC
+
+  max_k   = max( 1, min( max_k, len( points ) ) )
+  results = [ kmeans( points, k, seed ) for k in xrange( 1, max_k+1 ) ]
+  scores  = [ bic( points, labels, k+1, sse )
+              for k, (labels, centroids, sse) in enumerate( results ) ]
+
+  finite = [ score for score in scores if score != float('-inf') ]
+  chosen = 0
+  if finite:
+    lo, hi = min( finite ), max( finite )
+    for k, score in enumerate( scores ):
+      if score >= lo + bic_threshold*(hi - lo):
+        chosen = k
+        break
+
+  labels, centroids, sse = results[ chosen ]
+  k = chosen + 1
+
+  # Weight clusters by instructions and pick the points closest to each
+  # centroid
+
+  total_insts = sum( sizes )
+  starts      = [ sum( sizes[:i] ) for i in xrange( len( sizes ) ) ]
+
+  clusters = []
+  simpoints = []
+
+  for j in xrange( k ):
+
+    members = [ i for i, l in enumerate( labels ) if l == j ]
+    if not members:
+      continue
+
+    clusters.append({
+      'weight'        : sum( sizes[i] for i in members ) / float( total_insts ),
+      'num_intervals' : len( members ),
+    })
+
+    members.sort( key=lambda i : dist2( points[i], centroids[j] ) )
+    for i in members[:points_per_cluster]:
+      simpoints.append({
+        'cluster'    : len( clusters ) - 1,
+        'interval'   : i,
+        'start_inst' : starts[i],
+        'num_insts'  : sizes[i],
+      })
+
+  return {
+    'interval'    : collector.interval,
+    'total_insts' : total_insts,
+    'k'           : len( clusters ),
+    'clusters'    : clusters,
+    'points'      : simpoints,
+  }
+
+def save_simpoints( simpoints, filename ):
+  with open( filename, 'w' ) as fp:
+    json.dump( simpoints, fp, indent=2 )
+
+def load_simpoints( filename ):
+  with open( filename, 'r' ) as fp:
+    return json.load( fp )
+
+#-------------------------------------------------------------------------
+# estimate_cpi
+#-------------------------------------------------------------------------
+# Combine the measured CPI of each simulation point into an estimate of
+# the CPI of the whole program. cpis is a list with one CPI per entry in
+# simpoints['points']. Returns the estimated CPI and the half width of
+# its 95% confidence interval. The latter is None if no cluster has more
+# than one point, since we then cannot estimate the variance.
+
+def estimate_cpi( simpoints, cpis ):
+
+  per_cluster = {}
+  for point, cpi in zip( simpoints['points'], cpis ):
+    per_cluster.setdefault( point['cluster'], [] ).append( cpi )
+
+  est_cpi  = 0.0
+  variance = 0.0
+  have_var = False
+
+  for j, cluster in enumerate( simpoints['clusters'] ):
+
+    values = per_cluster[j]
+    n      = len( values )
+    mean   = sum( values ) / n
+    weight = cluster['weight']
+
+    est_cpi += weight * mean
+
+    # Stratified sampling variance with finite population correction
+
+    if n > 1:
+      have_var = True
+      sample_var = sum( (v - mean)**2 for v in values ) / (n - 1)
+      fpc = 1.0 - float( n ) / cluster['num_intervals']
+      variance += weight**2 * sample_var / n * fpc
+
+  error = 1.96 * math.sqrt( variance ) if have_var else None
+
+  return est_cpi, error
@@ -0,0 +1,263 @@
+#=========================================================================
+# tinyrv2_translator
+#=========================================================================
+# Translates a basic block of decoded TinyRV2 instructions into a single
+# Python function. The generated code implements the same semantics as
+# the execute_* functions in TinyRV2SemanticsFast, but the register
+# specifiers, immediates, PCs, and branch targets are all constants in
+# the generated source, and the register file is accessed directly as a
+# list of ints. A translated block has the following form:
+#
+#  def block( s ):
+#    R = s.R.regs
+#    M = s.M
+#    W = s.code_words
+#    ...                     # one or more lines per instruction
+#    s.PC = <next pc>
+#    return <number of instructions executed>
+#
+# Blocks end with a jump or branch, or right before an instruction we do
+# not translate (CSR accesses, which can block on the manager queues and
+# change stats_en, or words which do not decode). A store which hits a
+# word of known code invalidates it through s.invalidate and leaves the
+# block right away, so self-modifying code is handled correctly.
+
+from tinyrv2_semantics_fast import MASK32, signed, sext
+
+#-------------------------------------------------------------------------
+# Code templates
+#-------------------------------------------------------------------------
+# Templates for instructions which just write rd. If rd is x0 these
+# generate no code at all.
+
+rd_templates = {
+  'add'   : "R[{rd}] = (R[{rs1}] + R[{rs2}]) & 0xFFFFFFFF",
+  'sub'   : "R[{rd}] = (R[{rs1}] - R[{rs2}]) & 0xFFFFFFFF",
+  'mul'   : "R[{rd}] = (R[{rs1}] * R[{rs2}]) & 0xFFFFFFFF",
+  'and'   : "R[{rd}] = R[{rs1}] & R[{rs2}]",
+  'or'    : "R[{rd}] = R[{rs1}] | R[{rs2}]",
+  'xor'   : "R[{rd}] = R[{rs1}] ^ R[{rs2}]",
+  'slt'   : "R[{rd}] = int( signed( R[{rs1}] ) < signed( R[{rs2}] ) )",
+  'sltu'  : "R[{rd}] = int( R[{rs1}] < R[{rs2}] )",
+  'sll'   : "R[{rd}] = (R[{rs1}] << (R[{rs2}] & 0x1F)) & 0xFFFFFFFF",
+  'srl'   : "R[{rd}] = R[{rs1}] >> (R[{rs2}] & 0x1F)",
+  'sra'   : "R[{rd}] = (signed( R[{rs1}] ) >> (R[{rs2}] & 0x1F)) & 0xFFFFFFFF",
+
+  'addi'  : "R[{rd}] = (R[{rs1}] + {i_imm}) & 0xFFFFFFFF",
+  'andi'  : "R[{rd}] = R[{rs1}] & {i_imm_u}",
+  'ori'   : "R[{rd}] = R[{rs1}] | {i_imm_u}",
+  'xori'  : "R[{rd}] = R[{rs1}] ^ {i_imm_u}",
+  'slti'  : "R[{rd}] = int( signed( R[{rs1}] ) < {i_imm} )",
+  'sltiu' : "R[{rd}] = int( R[{rs1}] < {i_imm_u} )",
+  'slli'  : "R[{rd}] = (R[{rs1}] << {shamt}) & 0xFFFFFFFF",
+  'srli'  : "R[{rd}] = R[{rs1}] >> {shamt}",
+  'srai'  : "R[{rd}] = (signed( R[{rs1}] ) >> {shamt}) & 0xFFFFFFFF",
+
+  'lui'   : "R[{rd}] = {u_imm}",
+  'auipc' : "R[{rd}] = {auipc}",
+}
+
+# Loads always access memory even if rd is x0
+
+load_templates = {
+  'lw'    : "a = (R[{rs1}] + {i_imm}) & 0xFFFFFFFF\n"
+            "v = int( M[a:a+4] )",
+  'lb'    : "a = (R[{rs1}] + {i_imm}) & 0xFFFFFFFF\n"
+            "v = sext( int( M[a] ), 8 ) & 0xFFFFFFFF",
+}
+
+store_templates = {
+  'sw'    : "a = (R[{rs1}] + {s_imm}) & 0xFFFFFFFF\n"
+            "M[a:a+4] = R[{rs2}]\n"
+            "if (a & ~3) in W or ((a+3) & ~3) in W:\n"
+            "  s.invalidate( a, 4 )\n"
+            "  s.PC = {next_pc}\n"
+            "  return {count}",
+  'sb'    : "a = (R[{rs1}] + {s_imm}) & 0xFFFFFFFF\n"
+            "M[a] = R[{rs2}] & 0xFF\n"
+            "if (a & ~3) in W:\n"
+            "  s.invalidate( a, 1 )\n"
+            "  s.PC = {next_pc}\n"
+            "  return {count}",
+}
+
+branch_conds = {
+  'beq'   : "R[{rs1}] == R[{rs2}]",
+  'bne'   : "R[{rs1}] != R[{rs2}]",
+  'blt'   : "signed( R[{rs1}] ) < signed( R[{rs2}] )",
+  'bge'   : "signed( R[{rs1}] ) >= signed( R[{rs2}] )",
+  'bltu'  : "R[{rs1}] < R[{rs2}]",
+  'bgeu'  : "R[{rs1}] >= R[{rs2}]",
+}
+
+# Instructions which end a basic block (after being translated)
+
+control_insts = set( branch_conds.keys() + [ 'jal', 'jalr' ] )
+
+# Instructions which can be part of a basic block
+
+translatable_insts = set( [ 'nop' ] + rd_templates.keys()
+                          + load_templates.keys() + store_templates.keys() ) \
+                     | control_insts
+
+#-------------------------------------------------------------------------
+# gen_inst_code
+#-------------------------------------------------------------------------
+# Returns a list of source lines for the given instruction at the given
+# PC. count is the number of instructions executed once this instruction
+# completes, which is what the block returns if it exits here.
+
+def gen_inst_code( pc, inst, count ):
+
+  name    = inst.name
+  next_pc = "0x{:08x}".format( (pc + 4) & MASK32 )
+
+  fields = {
+    'rd'      : inst.rd,
+    'rs1'     : inst.rs1,
+    'rs2'     : inst.rs2,
+    'shamt'   : inst.shamt,
+    'i_imm'   : inst.i_imm,
+    'i_imm_u' : inst.i_imm & MASK32,
+    's_imm'   : inst.s_imm,
+    'u_imm'   : inst.u_imm,
+    'auipc'   : (inst.u_imm + pc) & MASK32,
+    'next_pc' : next_pc,
+    'count'   : count,
+  }
+
+  if name == 'nop':
+    return []
+
+  if name in rd_templates:
+    if inst.rd == 0:
+      return []
+    return [ rd_templates[name].format( **fields ) ]
+
+  if name in load_templates:
+    code = load_templates[name].format( **fields ).split('\n')
+    if inst.rd != 0:
+      code.append( "R[{}] = v".format( inst.rd ) )
+    return code
+
+  if name in store_templates:
+    return store_templates[name].format( **fields ).split('\n')
+
+  if name in branch_conds:
+    return [
+      "if " + branch_conds[name].format( **fields ) + ":",
+      "  s.PC = 0x{:08x}".format( (pc + inst.b_imm) & MASK32 ),
+      "else:",
+      "  s.PC = {}".format( next_pc ),
+      "return {}".format( count ),
+    ]
+
+  if name == 'jal':
+    code = []
+    if inst.rd != 0:
+      code.append( "R[{}] = {}".format( inst.rd, next_pc ) )
+    code.append( "s.PC = 0x{:08x}".format( (pc + inst.j_imm) & MASK32 ) )
+    code.append( "return {}".format( count ) )
+    return code
+
+  if name == 'jalr':
+    code = [ "t = (R[{}] + {}) & 0xFFFFFFFE".format( inst.rs1, inst.i_imm ) ]
+    if inst.rd != 0:
+      code.append( "R[{}] = {}".format( inst.rd, next_pc ) )
+    code.append( "s.PC = t" )
+    code.append( "return {}".format( count ) )
+    return code
+
+  raise AssertionError( "Cannot translate {} at PC={:0>8x}".format( name, pc ) )
+
+#-------------------------------------------------------------------------
+# translate_block
+#-------------------------------------------------------------------------
+# Takes a list of (pc, DecodedInst) tuples for consecutive instructions
+# and returns the compiled block function. Only the last instruction may
+# be a control instruction.
+
+def translate_block( insts ):
+
+  start_pc = insts[0][0]
+
+  lines = [
+    "def block( s ):",
+    "  R = s.R.regs",
+    "  M = s.M",
+    "  W = s.code_words",
+  ]
+
+  for idx, (pc, inst) in enumerate( insts ):
+    lines.append( "  # {:0>8x} {}".format( pc, inst.name ) )
+    for line in gen_inst_code( pc, inst, idx+1 ):
+      lines.append( "  " + line )
+
+  # Fall through to the next block unless the block ended with a control
+  # instruction, which sets the PC and returns itself
+
+  last_pc, last_inst = insts[-1]
+  if last_inst.name not in control_insts:
+    lines.append( "  s.PC = 0x{:08x}".format( (last_pc + 4) & MASK32 ) )
+    lines.append( "  return {}".format( len(insts) ) )
+
+  src = "\n".join( lines ) + "\n"
+
+  namespace = { 'signed' : signed, 'sext' : sext }
+  exec( compile( src, "<block {:0>8x}>".format( start_pc ), "exec" ), namespace )
+
+  block = namespace['block']
+  block.src = src
+  return block
+
+#-------------------------------------------------------------------------
+# translate
+#-------------------------------------------------------------------------
+# Finds the basic block starting at pc, translates it, and adds it to the
+# block cache of the given TinyRV2SemanticsFast engine. fetch( addr )
+# returns the instruction word at addr and is only called for words which
+# are not already in the decode cache. Returns the block function, or
+# False if the instruction at pc cannot be translated, in which case the
+# caller should execute it through the engine as usual. False is cached
+# as well so that we do not try again every time we reach this PC.
+
+max_block_insts = 64
+
+def translate( isa, pc, fetch ):
+
+  insts   = []
+  inst_pc = pc
+
+  while len( insts ) < max_block_insts:
+
+    inst = isa.decode_cache.get( inst_pc )
+    if inst is None:
+      inst_bits = fetch( inst_pc )
+      try:
+        inst = isa.decode( inst_pc, inst_bits )
+      except AssertionError:
+        break
+
+    if inst.name not in translatable_insts:
+      break
+
+    insts.append( (inst_pc, inst) )
+
+    if inst.name in control_insts:
+      break
+
+    inst_pc = (inst_pc + 4) & MASK32
+
+  # Register every word of the block so that a store to any of them
+  # invalidates the block
+
+  if insts:
+    block = translate_block( insts )
+    for inst_pc, inst in insts:
+      isa.code_words.setdefault( inst_pc, [] ).append( pc )
+  else:
+    block = False
+    isa.code_words.setdefault( pc, [] ).append( pc )
+
+  isa.block_cache[pc] = block
+  return block
@@ -0,0 +1,234 @@
+#=========================================================================
+# verilog_cache
+#=========================================================================
+# A content-addressed cache of verilated models shared by all processes
+# and test sessions. PyMTL verilates a model (both the *VRTL wrappers and
+# PyMTL models translated with --test-verilog) in get_verilated, which
+# writes the Verilog for the top-level model to <name>.v in the current
+# directory and calls verilog_to_pymtl to run Verilator and build
+# libV<name>.so plus the C and Python wrappers. It only skips that step if
+# an identical <name>.v is already in the current directory, so every
+# new build directory, and every pytest-xdist worker racing on the same
+# one, compiles each design again.
+#
+# install() wraps verilog_to_pymtl so that the build artifacts are looked
+# up in a cache directory first. The key is a hash of:
+#
+#  - the generated top-level Verilog, which includes the set_params
+#    values and the port list of the model
+#  - every Verilog source the model can include, i.e., all .v/.sv files
+#    in the directories of the VerilogModel classes in the hierarchy and
+#    in sim/vc
+#  - the remaining arguments of verilog_to_pymtl (VCD, lint, X init)
+#  - the Verilator version
+#
+# Entries are built under an exclusive lock file per key, so concurrent
+# workers which need the same design wait for the first one instead of
+# compiling it again, and published by renaming a fully written temporary
+# directory, so a crashed build never leaves a partial entry behind.
+# Artifacts are copied into the current directory the same way.
+
+import fcntl
+import hashlib
+import inspect
+import os
+import shutil
+import subprocess
+import tempfile
+
+#-------------------------------------------------------------------------
+# Parameters
+#-------------------------------------------------------------------------
+
+cache_dir = os.environ.get( "PYMTL_MODEL_CACHE", "" )
+
+sim_dir   = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+vc_dir    = os.path.join( sim_dir, "vc" )
+
+verilog_exts = ( ".v", ".sv" )
+
+# Statistics for the current process
+
+num_hits   = 0
+num_builds = 0
+
+#-------------------------------------------------------------------------
+# tool_version
+#-------------------------------------------------------------------------
+
+_tool_version = None
+
+def tool_version():
+
+  global _tool_version
+
+  if _tool_version is None:
+    try:
+      _tool_version = subprocess.check_output( [ "verilator", "--version" ],
+                                               stderr=subprocess.STDOUT )
+    except ( OSError, subprocess.CalledProcessError ):
+      _tool_version = "unknown"
+
+  return _tool_version
+
+#-------------------------------------------------------------------------
+# source_dirs
+#-------------------------------------------------------------------------
+# Directories which hold the Verilog sources of the VerilogModels in the
+# hierarchy of the given (elaborated) model
+
+def source_dirs( model ):
+
+  from pymtl import VerilogModel
+
+  dirs  = set([ vc_dir ])
+  stack = [ model ]
+  while stack:
+    m = stack.pop()
+    if isinstance( m, VerilogModel ):
+      try:
+        dirs.add( os.path.dirname( os.path.abspath(
+                    inspect.getsourcefile( type( m ) ) ) ) )
+      except TypeError:
+        pass
+    stack.extend( m.get_submodules() )
+
+  return dirs
+
+#-------------------------------------------------------------------------
+# sources_hash
+#-------------------------------------------------------------------------
+
+def sources_hash( dirs ):
+
+  h = hashlib.sha1()
+  for dirname in sorted( dirs ):
+    if not os.path.isdir( dirname ):
+      continue
+    for filename in sorted( os.listdir( dirname ) ):
+      if filename.endswith( verilog_exts ):
+        with open( os.path.join( dirname, filename ), "rb" ) as fp:
+          h.update( filename )
+          h.update( hashlib.sha1( fp.read() ).digest() )
+
+  return h.hexdigest()
+
+#-------------------------------------------------------------------------
+# cache_key
+#-------------------------------------------------------------------------
+
+def cache_key( verilog_file, dirs, flags ):
+
+  h = hashlib.sha1()
+  with open( verilog_file, "rb" ) as fp:
+    h.update( fp.read() )
+  h.update( sources_hash( dirs ) )
+  h.update( repr( flags ) )
+  h.update( tool_version() )
+
+  return h.hexdigest()
+
+#-------------------------------------------------------------------------
+# copy_atomic
+#-------------------------------------------------------------------------
+# Copy a file by writing a temporary file next to the destination and
+# renaming it, so readers see either the old or the new file
+
+def copy_atomic( src, dest ):
+
+  fd, tmp = tempfile.mkstemp( dir=os.path.dirname( os.path.abspath( dest ) ),
+                              prefix="." + os.path.basename( dest ) )
+  os.close( fd )
+  try:
+    shutil.copy2( src, tmp )
+    os.rename( tmp, dest )
+  except:
+    os.remove( tmp )
+    raise
+
+#-------------------------------------------------------------------------
+# cached_build
+#-------------------------------------------------------------------------
+# Makes sure the given output files exist in the current directory.
+# If the cache has an entry for key we copy the files from there,
+# otherwise we call build() to create them and add them to the cache.
+# Returns True on a cache hit.
+
+def cached_build( cache_dir, key, outputs, build ):
+
+  global num_hits, num_builds
+
+  entry = os.path.join( cache_dir, key[:2], key )
+  if not os.path.isdir( os.path.dirname( entry ) ):
+    try:
+      os.makedirs( os.path.dirname( entry ) )
+    except OSError:
+      pass
+
+  with open( entry + ".lock", "a" ) as lock:
+
+    fcntl.flock( lock, fcntl.LOCK_EX )
+
+    try:
+
+      if os.path.isdir( entry ):
+        for filename in outputs:
+          copy_atomic( os.path.join( entry, os.path.basename( filename ) ),
+                       filename )
+        num_hits += 1
+        return True
+
+      build()
+      num_builds += 1
+
+      tmp = tempfile.mkdtemp( dir=os.path.dirname( entry ) )
+      try:
+        for filename in outputs:
+          shutil.copy2( filename, os.path.join( tmp, os.path.basename( filename ) ) )
+        os.rename( tmp, entry )
+      except EnvironmentError:
+        shutil.rmtree( tmp, ignore_errors=True )
+
+      return False
+
+    finally:
+      fcntl.flock( lock, fcntl.LOCK_UN )
+
+#-------------------------------------------------------------------------
+# install
+#-------------------------------------------------------------------------
+# Wrap verilog_to_pymtl in PyMTL's verilator_sim. The arguments are
+#
+#  verilog_to_pymtl( model, verilog_file, c_wrapper_file, lib_file,
+#                    py_wrapper_file, vcd_en, lint, verilator_xinit )
+
+def install( directory=None ):
+
+  global cache_dir
+
+  if directory is not None:
+    cache_dir = directory
+  if not cache_dir:
+    return False
+
+  from pymtl.tools.translation import verilator_sim
+
+  verilog_to_pymtl = verilator_sim.verilog_to_pymtl
+  if getattr( verilog_to_pymtl, 'cached', False ):
+    return True
+
+  def cached_verilog_to_pymtl( model, verilog_file, c_wrapper_file,
+                               lib_file, py_wrapper_file, *flags ):
+
+    def build():
+      verilog_to_pymtl( model, verilog_file, c_wrapper_file,
+                        lib_file, py_wrapper_file, *flags )
+
+    key = cache_key( verilog_file, source_dirs( model ), flags )
+    cached_build( cache_dir, key,
+                  [ c_wrapper_file, lib_file, py_wrapper_file ], build )
+
+  cached_verilog_to_pymtl.cached = True
+  verilator_sim.verilog_to_pymtl = cached_verilog_to_pymtl
+
+  return True
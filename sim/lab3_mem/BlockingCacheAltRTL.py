@@ -24,6 +24,12 @@ class BlockingCacheAltVRTL( VerilogModel ):
   vprefix    = "lab3_mem"
   vlinetrace = True
 
+  # The valid and dirty bits live in a register file without reset, so a
+  # test harness with this model must not be reused (see
+  # lab2_proc/test/harness_pool.py)
+
+  poolable = False
+
   def __init__( s, num_banks = 0 ):
 
     #---------------------------------------------------------------------
@@ -1,26 +1,20 @@
 #=========================================================================
 # mem_sim_eval
 #=========================================================================
-# Run the evaluations on the baseline and alternative design.
+# Run the evaluations on the baseline and alternative design. The runs
+# are spread over all cpus and memoized in sweep-cache, see
+# lab2_proc/sim_sweep.py.
 
 import os
+import sys
 
-from subprocess import check_output, CalledProcessError
+sys.path.insert( 0, os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) ) )
+
+from lab2_proc.sim_sweep import sweep
 
 impls  = [ "base", "alt" ]
 inputs = [ "loop-1d", "loop-2d", "loop-3d" ]
 
-eval_runs = []
-
-for impl in impls:
-  for input_ in inputs:
-    eval_runs.append([ impl, input_ ])
-
-# Get path to simulator script
-
-sim_dir = os.path.dirname( os.path.abspath( __file__ ) )
-sim     = sim_dir + os.path.sep + 'mem-sim'
-
 # Print header
 
 print ""
@@ -31,33 +25,19 @@ print "    " + "-" * 26
 
 # Run the simulator
 
-for eval_run in eval_runs:
-
-  # Command
+results = sweep( "mem-sim", [ ( "impl", impls ), ( "pattern", inputs ) ] )
 
-  impl   = eval_run[0]
-  input_ = eval_run[1]
-
-  cmd = [ sim, "--impl", impl, "--pattern", input_, "--stats" ]
-
-  try:
-    result = check_output( cmd ).strip()
-  except CalledProcessError as e:
+for result in results:
+  if "error" in result:
     raise Exception( "Error running simulator!\n\n"
-                     "Simulator command line: {cmd}\n\n"
-                     "Simulator output:\n {output}"
-                     .format( cmd=' '.join(e.cmd), output=e.output ) )
-
-  # Find result
+                     "{error}\n\n"
+                     "Simulator output:\n {output}".format( **result ) )
 
-  miss_rate = None
-  for line in result.splitlines():
-    if line.startswith('miss_rate'):
-      miss_rate = line.split('=')[1].strip()
+# Display results
 
-  # Display result
-
-  print "  - {:<5} {:<10} {:>9.2f}".format( impl, input_, float( miss_rate ) )
+for result in results:
+  print "  - {:<5} {:<10} {:>9.2f}".format( result["options"]["impl"],
+                                           result["options"]["pattern"],
+                                           result["stats"]["miss_rate"] )
 
 print ""
-
@@ -20,7 +20,7 @@ from pclib.ifcs import MemMsg16B, MemReqMsg16B, MemRespMsg16B
 from TestCacheSink        import TestCacheSink
 from BlockingCacheFL_test import test_case_table_generic
 from BlockingCacheFL_test import test_case_table_dir_mapped
-from BlockingCacheFL_test import TestHarness
+from BlockingCacheFL_test import TestHarness, run_test
 
 from lab3_mem.BlockingCacheBaseRTL import BlockingCacheBaseRTL
 
@@ -46,20 +46,7 @@ from lab3_mem.BlockingCacheBaseRTL import BlockingCacheBaseRTL
 
 @pytest.mark.parametrize( **test_case_table_generic )
 def test_generic( test_params, dump_vcd ):
-  msgs = test_params.msg_func( 0 )
-  if test_params.mem_data_func != None:
-    mem = test_params.mem_data_func( 0 )
-  # Instantiate testharness
-  harness = TestHarness( msgs[::2], msgs[1::2],
-                         test_params.stall, test_params.lat,
-                         test_params.src, test_params.sink,
-                         BlockingCacheBaseRTL, test_params.nbank,
-                         True, dump_vcd )
-  # Load memory before the test
-  if test_params.mem_data_func != None:
-    harness.load( mem[::2], mem[1::2] )
-  # Run the test
-  run_sim( harness )
+  run_test( test_params, BlockingCacheBaseRTL, True, dump_vcd )
 
 #-------------------------------------------------------------------------
 # Tests only for direct-mapped cache
@@ -67,20 +54,7 @@ def test_generic( test_params, dump_vcd ):
 
 @pytest.mark.parametrize( **test_case_table_dir_mapped )
 def test_dir_mapped( test_params, dump_vcd ):
-  msgs = test_params.msg_func( 0 )
-  if test_params.mem_data_func != None:
-    mem  = test_params.mem_data_func( 0 )
-  # Instantiate testharness
-  harness = TestHarness( msgs[::2], msgs[1::2],
-                         test_params.stall, test_params.lat,
-                         test_params.src, test_params.sink,
-                         BlockingCacheBaseRTL, test_params.nbank,
-                         True, dump_vcd )
-  # Load memory before the test
-  if test_params.mem_data_func != None:
-    harness.load( mem[::2], mem[1::2] )
-  # Run the test
-  run_sim( harness )
+  run_test( test_params, BlockingCacheBaseRTL, True, dump_vcd )
 
 
 #'''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
@@ -23,6 +23,9 @@ from pclib.ifcs import MemMsg16B, MemReqMsg16B, MemRespMsg16B
 from TestCacheSink   import TestCacheSink
 from lab3_mem.BlockingCacheFL import BlockingCacheFL
 
+from lab2_proc.test.harness_pool import checkout_harness, run_harness
+from lab2_proc.test.harness_pool import reset_msgs, reset_test_memory
+
 # We define all test cases here. They will be used to test _both_ FL and
 # RTL models.
 #
@@ -83,10 +86,51 @@ class TestHarness( Model ):
   def done( s ):
     return s.src.done and s.sink.done
 
+  def recycle( s ):
+    reset_msgs( s.src )
+    reset_msgs( s.sink )
+    reset_test_memory( s.mem )
+
   def line_trace( s ):
     return s.src.line_trace() + " " + s.cache.line_trace() + " " \
          + s.mem.line_trace() + " " + s.sink.line_trace()
 
+#-------------------------------------------------------------------------
+# run_test
+#-------------------------------------------------------------------------
+# Used by the RTL tests. With --harness-pool, test cases with the same
+# cache model, delays, and number of banks share one elaborated harness
+# (see lab2_proc/test/harness_pool.py), so we build the harness with
+# empty source/sink lists and fill them in afterwards.
+
+def run_test( test_params, CacheModel, check_test, dump_vcd ):
+
+  msgs = test_params.msg_func( 0 )
+
+  def make_harness():
+    return TestHarness( [], [],
+                        test_params.stall, test_params.lat,
+                        test_params.src, test_params.sink,
+                        CacheModel, test_params.nbank,
+                        check_test, dump_vcd )
+
+  key = ( CacheModel, test_params.stall, test_params.lat,
+          test_params.src, test_params.sink, test_params.nbank, check_test )
+
+  with checkout_harness( key, make_harness, dump_vcd ) as \
+       ( harness, sim ):
+
+    harness.src.src.msgs.extend( msgs[::2] )
+    harness.sink.sink.msgs.extend( msgs[1::2] )
+
+    # Load memory before the test
+
+    if test_params.mem_data_func != None:
+      mem = test_params.mem_data_func( 0 )
+      harness.load( mem[::2], mem[1::2] )
+
+    run_harness( harness, sim )
+
 #-------------------------------------------------------------------------
 # make messages
 #-------------------------------------------------------------------------
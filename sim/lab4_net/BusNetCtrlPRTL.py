@@ -15,12 +15,7 @@ class BusNetCtrlPRTL( Model ):
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( s ):
-
-    # Parameters
-    # Your design does not need to support other values
-
-    num_ports = 4
+  def __init__( s, num_ports = 4 ):
 
     # Interface
 
@@ -16,12 +16,10 @@ class BusNetDpathPRTL( Model ):
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( s, payload_nbits ):
+  def __init__( s, payload_nbits, num_ports = 4 ):
 
     # Parameters
-    # Your design does not need to support other values
 
-    num_ports    = 4
     opaque_nbits = 8
 
     # Interface
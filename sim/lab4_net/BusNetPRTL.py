@@ -16,12 +16,10 @@ class BusNetPRTL( Model ):
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( s, payload_nbits = 32 ):
+  def __init__( s, payload_nbits = 32, num_ports = 4 ):
 
     # Parameters
-    # Your design does not need to support other values
 
-    num_ports    = 4
     opaque_nbits = 8
 
     # Interface
@@ -33,8 +31,8 @@ class BusNetPRTL( Model ):
 
     # Components
 
-    s.dpath = BusNetDpathPRTL( payload_nbits )
-    s.ctrl  = BusNetCtrlPRTL ()
+    s.dpath = BusNetDpathPRTL( payload_nbits, num_ports )
+    s.ctrl  = BusNetCtrlPRTL ( num_ports )
 
     s.connect_auto( s.ctrl, s.dpath )
 
@@ -14,11 +14,10 @@ class NetFL( Model ):
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( s, payload_nbits = 32 ):
+  def __init__( s, payload_nbits = 32, num_ports = 4 ):
 
     # Parameters
 
-    num_ports = 4
     opaque_nbits = 8
 
     # Interface
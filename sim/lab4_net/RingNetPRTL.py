@@ -1,6 +1,7 @@
 #=========================================================================
 # RingNetPRTL.py
 #=========================================================================
+# This model implements a ring of num_ports 3-port routers
 
 from pymtl        import *
 from pclib.ifcs   import InValRdyBundle, OutValRdyBundle, ValRdyBundle
@@ -11,15 +12,11 @@ from RouterPRTL import RouterPRTL
 
 class RingNetPRTL( Model ):
 
-  def __init__( s, payload_nbits = 32 ):
+  def __init__( s, payload_nbits = 32, num_ports = 4 ):
 
     # Parameters
-    # Your design does not need to support other values
 
-    num_ports    = 4
-    opaque_nbits = 8 
-
-    srcdest_nbits = clog2( num_ports )
+    opaque_nbits = 8
 
     msg_type = NetMsg(num_ports, 2**opaque_nbits, payload_nbits)
 
@@ -28,9 +25,59 @@ class RingNetPRTL( Model ):
     s.in_ = InValRdyBundle [num_ports]( msg_type )
     s.out = OutValRdyBundle[num_ports]( msg_type )
 
-    # ''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
-    # LAB TASK: Compose ring network
-    # ''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    # Components
+
+    s.routers = [ RouterPRTL( payload_nbits, num_ports ) for x in xrange(num_ports) ]
+
+    # Channel queues between neighboring routers: s.next_queues[i] goes
+    # from router i to router i+1 (out2 -> in0), s.prev_queues[i] from
+    # router i+1 back to router i (out0 -> in2)
+
+    s.next_queues = [ NormalQueue( 2, msg_type ) for x in xrange(num_ports) ]
+    s.prev_queues = [ NormalQueue( 2, msg_type ) for x in xrange(num_ports) ]
+
+    # Connections
+
+    for i in xrange( num_ports ):
+
+      nxt = ( i + 1 ) % num_ports
+
+      s.connect( s.routers[i].router_id, i )
+
+      s.connect( s.in_[i], s.routers[i].in1  )
+      s.connect( s.out[i], s.routers[i].out1 )
+
+      s.connect( s.routers[i].out2,     s.next_queues[i].enq )
+      s.connect( s.next_queues[i].deq,  s.routers[nxt].in0   )
+
+      s.connect( s.routers[nxt].out0,   s.prev_queues[i].enq )
+      s.connect( s.prev_queues[i].deq,  s.routers[i].in2     )
+
+    # Bubble flow control: tell each router when the channel queue behind
+    # out2 (s.next_queues[i]) or out0 (s.prev_queues[i-1]) has less than
+    # two free entries
+
+    s.next_nfree       = [ Wire( 2 ) for x in xrange(num_ports) ]
+    s.prev_nfree       = [ Wire( 2 ) for x in xrange(num_ports) ]
+    s.next_nearly_full = [ Wire( 1 ) for x in xrange(num_ports) ]
+    s.prev_nearly_full = [ Wire( 1 ) for x in xrange(num_ports) ]
+
+    for i in xrange( num_ports ):
+
+      prv = ( i - 1 ) % num_ports
+
+      s.connect_pairs(
+        s.next_queues[i].num_free_entries,   s.next_nfree[i],
+        s.prev_queues[prv].num_free_entries, s.prev_nfree[i],
+        s.next_nearly_full[i], s.routers[i].out2_nearly_full,
+        s.prev_nearly_full[i], s.routers[i].out0_nearly_full,
+      )
+
+    @s.combinational
+    def bubble_comb():
+      for i in range( num_ports ):
+        s.next_nearly_full[i].value = s.next_nfree[i] < 2
+        s.prev_nearly_full[i].value = s.prev_nfree[i] < 2
 
   def line_trace( s ):
 
@@ -13,12 +13,12 @@ class RouterCtrlPRTL( Model ):
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( s ):
+  def __init__( s, nrouters = 4 ):
 
     # Parameters
-    # Your design does not need to support other values
 
-    nrouters = 4 
+    srcdest_nbits = clog2( nrouters )
+    dist_nbits    = clog2( nrouters ) + 1
 
     #---------------------------------------------------------------------
     # Interface
@@ -35,6 +35,141 @@ class RouterCtrlPRTL( Model ):
     s.out2_val  = OutPort( 1 )
     s.out2_rdy  = InPort ( 1 )
 
-    # ''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
-    # LAB TASK: Router control logic and other inports/outports
-    # ''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    # Set when the channel behind out0/out2 has less than two free
+    # entries (see arbitration below)
+
+    s.out0_nearly_full = InPort( 1 )
+    s.out2_nearly_full = InPort( 1 )
+
+    # Status signals (dpath -> ctrl): the head of each input queue
+
+    s.in0_deq_val = InPort( 1 )
+    s.in1_deq_val = InPort( 1 )
+    s.in2_deq_val = InPort( 1 )
+
+    s.in0_dest    = InPort( srcdest_nbits )
+    s.in1_dest    = InPort( srcdest_nbits )
+    s.in2_dest    = InPort( srcdest_nbits )
+
+    # Control signals (ctrl -> dpath)
+
+    s.in0_deq_rdy = OutPort( 1 )
+    s.in1_deq_rdy = OutPort( 1 )
+    s.in2_deq_rdy = OutPort( 1 )
+
+    s.xbar_sel0   = OutPort( 2 )
+    s.xbar_sel1   = OutPort( 2 )
+    s.xbar_sel2   = OutPort( 2 )
+
+    s.deq_rdys  = [ s.in0_deq_rdy, s.in1_deq_rdy, s.in2_deq_rdy ]
+    s.dests     = [ s.in0_dest,    s.in1_dest,    s.in2_dest    ]
+    s.out_vals  = [ s.out0_val,    s.out1_val,    s.out2_val    ]
+    s.out_rdys  = [ s.out0_rdy,    s.out1_rdy,    s.out2_rdy    ]
+    s.xbar_sels = [ s.xbar_sel0,   s.xbar_sel1,   s.xbar_sel2   ]
+
+    #---------------------------------------------------------------------
+    # Route computation
+    #---------------------------------------------------------------------
+    # Greedy routing for a ring of any size. A message at router i for
+    # dest is dist = ( dest - i ) mod nrouters hops away going forward
+    # (out2, towards router i+1) and nrouters - dist hops going backward
+    # (out0, towards router i-1). We take the shorter way; a tie (only
+    # possible with an even number of routers) always goes forward. The
+    # distance is computed with one extra bit so that the modulo also
+    # works when nrouters is not a power of two.
+
+    s.ROUTE_PREV = 0
+    s.ROUTE_TERM = 1
+    s.ROUTE_NEXT = 2
+
+    s.in0_route = Wire( 2 )
+    s.in1_route = Wire( 2 )
+    s.in2_route = Wire( 2 )
+
+    s.in0_dist  = Wire( dist_nbits )
+    s.in1_dist  = Wire( dist_nbits )
+    s.in2_dist  = Wire( dist_nbits )
+
+    s.dists  = [ s.in0_dist,  s.in1_dist,  s.in2_dist  ]
+    s.routes = [ s.in0_route, s.in1_route, s.in2_route ]
+
+    half = nrouters / 2
+
+    @s.combinational
+    def route_comb():
+
+      for i in range( 3 ):
+
+        if s.dests[i] >= s.router_id:
+          s.dists[i].value = zext( s.dests[i], dist_nbits ) \
+                           - zext( s.router_id, dist_nbits )
+        else:
+          s.dists[i].value = zext( s.dests[i], dist_nbits ) + nrouters \
+                           - zext( s.router_id, dist_nbits )
+
+        if   s.dists[i] == 0:    s.routes[i].value = s.ROUTE_TERM
+        elif s.dists[i] <= half: s.routes[i].value = s.ROUTE_NEXT
+        else:                    s.routes[i].value = s.ROUTE_PREV
+
+    #---------------------------------------------------------------------
+    # Arbitration
+    #---------------------------------------------------------------------
+    # One round-robin arbiter per output port. Input k requests output j
+    # if its queue is not empty and its message is routed to j. The
+    # arbiter only updates its priority when the output accepts the
+    # message.
+    #
+    # Greedy routing alone can deadlock once every queue around the ring
+    # fills up in one direction. We use bubble flow control to avoid
+    # this: a message from the terminal (in1) may only enter the ring if
+    # the channel it goes to has at least two free entries, so there is
+    # always a free entry left for the messages already in the ring.
+
+    s.arbs   = [ RoundRobinArbiterEn( 3 ) for x in xrange(3) ]
+    s.reqs   = [ Wire( 3 ) for x in xrange(3) ]
+    s.grants = [ Wire( 3 ) for x in xrange(3) ]
+
+    s.in1_blocked = Wire( 3 )
+
+    s.connect( s.in1_blocked[0], s.out0_nearly_full )
+    s.connect( s.in1_blocked[1], 0                  )
+    s.connect( s.in1_blocked[2], s.out2_nearly_full )
+
+    for j in xrange( 3 ):
+      s.connect_pairs(
+        s.arbs[j].en,     s.out_rdys[j],
+        s.arbs[j].reqs,   s.reqs[j],
+        s.arbs[j].grants, s.grants[j],
+      )
+
+    @s.combinational
+    def arb_reqs():
+
+      for j in range( 3 ):
+        s.reqs[j].value = concat( s.in2_deq_val & ( s.in2_route == j ),
+                                  s.in1_deq_val & ( s.in1_route == j )
+                                                & ~s.in1_blocked[j],
+                                  s.in0_deq_val & ( s.in0_route == j ) )
+
+    #---------------------------------------------------------------------
+    # Output and dequeue logic
+    #---------------------------------------------------------------------
+    # An output is valid if its arbiter granted an input, and the crossbar
+    # selects the granted input. An input queue is dequeued when its
+    # message was granted and the output is ready.
+
+    @s.combinational
+    def out_logic():
+
+      for j in range( 3 ):
+
+        s.out_vals[j].value = s.grants[j] != 0
+
+        if   s.grants[j][0]: s.xbar_sels[j].value = 0
+        elif s.grants[j][1]: s.xbar_sels[j].value = 1
+        else:                s.xbar_sels[j].value = 2
+
+      for k in range( 3 ):
+        s.deq_rdys[k].value = ( s.grants[0][k] & s.out0_rdy ) \
+                            | ( s.grants[1][k] & s.out1_rdy ) \
+                            | ( s.grants[2][k] & s.out2_rdy )
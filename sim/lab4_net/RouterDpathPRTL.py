@@ -13,12 +13,10 @@ class RouterDpathPRTL( Model ):
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( s, payload_nbits = 32 ):
+  def __init__( s, payload_nbits = 32, nrouters = 4 ):
 
     # Parameters
-    # Your design does not need to support other values
 
-    nrouters     = 4
     opaque_nbits = 8
 
     #---------------------------------------------------------------------
@@ -35,14 +33,68 @@ class RouterDpathPRTL( Model ):
     s.out1_msg  = OutPort( msg_type )
     s.out2_msg  = OutPort( msg_type )
 
-    # ''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
-    # LAB TASK: Other interfaces between dpath and ctrl 
-    # ''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    # Status signals (dpath -> ctrl)
+
+    s.in0_deq_val = OutPort( 1 )
+    s.in1_deq_val = OutPort( 1 )
+    s.in2_deq_val = OutPort( 1 )
+
+    s.in0_dest    = OutPort( clog2(nrouters) )
+    s.in1_dest    = OutPort( clog2(nrouters) )
+    s.in2_dest    = OutPort( clog2(nrouters) )
+
+    # Control signals (ctrl -> dpath)
+
+    s.in0_deq_rdy = InPort( 1 )
+    s.in1_deq_rdy = InPort( 1 )
+    s.in2_deq_rdy = InPort( 1 )
+
+    s.xbar_sel0   = InPort( 2 )
+    s.xbar_sel1   = InPort( 2 )
+    s.xbar_sel2   = InPort( 2 )
 
     #---------------------------------------------------------------------
     # Components
     #---------------------------------------------------------------------
 
-    # ''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
-    # LAB TASK: Dpath components
-    # ''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''''
+    # Input queues
+
+    s.in0_queue = NormalQueue( 2, msg_type )
+    s.in1_queue = NormalQueue( 2, msg_type )
+    s.in2_queue = NormalQueue( 2, msg_type )
+
+    s.connect_pairs(
+      s.in0, s.in0_queue.enq,
+      s.in1, s.in1_queue.enq,
+      s.in2, s.in2_queue.enq,
+
+      s.in0_queue.deq.val,      s.in0_deq_val,
+      s.in0_queue.deq.rdy,      s.in0_deq_rdy,
+      s.in0_queue.deq.msg.dest, s.in0_dest,
+
+      s.in1_queue.deq.val,      s.in1_deq_val,
+      s.in1_queue.deq.rdy,      s.in1_deq_rdy,
+      s.in1_queue.deq.msg.dest, s.in1_dest,
+
+      s.in2_queue.deq.val,      s.in2_deq_val,
+      s.in2_queue.deq.rdy,      s.in2_deq_rdy,
+      s.in2_queue.deq.msg.dest, s.in2_dest,
+    )
+
+    # Crossbar
+
+    s.xbar = Crossbar( 3, msg_type )
+
+    s.connect_pairs(
+      s.in0_queue.deq.msg, s.xbar.in_[0],
+      s.in1_queue.deq.msg, s.xbar.in_[1],
+      s.in2_queue.deq.msg, s.xbar.in_[2],
+
+      s.xbar_sel0,         s.xbar.sel[0],
+      s.xbar_sel1,         s.xbar.sel[1],
+      s.xbar_sel2,         s.xbar.sel[2],
+
+      s.xbar.out[0],       s.out0_msg,
+      s.xbar.out[1],       s.out1_msg,
+      s.xbar.out[2],       s.out2_msg,
+    )
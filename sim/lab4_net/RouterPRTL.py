@@ -19,13 +19,11 @@ class RouterPRTL( Model ):
   # Constructor
   #-----------------------------------------------------------------------
 
-  def __init__( s, payload_nbits = 32 ):
+  def __init__( s, payload_nbits = 32, nrouters = 4 ):
 
     # Parameters
-    # Your design does not need to support other values
 
-    nrouters     = 4
-    opaque_nbits = 8 
+    opaque_nbits = 8
 
     srcdest_nbits = clog2( nrouters )
 
@@ -43,13 +41,22 @@ class RouterPRTL( Model ):
     s.out1 = OutValRdyBundle( msg_type )
     s.out2 = OutValRdyBundle( msg_type )
 
+    # Bubble flow control: the channel behind out0/out2 has less than two
+    # free entries. Left at zero outside of a ring.
+
+    s.out0_nearly_full = InPort( 1 )
+    s.out2_nearly_full = InPort( 1 )
+
     # Components
 
-    s.dpath = RouterDpathPRTL( payload_nbits )
-    s.ctrl  = RouterCtrlPRTL ()
+    s.dpath = RouterDpathPRTL( payload_nbits, nrouters )
+    s.ctrl  = RouterCtrlPRTL ( nrouters )
 
     s.connect( s.ctrl.router_id, s.router_id )
 
+    s.connect( s.ctrl.out0_nearly_full, s.out0_nearly_full )
+    s.connect( s.ctrl.out2_nearly_full, s.out2_nearly_full )
+
     s.connect_auto( s.dpath, s.ctrl )
 
     s.connect_pairs(
@@ -0,0 +1,215 @@
+#=========================================================================
+# net_runlength
+#=========================================================================
+# Decides how long net-sim has to simulate instead of using a fixed
+# warmup and measurement window. The latencies of delivered packets are
+# collected in batches of batch_cycles cycles (by delivery time), and
+# every check_cycles cycles we look at the series of batch means:
+#
+#  - Warmup: MSER (marginal standard error rule) picks the truncation
+#    point d which minimizes the standard error of the mean of the
+#    remaining batches, sum( ( y_i - mean )**2 ) / ( n - d )**2. While the
+#    network is still filling up, the best truncation point lies near the
+#    end of the series. Once d falls into the first half, the network has
+#    reached steady state and we start measuring.
+#
+#  - Run length: the measured batches are grouped into nbatches
+#    consecutive batches, whose means are close to independent, and the
+#    half-width of the 95% confidence interval of the average latency is
+#    t * stddev / sqrt( nbatches ). We stop as soon as the half-width
+#    relative to the mean drops below the requested precision, or when
+#    we hit max_cycles, and report the precision we actually achieved.
+#
+# Beyond saturation the latency never settles. If MSER has not found a
+# steady state by half of max_cycles we measure the second half anyway
+# and flag the run as not steady; such runs end at the cycle cap with a
+# large reported half-width.
+
+import math
+
+#-------------------------------------------------------------------------
+# Parameters
+#-------------------------------------------------------------------------
+
+# Two-sided 95% quantiles of the t distribution by degrees of freedom
+
+t_95 = [ None, 12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306,
+         2.262, 2.228, 2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110,
+         2.101, 2.093, 2.086, 2.080, 2.074, 2.069, 2.064, 2.060, 2.056,
+         2.052, 2.048, 2.045, 2.042 ]
+
+def t_quantile( df ):
+  return t_95[ df ] if df < len( t_95 ) else 1.96
+
+#-------------------------------------------------------------------------
+# mser
+#-------------------------------------------------------------------------
+# Returns the truncation point d for the series of batch means. The last
+# quarter of the series is never a candidate, since the standard error of
+# a handful of batches is too noisy to compare.
+
+def mser( means ):
+
+  n = len( means )
+  best_d, best_value = 0, None
+
+  # Walk backwards keeping running sums of the tail
+
+  tail_sum = 0.0
+  tail_sq  = 0.0
+  for d in xrange( n-1, -1, -1 ):
+    tail_sum += means[d]
+    tail_sq  += means[d] * means[d]
+    m = n - d
+    if m < max( n / 4, 2 ):
+      continue
+    sse   = max( tail_sq - tail_sum * tail_sum / m, 0.0 )
+    value = sse / ( m * m )
+    if best_value is None or value <= best_value:
+      best_d, best_value = d, value
+
+  return best_d
+
+#-------------------------------------------------------------------------
+# batch_means
+#-------------------------------------------------------------------------
+# Groups the ( sum, count ) batches into nbatches consecutive groups and
+# returns ( mean, half-width of the 95% confidence interval ).
+
+def batch_means( sums, counts, nbatches ):
+
+  total = sum( counts )
+  if not total:
+    return 0.0, float( "inf" )
+
+  mean = sum( sums ) / float( total )
+
+  size  = len( sums ) / nbatches
+  start = len( sums ) - size * nbatches
+  group_means = []
+  for k in xrange( nbatches ):
+    lo, hi = start + k*size, start + (k+1)*size
+    count  = sum( counts[ lo:hi ] )
+    if not count:
+      return mean, float( "inf" )
+    group_means.append( sum( sums[ lo:hi ] ) / float( count ) )
+
+  gmean = sum( group_means ) / nbatches
+  var   = sum( ( g - gmean )**2 for g in group_means ) / ( nbatches - 1 )
+
+  return mean, t_quantile( nbatches-1 ) * math.sqrt( var / nbatches )
+
+#=========================================================================
+# RunLength
+#=========================================================================
+
+class RunLength (object):
+
+  def __init__( s, precision, max_cycles, batch_cycles=100,
+                check_cycles=1000, nbatches=20 ):
+
+    s.precision     = precision
+    s.max_cycles    = max_cycles
+    s.batch_cycles  = batch_cycles
+    s.check_cycles  = check_cycles
+    s.nbatches      = nbatches
+
+    s.ncycles       = 0
+    s.warm          = False
+    s.steady        = False
+    s.done          = False
+    s.warmup_cycles = None
+
+    # Batches of the warmup phase (means only) and of the measurement
+    # phase ( sum, count )
+
+    s.warmup_means = []
+    s.sums         = []
+    s.counts       = []
+    s.batch_sum    = 0
+    s.batch_count  = 0
+
+    s.mean      = 0.0
+    s.halfwidth = float( "inf" )
+
+  #-----------------------------------------------------------------------
+  # add
+  #-----------------------------------------------------------------------
+  # Latency of a packet delivered in the current cycle
+
+  def add( s, latency ):
+    s.batch_sum   += latency
+    s.batch_count += 1
+
+  #-----------------------------------------------------------------------
+  # tick
+  #-----------------------------------------------------------------------
+  # Call at the end of every cycle
+
+  def tick( s ):
+
+    s.ncycles += 1
+
+    if s.ncycles % s.batch_cycles == 0:
+
+      if s.warm:
+        s.sums.append( s.batch_sum )
+        s.counts.append( s.batch_count )
+      elif s.batch_count:
+        s.warmup_means.append( s.batch_sum / float( s.batch_count ) )
+
+      s.batch_sum   = 0
+      s.batch_count = 0
+
+    if s.ncycles % s.check_cycles == 0:
+      s.check()
+
+    if s.ncycles >= s.max_cycles and not s.done:
+      s.done = True
+      if len( s.sums ) >= 2:
+        s.mean, s.halfwidth = batch_means( s.sums, s.counts,
+                                           min( len( s.sums ), s.nbatches ) )
+
+  #-----------------------------------------------------------------------
+  # check
+  #-----------------------------------------------------------------------
+
+  def check( s ):
+
+    if not s.warm:
+      n = len( s.warmup_means )
+      if n >= s.check_cycles / s.batch_cycles and 2 * mser( s.warmup_means ) < n:
+        s.warm          = True
+        s.steady        = True
+        s.warmup_cycles = s.ncycles
+      elif 2 * s.ncycles >= s.max_cycles:
+        s.warm          = True
+        s.warmup_cycles = s.ncycles
+
+    elif len( s.sums ) >= s.nbatches:
+      s.mean, s.halfwidth = batch_means( s.sums, s.counts, s.nbatches )
+      if s.steady and s.relative_precision() <= s.precision:
+        s.done = True
+
+  #-----------------------------------------------------------------------
+  # relative_precision/to_dict
+  #-----------------------------------------------------------------------
+
+  def relative_precision( s ):
+    return s.halfwidth / s.mean if s.mean else float( "inf" )
+
+  def to_dict( s ):
+
+    def finite( x ):
+      return x if x != float( "inf" ) else None
+
+    return {
+      "warmup_cycles"      : s.warmup_cycles,
+      "measured_cycles"    : s.ncycles - ( s.warmup_cycles or s.ncycles ),
+      "steady"             : s.steady,
+      "latency_mean"       : s.mean,
+      "latency_halfwidth"  : finite( s.halfwidth ),
+      "relative_precision" : finite( s.relative_precision() ),
+      "target_precision"   : s.precision,
+      "converged"          : s.steady and s.relative_precision() <= s.precision,
+    }
@@ -0,0 +1,197 @@
+#=========================================================================
+# net_stats
+#=========================================================================
+# Streaming statistics for net-sim which use constant memory no matter
+# how many packets we simulate:
+#
+#  - a latency histogram for the mean, percentiles (p50/p90/p99), and
+#    maximum latency
+#  - per-source/per-destination latency matrices (sum and count)
+#  - offered throughput (packets generated) vs accepted throughput
+#    (packets delivered), both in packets/cycle/terminal
+#  - the occupancy of each source queue, sampled every cycle
+#  - per terminal, the packets dropped and the injections stalled because
+#    the source queue was full (or the terminal was waiting for replies)
+#
+# The histogram counts latencies below 64 exactly and larger ones in 32
+# log-linear buckets per power of two (like HdrHistogram), so percentiles
+# are within about 3% of the exact value while the number of buckets only
+# grows with the log of the maximum latency.
+
+import json
+
+#=========================================================================
+# LatencyHistogram
+#=========================================================================
+
+class LatencyHistogram (object):
+
+  sub_bits = 6
+
+  def __init__( s ):
+    s.buckets = {}
+    s.count   = 0
+    s.total   = 0
+    s.min     = None
+    s.max     = None
+
+  #-----------------------------------------------------------------------
+  # bucket index and range
+  #-----------------------------------------------------------------------
+  # Values below 2**sub_bits map to themselves. A larger value keeps its
+  # top sub_bits bits: index = half*shift + ( value >> shift ), with half =
+  # 2**(sub_bits-1), so consecutive powers of two get consecutive runs of
+  # half buckets.
+
+  def index( s, value ):
+    shift = max( value.bit_length() - s.sub_bits, 0 )
+    return ( 1 << (s.sub_bits-1) ) * shift + ( value >> shift )
+
+  def bucket_range( s, idx ):
+    half = 1 << (s.sub_bits-1)
+    shift = max( idx / half - 1, 0 )
+    top   = idx - half * shift
+    return top << shift, ( ( top + 1 ) << shift ) - 1
+
+  #-----------------------------------------------------------------------
+  # add
+  #-----------------------------------------------------------------------
+
+  def add( s, value ):
+
+    idx = s.index( value )
+    s.buckets[ idx ] = s.buckets.get( idx, 0 ) + 1
+
+    s.count += 1
+    s.total += value
+    if s.min is None or value < s.min: s.min = value
+    if s.max is None or value > s.max: s.max = value
+
+  #-----------------------------------------------------------------------
+  # mean/percentile
+  #-----------------------------------------------------------------------
+
+  def mean( s ):
+    return s.total / float( s.count ) if s.count else 0.0
+
+  def percentile( s, p ):
+    """Smallest latency (rounded up to its bucket) such that p percent of
+    the packets had at most that latency."""
+
+    if not s.count:
+      return 0
+
+    rank = max( int( -( -p * s.count // 100 ) ), 1 )
+    seen = 0
+    for idx in sorted( s.buckets ):
+      seen += s.buckets[ idx ]
+      if seen >= rank:
+        return min( max( s.bucket_range( idx )[1], s.min ), s.max )
+
+  #-----------------------------------------------------------------------
+  # to_dict
+  #-----------------------------------------------------------------------
+
+  def to_dict( s ):
+    return {
+      "count" : s.count,
+      "mean"  : s.mean(),
+      "min"   : s.min or 0,
+      "p50"   : s.percentile( 50 ),
+      "p90"   : s.percentile( 90 ),
+      "p99"   : s.percentile( 99 ),
+      "max"   : s.max or 0,
+      "histogram" : [ [ lo, hi, s.buckets[ idx ] ] for idx in sorted( s.buckets )
+                      for lo, hi in [ s.bucket_range( idx ) ] ],
+    }
+
+#=========================================================================
+# NetStats
+#=========================================================================
+
+class NetStats (object):
+
+  def __init__( s, nports ):
+
+    s.nports    = nports
+    s.latency   = LatencyHistogram()
+    s.lat_sum   = [ [ 0 ]*nports for x in xrange(nports) ]
+    s.lat_count = [ [ 0 ]*nports for x in xrange(nports) ]
+
+    # Counted over the measurement window only
+
+    s.ncycles   = 0
+    s.offered   = 0
+    s.accepted  = 0
+    s.queue_sum = [ 0 ]*nports
+    s.queue_max = [ 0 ]*nports
+    s.drops     = [ 0 ]*nports
+    s.stalls    = [ 0 ]*nports
+
+  #-----------------------------------------------------------------------
+  # Recording
+  #-----------------------------------------------------------------------
+
+  def inject( s, src ):
+    s.offered += 1
+
+  def accept( s, dest ):
+    s.accepted += 1
+
+  def drop( s, src ):
+    s.drops[ src ] += 1
+
+  def stall( s, src ):
+    s.stalls[ src ] += 1
+
+  def receive( s, src, dest, latency ):
+    s.latency.add( latency )
+    s.lat_sum  [ src ][ dest ] += latency
+    s.lat_count[ src ][ dest ] += 1
+
+  def sample_queues( s, lengths ):
+    s.ncycles += 1
+    for i, n in enumerate( lengths ):
+      s.queue_sum[i] += n
+      if n > s.queue_max[i]:
+        s.queue_max[i] = n
+
+  #-----------------------------------------------------------------------
+  # Throughput
+  #-----------------------------------------------------------------------
+
+  def offered_throughput( s ):
+    return s.offered / float( s.ncycles * s.nports ) if s.ncycles else 0.0
+
+  def accepted_throughput( s ):
+    return s.accepted / float( s.ncycles * s.nports ) if s.ncycles else 0.0
+
+  #-----------------------------------------------------------------------
+  # to_dict/write_json
+  #-----------------------------------------------------------------------
+
+  def to_dict( s ):
+
+    avg = [ [ s.lat_sum[i][j] / float( s.lat_count[i][j] ) if s.lat_count[i][j] else None
+              for j in xrange( s.nports ) ] for i in xrange( s.nports ) ]
+
+    return {
+      "latency"             : s.latency.to_dict(),
+      "latency_matrix"      : avg,
+      "count_matrix"        : s.lat_count,
+      "measured_cycles"     : s.ncycles,
+      "offered_throughput"  : s.offered_throughput(),
+      "accepted_throughput" : s.accepted_throughput(),
+      "queue_occupancy"     : {
+        "mean" : [ n / float( s.ncycles ) if s.ncycles else 0.0 for n in s.queue_sum ],
+        "max"  : s.queue_max,
+      },
+      "drops"               : s.drops,
+      "stalls"              : s.stalls,
+    }
+
+  def write_json( s, fp, **kwargs ):
+    data = s.to_dict()
+    data.update( kwargs )
+    json.dump( data, fp, indent=2, sort_keys=True )
+    fp.write( "\n" )
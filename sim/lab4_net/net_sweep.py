@@ -0,0 +1,116 @@
+#=========================================================================
+# net_sweep
+#=========================================================================
+# Search for the saturation point of a network. The latency-throughput
+# curve of a network is flat near the zero-load latency and then grows
+# without bound as the injection rate approaches the saturation
+# throughput. We define the saturation rate as the highest injection rate
+# (in percent) whose average latency stays at or below a threshold.
+#
+# Instead of walking the injection rate upwards one simulation at a time,
+# each round evaluates a batch of candidate rates (in parallel, if the
+# evaluate function uses a process pool) inside the current bracket
+# [ below, above ], where below is the highest rate known to be under the
+# threshold and above the lowest rate known to be over it. The candidates
+# are a secant estimate plus evenly spaced points, so the bracket shrinks
+# by about a factor of npoints per round. For a queueing network 1/latency
+# falls roughly linearly with the injection rate, so we interpolate the
+# secant on 1/latency, which usually lands right next to the crossing.
+
+from __future__ import print_function
+
+#-------------------------------------------------------------------------
+# candidates
+#-------------------------------------------------------------------------
+# Integer injection rates strictly inside ( below, above ) to evaluate in
+# the next round
+
+def candidates( below, lat_below, above, lat_above, threshold, npoints ):
+
+  inside = range( below+1, above )
+  if len( inside ) <= npoints:
+    return inside
+
+  # Secant on 1/latency between the two ends of the bracket
+
+  inv_below = 1.0 / lat_below if lat_below > 0 else 1.0
+  inv_above = 1.0 / lat_above
+  inv_thres = 1.0 / threshold
+
+  if inv_below > inv_above:
+    frac = ( inv_below - inv_thres ) / ( inv_below - inv_above )
+  else:
+    frac = 0.5
+
+  estimate = below + int( round( frac * ( above - below ) ) )
+  rates    = set([ min( max( estimate, below+1 ), above-1 ) ])
+
+  # Evenly spaced points fill up the rest of the batch
+
+  step = ( above - below ) / float( npoints )
+  k    = 1
+  while len( rates ) < npoints and k < npoints:
+    rates.add( below + int( round( k * step ) ) )
+    k += 1
+
+  rates.discard( below )
+  rates.discard( above )
+
+  return sorted( rates )
+
+#-------------------------------------------------------------------------
+# saturation_search
+#-------------------------------------------------------------------------
+# evaluate( rates ) returns the average latency for each injection rate
+# in the list. Returns ( curve, zero_load_latency, below, above ) where
+# curve is the sorted list of ( rate, latency ) points which were
+# simulated and the saturation rate lies in [ below, above ) with
+# above - below <= tol. below is None if the network is already
+# saturated at min_rate, and above is None if it never saturates up to
+# max_rate.
+
+def saturation_search( evaluate, threshold=100, tol=1, npoints=4,
+                       min_rate=1, max_rate=100, verbose=False ):
+
+  tol     = max( tol, 1 )
+  npoints = max( npoints, 1 )
+  latency = {}
+
+  def run( rates ):
+    rates = sorted( set( rates ) - set( latency ) )
+    for rate, lat in zip( rates, evaluate( rates ) ):
+      latency[ rate ] = lat
+      if verbose:
+        print( " rate {:3} : latency {:.1f}".format( rate, lat ) )
+
+  # The first round brackets the whole range
+
+  step = ( max_rate - min_rate ) / float( max( npoints-1, 1 ) )
+  run( [ min_rate, max_rate ] +
+       [ min_rate + int( round( k * step ) ) for k in xrange( 1, npoints-1 ) ] )
+
+  zero_load_latency = latency[ min_rate ]
+
+  while True:
+
+    over = [ r for r in latency if latency[r] > threshold ]
+    if not over:
+      below, above = max_rate, None
+      break
+
+    above = min( over )
+    under = [ r for r in latency if r < above ]
+    if not under:
+      below = None
+      break
+
+    below = max( under )
+    if above - below <= tol:
+      break
+
+    run( candidates( below, latency[ below ], above, latency[ above ],
+                     threshold, npoints ) )
+
+  curve = sorted( latency.items() )
+
+  return curve, zero_load_latency, below, above
@@ -0,0 +1,164 @@
+#=========================================================================
+# net_traffic
+#=========================================================================
+# Pre-generated injection schedules for net-sim. Every cycle each
+# terminal injects a packet with probability injection_rate/100 and picks
+# the destination according to the traffic pattern:
+#
+#  urandom     dest = r
+#  partition2  dest = (r & (nports/2-1)) | (src & (nports/2))
+#  opposite    dest = (src + nports/2) % nports
+#  neighbor    dest = (src + 1) % nports
+#  complement  dest = src ^ (nports-1)
+#
+# where r is a uniformly random port. partition2 and complement need a
+# power-of-two number of ports. Instead of drawing random numbers
+# for each terminal inside the simulation loop, the schedule draws a
+# block of cycles at a time: one uniform sample per terminal and cycle
+# decides the injection, and a second one gives r. The result is kept as
+# three compact arrays (cycle, src, dest) of the injected packets only;
+# net-sim looks up the packets of each cycle and only builds a NetMsg
+# once a packet reaches the head of its source queue.
+#
+# With NumPy each block is generated with a few vectorized operations.
+# Without NumPy we draw the same samples one at a time. Both use the
+# Mersenne Twister seeded with the same key (NumPy's RandomState seeded
+# with an array uses the same initialization as Python's random.seed), so
+# the schedule only depends on the seed and the block size, not on
+# whether NumPy is installed.
+
+import bisect
+import random
+
+try:
+  import numpy as np
+except ImportError:
+  np = None
+
+#-------------------------------------------------------------------------
+# Parameters
+#-------------------------------------------------------------------------
+
+patterns = [ "urandom", "partition2", "opposite", "neighbor", "complement" ]
+
+#-------------------------------------------------------------------------
+# dest_of
+#-------------------------------------------------------------------------
+# Works on both ints and NumPy arrays
+
+def dest_of( pattern, nports, src, r ):
+
+  if   pattern == "urandom":
+    return r
+  elif pattern == "partition2":
+    return ( r & (nports/2-1) ) | ( src & (nports/2) )
+  elif pattern == "opposite":
+    return ( src + nports/2 ) % nports
+  elif pattern == "neighbor":
+    return ( src + 1 ) % nports
+  elif pattern == "complement":
+    return src ^ (nports-1)
+
+  raise ValueError( "unknown traffic pattern: {}".format( pattern ) )
+
+#=========================================================================
+# TrafficSchedule
+#=========================================================================
+
+class TrafficSchedule (object):
+
+  def __init__( s, nports, injection_rate, pattern, seed=0xdeadbeef,
+                block=1024, use_numpy=True ):
+
+    if pattern not in patterns:
+      raise ValueError( "unknown traffic pattern: {}".format( pattern ) )
+
+    if pattern in [ "partition2", "complement" ] and nports & ( nports-1 ):
+      raise ValueError( "{} traffic needs a power-of-two number of ports"
+                        .format( pattern ) )
+
+    s.nports         = nports
+    s.injection_rate = injection_rate
+    s.pattern        = pattern
+    s.block          = block
+    s.use_numpy      = np is not None and use_numpy
+
+    # Seed key as 32-bit words, the way random.seed splits a long
+
+    key  = []
+    seed = abs( seed )
+    while True:
+      key.append( seed & 0xffffffff )
+      seed >>= 32
+      if not seed:
+        break
+
+    if s.use_numpy:
+      s.rng = np.random.RandomState( np.array( key, dtype=np.uint32 ) )
+    else:
+      s.rng = random.Random( sum( word << (32*i) for i, word in enumerate( key ) ) )
+
+    # Current block
+
+    s.base   = -block
+    s.cycles = []
+    s.srcs   = []
+    s.dests  = []
+
+  #-----------------------------------------------------------------------
+  # _gen_block_numpy
+  #-----------------------------------------------------------------------
+
+  def _gen_block_numpy( s ):
+
+    shape  = ( s.block, s.nports )
+    inject = s.rng.random_sample( shape ) * 100 < s.injection_rate
+    r      = ( s.rng.random_sample( shape ) * s.nports ).astype( np.int64 )
+
+    cycles, srcs = np.nonzero( inject )
+    dests = dest_of( s.pattern, s.nports, srcs, r[ cycles, srcs ] )
+
+    return cycles.tolist(), srcs.tolist(), dests.tolist()
+
+  #-----------------------------------------------------------------------
+  # _gen_block_python
+  #-----------------------------------------------------------------------
+
+  def _gen_block_python( s ):
+
+    sample = s.rng.random
+    n      = s.block * s.nports
+
+    inject = [ sample() * 100 < s.injection_rate for x in xrange( n ) ]
+    r      = [ int( sample() * s.nports ) for x in xrange( n ) ]
+
+    cycles, srcs, dests = [], [], []
+    for idx in xrange( n ):
+      if inject[ idx ]:
+        cycle, src = divmod( idx, s.nports )
+        cycles.append( cycle )
+        srcs.append( src )
+        dests.append( dest_of( s.pattern, s.nports, src, r[ idx ] ) )
+
+    return cycles, srcs, dests
+
+  #-----------------------------------------------------------------------
+  # injections
+  #-----------------------------------------------------------------------
+  # Returns the list of ( src, dest ) pairs injected in the given cycle.
+  # Cycles must be looked up in increasing order.
+
+  def injections( s, cycle ):
+
+    while cycle >= s.base + s.block:
+      s.base += s.block
+      if s.use_numpy:
+        s.cycles, s.srcs, s.dests = s._gen_block_numpy()
+      else:
+        s.cycles, s.srcs, s.dests = s._gen_block_python()
+
+    offset = cycle - s.base
+    start  = bisect.bisect_left ( s.cycles, offset )
+    end    = bisect.bisect_right( s.cycles, offset, start )
+
+    return zip( s.srcs[ start:end ], s.dests[ start:end ] )
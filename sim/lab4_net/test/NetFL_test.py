@@ -215,3 +215,19 @@ test_case_table = mk_test_case_table([
 def test( test_params, dump_vcd, test_verilog ):
   run_net_test( NetFL(), test_params.src_delay, test_params.sink_delay,
                 test_params.msgs, dump_vcd, test_verilog )
+
+#-------------------------------------------------------------------------
+# Test larger networks
+#-------------------------------------------------------------------------
+# Every terminal sends a packet to every other terminal
+
+def all_to_all_msgs( nports ):
+
+  return mk_net_msgs( nports,
+    [ ( src, dest, ( src * nports + dest ) % 256, src * nports + dest )
+      for src in xrange( nports ) for dest in xrange( nports ) ] )
+
+@pytest.mark.parametrize( "nports", [ 8, 16, 32 ] )
+def test_nports( nports, dump_vcd, test_verilog ):
+  run_net_test( NetFL( num_ports=nports ), 0, 0, all_to_all_msgs( nports ),
+                dump_vcd, test_verilog, num_ports=nports )
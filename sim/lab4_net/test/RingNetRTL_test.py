@@ -4,15 +4,25 @@
 
 import pytest
 
-from lab4_net.RingNetRTL import RingNetRTL
+from lab4_net.RingNetRTL  import RingNetRTL
+from lab4_net.RingNetPRTL import RingNetPRTL
 
 #-------------------------------------------------------------------------
 # Reuse tests from FL model
 #-------------------------------------------------------------------------
 
-from NetFL_test import run_net_test, test_case_table
+from NetFL_test import run_net_test, test_case_table, all_to_all_msgs
 
 @pytest.mark.parametrize( **test_case_table )
 def test( test_params, dump_vcd, test_verilog ):
   run_net_test( RingNetRTL(), test_params.src_delay, test_params.sink_delay,
                 test_params.msgs, dump_vcd, test_verilog )
+
+#-------------------------------------------------------------------------
+# Test larger rings
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "nports", [ 3, 8, 16, 32 ] )
+def test_nports( nports, dump_vcd, test_verilog ):
+  run_net_test( RingNetPRTL( num_ports=nports ), 0, 0, all_to_all_msgs( nports ),
+                dump_vcd, test_verilog, num_ports=nports )
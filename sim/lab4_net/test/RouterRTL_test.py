@@ -11,6 +11,8 @@ from pclib.test    import TestSource, TestNetSink, mk_test_case_table
 from pclib.ifcs    import NetMsg
 
 from lab4_net.RouterRTL import RouterRTL
+from lab4_net.RouterPRTL     import RouterPRTL
+from lab4_net.RouterCtrlPRTL import RouterCtrlPRTL
 from NetFL_test import mk_msg
 
 #-------------------------------------------------------------------------
@@ -27,6 +29,7 @@ class TestHarness( Model ):
     s.sink_msgs  = sink_msgs
     s.src_delay  = src_delay
     s.sink_delay = sink_delay
+    s.num_ports  = num_ports
 
     msg_type = NetMsg( num_ports, 2**opaque_nbits, payload_nbits )
 
@@ -71,13 +74,14 @@ class TestHarness( Model ):
     return done_flag
 
   def line_trace( s ):
+    nbits = clog2( s.num_ports )
     in_ = '|'.join( [ x.out.to_str( "%02s:%1s>%1s" % ( x.out.msg[32:40],
-                                                       x.out.msg[40:42],
-                                                       x.out.msg[42:44] ) )
+                                                       x.out.msg[40:40+nbits],
+                                                       x.out.msg[40+nbits:40+nbits*2] ) )
                                         for x in s.src  ] )
     out = '|'.join( [ x.in_.to_str( "%02s:%1s>%1s" % ( x.in_.msg[32:40],
-                                                       x.in_.msg[40:42],
-                                                       x.in_.msg[42:44] ) )
+                                                       x.in_.msg[40:40+nbits],
+                                                       x.in_.msg[40+nbits:40+nbits*2] ) )
                                         for x in s.sink ] )
     return in_ + ' > ' + s.router.line_trace() + ' > '+ out
 
@@ -206,3 +210,68 @@ def test( test_params, dump_vcd, test_verilog ):
   run_router_test( RouterRTL(), test_params.routerid,
                    test_params.src_delay, test_params.sink_delay,
                    test_params.msgs, dump_vcd, test_verilog )
+
+#-------------------------------------------------------------------------
+# Test route computation
+#-------------------------------------------------------------------------
+# Every router must send a message to its terminal or along the shorter
+# way around the ring, for rings of any size
+
+@pytest.mark.parametrize( "nrouters", [ 2, 3, 4, 5, 8, 16, 32 ] )
+def test_route( nrouters ):
+
+  model = RouterCtrlPRTL( nrouters )
+  model.elaborate()
+
+  sim = SimulationTool( model )
+  sim.reset()
+
+  for router_id in xrange( nrouters ):
+    for dest in xrange( nrouters ):
+
+      model.router_id.value = router_id
+      model.in0_dest.value  = dest
+      model.in1_dest.value  = dest
+      model.in2_dest.value  = dest
+      sim.eval_combinational()
+
+      fwd_hops = ( dest - router_id ) % nrouters
+      bwd_hops = ( router_id - dest ) % nrouters
+
+      if   fwd_hops == 0:        route = 1
+      elif fwd_hops <= bwd_hops: route = 2
+      else:                      route = 0
+
+      assert model.in0_route == route
+      assert model.in1_route == route
+      assert model.in2_route == route
+
+#-------------------------------------------------------------------------
+# Test larger rings
+#-------------------------------------------------------------------------
+# Messages for the terminal, passing through in both directions, and
+# turning into the ring from the terminal (a tie goes forward)
+
+def large_ring_msgs( i, nrouters ):
+
+  def rid( x ):
+    return x % nrouters
+
+  return mk_router_msgs( nrouters,
+#       tsrc tsink src          dest                       opaque payload
+    [ ( 0x1, 0x1,  i,           i,                         0x00,  0xfe ),
+      ( 0x0, 0x2,  rid( i-1 ),  rid( i+2 ),                0x01,  0xde ),
+      ( 0x2, 0x0,  rid( i+1 ),  rid( i-2 ),                0x02,  0xad ),
+      ( 0x0, 0x1,  rid( i-3 ),  i,                         0x03,  0xbe ),
+      ( 0x1, 0x2,  i,           rid( i + nrouters/2 ),     0x04,  0xef ),
+      ( 0x1, 0x0,  i,           rid( i + nrouters/2 + 1 ), 0x05,  0x01 ),
+    ]
+  )
+
+@pytest.mark.parametrize( "nrouters, router_id", [
+  ( 8, 0 ), ( 8, 5 ), ( 16, 15 ), ( 32, 7 ),
+])
+def test_nrouters( nrouters, router_id, dump_vcd, test_verilog ):
+  run_router_test( RouterPRTL( nrouters=nrouters ), router_id, 0, 0,
+                   large_ring_msgs( router_id, nrouters ), dump_vcd, test_verilog,
+                   num_ports=nrouters )
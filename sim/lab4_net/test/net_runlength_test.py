@@ -0,0 +1,117 @@
+#=========================================================================
+# net_runlength_test.py
+#=========================================================================
+
+import math
+import random
+
+from lab4_net.net_runlength import mser, batch_means, RunLength
+
+#-------------------------------------------------------------------------
+# test_mser
+#-------------------------------------------------------------------------
+
+def test_mser():
+
+  random.seed( 0xdeadbeef )
+
+  # A transient which decays over the first 20 batches
+
+  means = [ 10 + 40 * math.exp( -i / 4.0 ) + random.gauss( 0, 1 )
+            for i in xrange( 100 ) ]
+  d = mser( means )
+  assert 10 <= d <= 30
+
+  # No transient at all
+
+  means = [ 10 + random.gauss( 0, 1 ) for i in xrange( 100 ) ]
+  assert mser( means ) < 50
+
+  # Latency which keeps growing never looks steady
+
+  means = [ 10 + i for i in xrange( 100 ) ]
+  assert mser( means ) >= 50
+
+#-------------------------------------------------------------------------
+# test_batch_means
+#-------------------------------------------------------------------------
+
+def test_batch_means():
+
+  random.seed( 0xdeadbeef )
+
+  # 200 batches of 10 packets each
+
+  sums, counts = [], []
+  for i in xrange( 200 ):
+    sums.append( sum( random.gauss( 20, 5 ) for j in xrange( 10 ) ) )
+    counts.append( 10 )
+
+  mean, halfwidth = batch_means( sums, counts, 20 )
+
+  # The standard error of the mean is 5/sqrt(2000)
+
+  assert abs( mean - 20 ) < halfwidth
+  assert 0.5 < halfwidth / ( 1.96 * 5 / math.sqrt( 2000 ) ) < 2
+
+  assert batch_means( [ 0, 0 ], [ 0, 0 ], 2 ) == ( 0.0, float( "inf" ) )
+
+#-------------------------------------------------------------------------
+# run
+#-------------------------------------------------------------------------
+# Feeds RunLength with one packet per cycle whose latency is
+# latency( cycle ) plus noise until it is done
+
+def run( latency, precision, max_cycles ):
+
+  random.seed( 0xdeadbeef )
+
+  rl = RunLength( precision, max_cycles )
+  while not rl.done:
+    rl.add( latency( rl.ncycles ) + random.gauss( 0, 5 ) )
+    rl.tick()
+
+  return rl
+
+#-------------------------------------------------------------------------
+# test_run_length
+#-------------------------------------------------------------------------
+
+def test_run_length():
+
+  # Warmup of a few thousand cycles, then steady at 20
+
+  rl = run( lambda t: 20 + 60 * math.exp( -t / 800.0 ), 0.01, 100000 )
+
+  assert rl.steady and rl.done
+  assert 2000 <= rl.warmup_cycles <= 10000
+  assert rl.ncycles < 30000
+  assert rl.relative_precision() <= 0.01
+  assert abs( rl.mean - 20 ) < 2 * rl.halfwidth
+
+  data = rl.to_dict()
+  assert data["converged"]
+  assert data["measured_cycles"] == rl.ncycles - rl.warmup_cycles
+
+  # A tighter precision needs a longer run
+
+  assert run( lambda t: 20, 0.002, 100000 ).ncycles > \
+         run( lambda t: 20, 0.01,  100000 ).ncycles
+
+#-------------------------------------------------------------------------
+# test_saturated
+#-------------------------------------------------------------------------
+# Beyond saturation we measure the second half and stop at the cap
+
+def test_saturated():
+
+  rl = run( lambda t: 10 + t / 10.0, 0.05, 20000 )
+
+  assert rl.done and not rl.steady
+  assert rl.ncycles == 20000
+  assert rl.warmup_cycles == 10000
+  assert rl.mean > 1000
+
+  data = rl.to_dict()
+  assert not data["converged"]
+  assert data["relative_precision"] is not None
@@ -0,0 +1,124 @@
+#=========================================================================
+# net_stats_test.py
+#=========================================================================
+
+import json
+import random
+import StringIO
+
+from lab4_net.net_stats import LatencyHistogram, NetStats
+
+#-------------------------------------------------------------------------
+# exact_percentile
+#-------------------------------------------------------------------------
+
+def exact_percentile( values, p ):
+  values = sorted( values )
+  rank   = max( -( -p * len( values ) // 100 ), 1 )
+  return values[ rank-1 ]
+
+#-------------------------------------------------------------------------
+# test_buckets
+#-------------------------------------------------------------------------
+
+def test_buckets():
+
+  hist = LatencyHistogram()
+
+  # Every value falls into the range of its own bucket, and the buckets
+  # tile the integers without gaps
+
+  prev_hi = -1
+  for idx in xrange( hist.index( 100000 ) + 1 ):
+    lo, hi = hist.bucket_range( idx )
+    assert lo == prev_hi + 1
+    assert hist.index( lo ) == hist.index( hi ) == idx
+    prev_hi = hi
+
+  # Small values are exact and the rest within 1/32
+
+  for value in xrange( 64 ):
+    assert hist.bucket_range( hist.index( value ) ) == ( value, value )
+
+  for value in [ 64, 100, 1000, 12345, 99999 ]:
+    lo, hi = hist.bucket_range( hist.index( value ) )
+    assert lo <= value <= hi and ( hi - lo + 1 ) <= value / 32.0
+
+#-------------------------------------------------------------------------
+# test_percentiles
+#-------------------------------------------------------------------------
+
+def test_percentiles():
+
+  random.seed( 0xdeadbeef )
+
+  values = [ int( random.expovariate( 1.0 / 20 ) ) + 3 for i in xrange( 5000 ) ]
+  values += [ random.randint( 500, 3000 ) for i in xrange( 100 ) ]
+
+  hist = LatencyHistogram()
+  for value in values:
+    hist.add( value )
+
+  assert hist.count == len( values )
+  assert hist.mean() == sum( values ) / float( len( values ) )
+  assert hist.min == min( values )
+  assert hist.max == max( values )
+
+  for p in [ 50, 90, 99, 100 ]:
+    exact = exact_percentile( values, p )
+    assert exact <= hist.percentile( p ) <= exact * ( 1 + 1/32.0 )
+
+  # Memory only grows with the log of the latency
+
+  assert len( hist.buckets ) < 400
+
+  # An empty histogram
+
+  assert LatencyHistogram().percentile( 99 ) == 0
+
+#-------------------------------------------------------------------------
+# test_net_stats
+#-------------------------------------------------------------------------
+
+def test_net_stats():
+
+  stats = NetStats( 4 )
+
+  for cycle in xrange( 100 ):
+    stats.sample_queues([ 0, 1, cycle % 5, 0 ])
+    if cycle % 2 == 0:
+      stats.inject( 0 )
+    if cycle % 4 == 0:
+      stats.accept( 2 )
+
+  stats.drop( 1 )
+  stats.stall( 3 )
+  stats.stall( 3 )
+
+  stats.receive( 0, 2, 10 )
+  stats.receive( 0, 2, 20 )
+  stats.receive( 3, 1, 7 )
+
+  data = stats.to_dict()
+
+  assert data["measured_cycles"] == 100
+  assert data["offered_throughput"] == 50 / 400.0
+  assert data["accepted_throughput"] == 25 / 400.0
+
+  assert data["latency_matrix"][0][2] == 15.0
+  assert data["latency_matrix"][3][1] == 7.0
+  assert data["latency_matrix"][1][1] is None
+  assert data["count_matrix"][0][2] == 2
+
+  assert data["queue_occupancy"]["mean"] == [ 0.0, 1.0, 2.0, 0.0 ]
+  assert data["queue_occupancy"]["max"]  == [ 0, 1, 4, 0 ]
+
+  assert data["drops"]  == [ 0, 1, 0, 0 ]
+  assert data["stalls"] == [ 0, 0, 0, 2 ]
+
+  assert data["latency"]["p50"] == 10
+  assert data["latency"]["max"] == 20
+
+  fp = StringIO.StringIO()
+  stats.write_json( fp, pattern="urandom" )
+  assert json.loads( fp.getvalue() )["pattern"] == "urandom"
@@ -0,0 +1,88 @@
+#=========================================================================
+# net_sweep_test.py
+#=========================================================================
+# The saturation search only needs a latency for each injection rate, so
+# we test it on the latency curve of a simple queue instead of running a
+# network simulation.
+
+import pytest
+
+from lab4_net.net_sweep import saturation_search
+
+#-------------------------------------------------------------------------
+# mk_evaluate
+#-------------------------------------------------------------------------
+# Latency which grows like zero_load / ( 1 - rate/sat ) and stays high
+# once the network is saturated. The calls are recorded in batches.
+
+def mk_evaluate( zero_load, sat, batches ):
+
+  def latency( rate ):
+    if rate >= sat:
+      return 1000.0
+    return zero_load / ( 1.0 - float( rate ) / sat )
+
+  def evaluate( rates ):
+    batches.append( list( rates ) )
+    return [ latency( rate ) for rate in rates ]
+
+  return evaluate
+
+#-------------------------------------------------------------------------
+# test_saturation_search
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "sat, npoints, tol", [
+  ( 24, 4, 1 ),
+  ( 24, 8, 1 ),
+  ( 47, 2, 1 ),
+  ( 71, 4, 5 ),
+  ( 93, 1, 1 ),
+])
+def test_saturation_search( sat, npoints, tol ):
+
+  batches = []
+  evaluate = mk_evaluate( 10.0, sat, batches )
+
+  curve, zero_load, below, above = \
+    saturation_search( evaluate, 100, tol, npoints )
+
+  # The latency at rate r crosses 100 at r = 0.9*sat
+
+  crossing = 0.9*sat
+  assert below <= crossing < above
+  assert above - below <= tol
+  assert zero_load == evaluate([ 1 ])[0]
+
+  # Batches never exceed the number of workers and no rate is simulated
+  # twice
+
+  assert all( len( batch ) <= max( npoints, 2 ) for batch in batches[:-1] )
+  rates = [ rate for batch in batches[:-1] for rate in batch ]
+  assert len( rates ) == len( set( rates ) ) == len( curve )
+  assert [ rate for rate, lat in curve ] == sorted( rates )
+
+  # Far fewer simulations than a linear walk up to the crossing
+
+  assert len( curve ) <= 20
+
+#-------------------------------------------------------------------------
+# test_saturation_search_edges
+#-------------------------------------------------------------------------
+
+def test_saturation_search_edges():
+
+  # Never saturates
+
+  curve, zero_load, below, above = \
+    saturation_search( mk_evaluate( 10.0, 1000, [] ), 100 )
+
+  assert ( below, above ) == ( 100, None )
+
+  # Already saturated at the lowest rate
+
+  curve, zero_load, below, above = \
+    saturation_search( mk_evaluate( 200.0, 50, [] ), 100 )
+
+  assert ( below, above ) == ( None, 1 )
+  assert zero_load > 100
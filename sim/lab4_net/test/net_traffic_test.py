@@ -0,0 +1,87 @@
+#=========================================================================
+# net_traffic_test.py
+#=========================================================================
+
+import pytest
+
+from lab4_net.net_traffic import TrafficSchedule, patterns, np
+
+#-------------------------------------------------------------------------
+# schedule
+#-------------------------------------------------------------------------
+# All ( cycle, src, dest ) injections in the first ncycles cycles
+
+def schedule( traffic, ncycles ):
+  return [ ( cycle, src, dest ) for cycle in xrange( ncycles )
+                                for src, dest in traffic.injections( cycle ) ]
+
+#-------------------------------------------------------------------------
+# test_patterns
+#-------------------------------------------------------------------------
+
+@pytest.mark.parametrize( "pattern", patterns )
+@pytest.mark.parametrize( "use_numpy", [ False, True ] )
+@pytest.mark.parametrize( "nports", [ 4, 8, 16 ] )
+def test_patterns( pattern, use_numpy, nports ):
+
+  if use_numpy and np is None:
+    pytest.skip( "NumPy is not installed" )
+
+  traffic = TrafficSchedule( nports, 30, pattern, block=256, use_numpy=use_numpy )
+  packets = schedule( traffic, 2000 )
+
+  # About 30% of the slots inject a packet
+
+  assert 0.27 < len( packets ) / ( 2000.0 * nports ) < 0.33
+
+  half = nports / 2
+  for cycle, src, dest in packets:
+    assert 0 <= dest < nports
+    if   pattern == "partition2":
+      assert dest / half == src / half
+    elif pattern == "opposite":
+      assert dest == ( src + half ) % nports
+    elif pattern == "neighbor":
+      assert dest == ( src + 1 ) % nports
+    elif pattern == "complement":
+      assert dest == nports - 1 - src
+
+  if pattern in [ "urandom", "partition2" ]:
+    assert len( set( ( src, dest ) for cycle, src, dest in packets ) ) == \
+           { "urandom" : nports * nports, "partition2" : nports * half }[ pattern ]
+
+#-------------------------------------------------------------------------
+# test_reproducible
+#-------------------------------------------------------------------------
+# The schedule only depends on the seed, whether or not we use NumPy
+
+def test_reproducible():
+
+  ref = schedule( TrafficSchedule( 4, 20, "urandom", use_numpy=False ), 3000 )
+
+  assert ref == schedule( TrafficSchedule( 4, 20, "urandom", use_numpy=False ), 3000 )
+  assert ref != schedule( TrafficSchedule( 4, 20, "urandom", seed=1 ), 3000 )
+
+  if np is not None:
+    assert ref == schedule( TrafficSchedule( 4, 20, "urandom" ), 3000 )
+
+#-------------------------------------------------------------------------
+# test_rates
+#-------------------------------------------------------------------------
+
+def test_rates():
+
+  assert schedule( TrafficSchedule( 4, 0, "urandom" ), 500 ) == []
+
+  packets = schedule( TrafficSchedule( 4, 100, "neighbor" ), 500 )
+  assert packets == [ ( cycle, src, ( src + 1 ) % 4 ) for cycle in xrange( 500 )
+                                                     for src in xrange( 4 ) ]
+
+  with pytest.raises( ValueError ):
+    TrafficSchedule( 4, 10, "tornado" )
+
+  # Only partition2 and complement need a power-of-two number of ports
+
+  TrafficSchedule( 6, 10, "opposite" )
+  with pytest.raises( ValueError ):
+    TrafficSchedule( 6, 10, "complement" )
@@ -12,6 +12,12 @@ from pclib.ifcs          import MemMsg
 
 class MultiCorePRTL( Model ):
 
+  # Contains the blocking caches, whose valid and dirty bits are not
+  # reset, so a test harness with this model must not be reused (see
+  # lab2_proc/test/harness_pool.py)
+
+  poolable = False
+
   def __init__( s ):
 
     # Parameters
@@ -11,6 +11,12 @@ from lab3_mem  import BlockingCacheAltRTL
 
 class SingleCorePRTL( Model ):
 
+  # Contains the blocking caches, whose valid and dirty bits are not
+  # reset, so a test harness with this model must not be reused (see
+  # lab2_proc/test/harness_pool.py)
+
+  poolable = False
+
   def __init__( s ):
 
     # Parameters
@@ -10,7 +10,10 @@ from pclib.ifcs import MemMsg
 from pclib.test import TestMemory, TestSource, TestSink
 
 from lab2_proc.SparseMemoryImage       import SparseMemoryImage
+from lab2_proc.SparseMemory            import SparseMemory
 from lab2_proc.tinyrv2_encoding        import assemble
+from lab2_proc.test.harness_pool       import checkout_harness, reset_msgs
+from lab2_proc.test.harness_pool       import reset_test_memory
 
 #=========================================================================
 # Harness for Proc+Cache+Net composition to simulate a benchmark
@@ -33,6 +36,10 @@ class SimHarness( Model ):
     else:
       s.mem = TestMemory( MemMsg(8,32,data_nbits), num_memports )
 
+    # Sparse backing store, see lab2_proc/SparseMemory.py
+
+    s.mem.mem = SparseMemory( len( s.mem.mem ) )
+
     # Connect memory ports
 
     s.connect( s.model.imemreq,   s.mem.reqs[0]     )
@@ -125,6 +132,10 @@ class TestHarness( Model ):
     s.mem    = TestMemory( MemMsg(8,32,data_nbits), num_memports,
                            mem_stall_prob, mem_latency )
 
+    # Sparse backing store, see lab2_proc/SparseMemory.py
+
+    s.mem.mem = SparseMemory( len( s.mem.mem ) )
+
     # Composition <-> Memory
 
     s.connect( s.model.imemreq,  s.mem.reqs[0]     )
@@ -203,7 +214,18 @@ class TestHarness( Model ):
   #-----------------------------------------------------------------------
 
   def cleanup( s ):
-    del s.mem.mem[:]
+    s.mem.mem.clear()
+
+  #-----------------------------------------------------------------------
+  # recycle
+  #-----------------------------------------------------------------------
+  # Empty the sources, sinks, and memory so that a pooled harness can run
+  # another test program
+
+  def recycle( s ):
+    for x in s.src + s.sink:
+      reset_msgs( x )
+    reset_test_memory( s.mem )
 
   #-----------------------------------------------------------------------
   # done
@@ -234,47 +256,50 @@ def run_test( model, gen_test, num_cores,
               dump_vcd=None, src_delay=0, sink_delay=0,
               mem_stall_prob=0, mem_latency=0, max_cycles=10000 ):
 
-  # Instantiate and elaborate the model
+  # Instantiate and elaborate the model, or reuse one from the harness
+  # pool (see lab2_proc/test/harness_pool.py)
 
-  model = TestHarness( model, dump_vcd, num_cores,
-                       src_delay, sink_delay, mem_stall_prob, mem_latency )
+  def make_harness():
+    harness = TestHarness( model, dump_vcd, num_cores,
+                           src_delay, sink_delay, mem_stall_prob, mem_latency )
+    harness.vcd_file = dump_vcd
+    return harness
 
-  model.vcd_file = dump_vcd
-  model.elaborate()
+  key = ( type( model ), num_cores,
+          src_delay, sink_delay, mem_stall_prob, mem_latency )
 
-  # Assemble the test program
+  with checkout_harness( key, make_harness, dump_vcd ) as \
+       ( harness, sim ):
 
-  mem_image = assemble( gen_test() )
+    # Assemble the test program
 
-  # Load the program into the model
+    mem_image = assemble( gen_test() )
 
-  model.load( mem_image )
+    # Load the program into the model
 
-  # Create a simulator using the simulation tool
+    harness.load( mem_image )
 
-  sim = SimulationTool( model )
+    # Run the simulation
 
-  # Run the simulation
+    print()
 
-  print()
+    sim.reset()
+    while not harness.done() and sim.ncycles < max_cycles:
+      sim.print_line_trace()
+      sim.cycle()
 
-  sim.reset()
-  while not model.done() and sim.ncycles < max_cycles:
-    sim.print_line_trace()
-    sim.cycle()
+    # print the very last line trace after the last tick
 
-  # print the very last line trace after the last tick
-
-  sim.print_line_trace()
+    sim.print_line_trace()
 
-  # Force a test failure if we timed out
+    # Force a test failure if we timed out
 
-  assert sim.ncycles < max_cycles
+    assert sim.ncycles < max_cycles
 
-  # Add a couple extra ticks so that the VCD dump is nicer
+    # Add a couple extra ticks so that the VCD dump is nicer
 
-  sim.cycle()
-  sim.cycle()
-  sim.cycle()
+    sim.cycle()
+    sim.cycle()
+    sim.cycle()
 
-  model.cleanup()
+    harness.cleanup()